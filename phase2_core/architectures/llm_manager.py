@@ -23,16 +23,20 @@ class LLMManager:
     LLM模型管理器，负责管理和调用不同的LLM模型
     """
 
-    def __init__(self):
+    def __init__(self, pool_maxsize: int = 10):
         """
         初始化LLM管理器
+
+        参数:
+            pool_maxsize: 每个主机的HTTP连接池大小，多线程并发调用时应不小于并发数
         """
         self.config_manager = get_config_manager()
+        self.pool_maxsize = pool_maxsize
         self.session = self._create_session()
 
     def _create_session(self) -> requests.Session:
         """
-        创建带有重试机制的requests会话
+        创建带有重试机制和连接池的requests会话
 
         返回:
             配置好的requests会话
@@ -44,7 +48,11 @@ class LLMManager:
             allowed_methods=["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE", "POST"],
             backoff_factor=1
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=self.pool_maxsize,
+            pool_maxsize=self.pool_maxsize
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
@@ -108,7 +116,7 @@ class LLMManager:
                 url,
                 headers=headers,
                 json=data,
-                timeout=config.get("timeout", 30)
+                timeout=kwargs.get("timeout") or config.get("timeout", 30)
             )
             response.raise_for_status()
             result = response.json()
@@ -153,7 +161,7 @@ class LLMManager:
                 url,
                 headers=headers,
                 json=data,
-                timeout=config.get("timeout", 30)
+                timeout=kwargs.get("timeout") or config.get("timeout", 30)
             )
             response.raise_for_status()
             result = response.json()
@@ -205,7 +213,7 @@ class LLMManager:
                 headers=headers,
                 params=params,
                 json=data,
-                timeout=config.get("timeout", 30)
+                timeout=kwargs.get("timeout") or config.get("timeout", 30)
             )
             response.raise_for_status()
             result = response.json()
@@ -260,6 +268,7 @@ class LLMManager:
             provider: 模型提供商名称，如果为None则使用默认提供商
             model: 模型名称，如果为None则使用默认模型
             **kwargs: 额外参数
+                timeout: 单次请求的超时时间（秒），覆盖配置中的 timeout
 
         返回:
             模型响应
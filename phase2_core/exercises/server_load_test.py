@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MCP服务器压力测试
+
+在进程内启动 MCPServer，使用模拟的LLM（不访问网络），并发发送 JSON-RPC 请求，
+统计每秒请求数和延迟分布。
+
+运行方式:
+    python phase2_core/exercises/server_load_test.py --requests 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase2_core.mcp.runtime import MCPRuntime
+from phase2_core.mcp.server import MCPServer
+
+
+class MockLLMManager:
+    """
+    模拟LLM管理器，按提示词类型返回固定结果
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        初始化模拟LLM管理器
+
+        参数:
+            latency: 每次调用的模拟延迟（秒）
+        """
+        self.latency = latency
+
+    def call(self, prompt: str, provider=None, model=None, **kwargs) -> str:
+        """
+        模拟LLM调用
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        if "请分析以下任务" in prompt:
+            return json.dumps({"task_type": "file", "required_tools": ["directory_lister"], "description": "列出目录"})
+        if "生成执行参数" in prompt:
+            return json.dumps({"directory_path": "."})
+        return "模拟LLM响应"
+
+
+async def send_request(host: str, port: int, payload: dict) -> int:
+    """
+    发送一个JSON-RPC请求
+
+    返回:
+        HTTP状态码
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST /rpc HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def run_load_test(total: int, concurrency: int, workers: int, queue_size: int, latency: float):
+    """
+    执行压力测试
+    """
+    runtime = MCPRuntime(llm_manager=MockLLMManager(latency))
+    server = MCPServer(runtime=runtime, port=0, workers=workers, queue_size=queue_size)
+    await server.start()
+
+    latencies = []
+    status_counts = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        payload = {"jsonrpc": "2.0", "id": i, "method": "execute_task", "params": {"task": "列出当前目录"}}
+        async with semaphore:
+            start = time.perf_counter()
+            status = await send_request(server.host, server.port, payload)
+            latencies.append(time.perf_counter() - start)
+            status_counts[status] = status_counts.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    await server.stop()
+
+    latencies.sort()
+    print("=== MCP服务器压力测试 ===")
+    print(f"请求总数: {total}, 并发数: {concurrency}, 工作协程: {workers}, 队列长度: {queue_size}")
+    print(f"状态码分布: {status_counts}")
+    print(f"总耗时: {elapsed:.3f}秒")
+    print(f"吞吐量: {total / elapsed:.1f} 请求/秒")
+    print(f"延迟 p50: {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="MCP服务器压力测试")
+    parser.add_argument("--requests", type=int, default=500, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=32, help="客户端并发数")
+    parser.add_argument("--workers", type=int, default=8, help="服务器工作协程数量")
+    parser.add_argument("--queue-size", type=int, default=64, help="服务器等待队列长度")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟LLM调用延迟（秒）")
+    args = parser.parse_args()
+
+    asyncio.run(run_load_test(args.requests, args.concurrency, args.workers, args.queue_size, args.latency))
+
+
+if __name__ == "__main__":
+    main()
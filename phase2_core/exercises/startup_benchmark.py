@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MCP启动耗时测试
+
+在全新的解释器进程中分别测量以下场景的耗时（取中位数），并检查较重的模块是否被导入：
+    - import_mcp_core: 仅导入 phase2_core.mcp.mcp_core
+    - eager_tools:     initialize_tools() 实例化所有工具后获取工具列表
+    - lazy_tools:      register_lazy_tools() 注册描述符后获取工具列表
+
+运行方式:
+    python phase2_core/exercises/startup_benchmark.py --repeat 5
+    python phase2_core/exercises/startup_benchmark.py --importtime 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 项目根目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 需要关注的较重模块
+HEAVY_MODULES = ["requests", "yaml", "sqlite3", "asyncio", "phase2_core.mcp.tools"]
+
+SCENARIOS = {
+    "import_mcp_core": "import phase2_core.mcp.mcp_core",
+    "eager_tools": (
+        "from phase2_core.mcp.tool_interface import ToolRegistry\n"
+        "from phase2_core.mcp.tools import initialize_tools\n"
+        "initialize_tools(ToolRegistry()).get_tool_info_list()"
+    ),
+    "lazy_tools": (
+        "from phase2_core.mcp.tool_interface import ToolRegistry\n"
+        "from phase2_core.mcp.plugins import register_lazy_tools\n"
+        "register_lazy_tools(ToolRegistry()).get_tool_info_list()"
+    ),
+}
+
+# 在子进程中执行场景代码并输出耗时和已导入的重模块
+_RUNNER = """
+import json, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_scenario(code: str) -> dict:
+    """
+    在新的解释器进程中运行一个场景
+
+    参数:
+        code: 场景代码
+
+    返回:
+        {"elapsed": 耗时（秒）, "heavy": 已导入的重模块列表}
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", _RUNNER.format(code=code, heavy=HEAVY_MODULES)],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_importtime(code: str, top: int):
+    """
+    使用 -X importtime 打印导入耗时最多的模块
+
+    参数:
+        code: 场景代码
+        top: 打印的模块数量
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            rows.append((int(parts[1]), parts[2].strip()))
+        except ValueError:
+            continue
+    for cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {module}")
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="MCP启动耗时测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的运行次数")
+    parser.add_argument("--importtime", type=int, default=0, help="打印每个场景导入耗时最多的N个模块")
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}，每个场景运行 {args.repeat} 次")
+    for name, code in SCENARIOS.items():
+        try:
+            runs = [run_scenario(code) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:16s} 运行失败: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        median = statistics.median(run["elapsed"] for run in runs) * 1000
+        print(f"{name:16s} {median:8.1f} ms  已导入: {', '.join(runs[0]['heavy']) or '-'}")
+        if args.importtime:
+            print_importtime(code, args.importtime)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+协作式取消
+
+CancellationToken 表示一次调用的取消信号和截止时间，沿着 MCP -> ToolRegistry -> 工具 的调用链传递
+（工具通过 execute(..., cancel_token=...) 接收）。长时间运行的代码在合适的位置调用 checkpoint()，
+令牌已取消或已超过截止时间时抛出 ToolCancelledError：
+
+    - 文件工具在每个数据块、每个目录或每个文件之间检查
+    - 命令工具把截止时间作为超时，并在取消时终止整个进程组
+    - 网络类工具应当把 remaining() 作为请求的超时时间
+
+子令牌继承父令牌的截止时间（取两者中较早的一个），父令牌取消时子令牌随之取消。
+子令牌使用结束后应调用 close()，从父令牌注销回调，避免长期存在的父令牌积累已结束的子令牌。
+"""
+
+import threading
+import time
+from typing import Optional, Callable, List
+
+from .tool_interface import ToolCancelledError
+
+
+class CancellationToken:
+    """
+    取消令牌，线程安全
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancellationToken"] = None):
+        """
+        初始化取消令牌
+
+        参数:
+            timeout: 超时时间（秒），为None时没有自己的截止时间
+            parent: 父令牌
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if parent is not None and parent.deadline is not None:
+            deadline = parent.deadline if deadline is None else min(deadline, parent.deadline)
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        # 从父令牌注销取消回调的函数
+        self._detach: Callable[[], None] = lambda: None
+        if parent is not None:
+            self._detach = parent.add_callback(lambda: self.cancel(parent.reason))
+
+    def cancel(self, reason: Optional[str] = None):
+        """
+        取消，已注册的回调会在当前线程中被调用一次
+
+        参数:
+            reason: 取消原因
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason or "操作已取消"
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self.close()
+        for callback in callbacks:
+            callback()
+
+    def close(self):
+        """
+        从父令牌注销（令牌使用结束后调用，可以重复调用），之后父令牌取消时不再传递到这个令牌
+        """
+        detach, self._detach = self._detach, lambda: None
+        detach()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        是否已取消或已超过截止时间
+        """
+        return self._event.is_set() or self.deadline_exceeded
+
+    @property
+    def deadline_exceeded(self) -> bool:
+        """
+        是否已超过截止时间
+        """
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """
+        距离截止时间的剩余秒数
+
+        返回:
+            剩余时间（不小于0），没有截止时间时返回None
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def check(self):
+        """
+        检查是否应该停止
+
+        异常:
+            ToolCancelledError: 如果已取消或已超过截止时间
+        """
+        if self._event.is_set():
+            raise ToolCancelledError(self.reason)
+        if self.deadline_exceeded:
+            raise ToolCancelledError("已超过截止时间", deadline_exceeded=True)
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        注册取消回调（只在调用 cancel() 时触发，到达截止时间不会触发）
+
+        参数:
+            callback: 回调函数；令牌已取消时立即调用
+
+        返回:
+            注销回调的函数
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待取消或截止时间
+
+        参数:
+            timeout: 最长等待时间（秒）
+
+        返回:
+            是否已取消或已超过截止时间
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        self._event.wait(timeout)
+        return self.cancelled
+
+    def child(self, timeout: Optional[float] = None) -> "CancellationToken":
+        """
+        创建子令牌
+
+        参数:
+            timeout: 子令牌自己的超时时间（秒）
+
+        返回:
+            子令牌
+        """
+        return CancellationToken(timeout, parent=self)
+
+    def _remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+def checkpoint(cancel_token: Optional[CancellationToken]):
+    """
+    检查取消令牌（令牌为None时不做任何事）
+
+    参数:
+        cancel_token: 取消令牌
+
+    异常:
+        ToolCancelledError: 如果已取消或已超过截止时间
+    """
+    if cancel_token is not None:
+        cancel_token.check()
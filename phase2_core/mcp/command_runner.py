@@ -0,0 +1,385 @@
+"""
+异步命令执行
+
+基于 asyncio 子进程执行系统命令：
+    - 按行产出 stdout/stderr 事件，调用方可以边执行边处理输出
+    - 每个输出流最多保留 max_output_bytes 字节（保留开头和结尾，中间截断）
+    - 超时或取消令牌被取消后终止整个进程组，避免遗留子进程
+    - ConcurrentCommandRunner 以有限并发同时执行多条命令
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable, Awaitable, TypeVar
+
+from .cancellation import CancellationToken
+
+
+# 每次从管道读取的字节数
+READ_CHUNK_SIZE = 64 * 1024
+# 单个输出事件中一行的最大长度，超过时强制切分
+MAX_EVENT_LINE = 64 * 1024
+# 默认每个输出流保留的最大字节数
+DEFAULT_MAX_OUTPUT_BYTES = 1024 * 1024
+
+T = TypeVar("T")
+
+
+class OutputBuffer:
+    """
+    有上限的输出缓冲区，保留开头和结尾的内容
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES):
+        """
+        初始化输出缓冲区
+
+        参数:
+            max_bytes: 最多保留的字节数，一半用于开头，一半用于结尾
+        """
+        self.max_bytes = max_bytes
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def write(self, data: bytes):
+        """
+        写入数据
+
+        参数:
+            data: 输出数据
+        """
+        self.total_bytes += len(data)
+        if len(self.head) < self.head_limit:
+            room = self.head_limit - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_limit > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    @property
+    def truncated(self) -> bool:
+        """
+        是否有内容被丢弃
+        """
+        return self.total_bytes > len(self.head) + len(self.tail)
+
+    def getvalue(self, encoding: str = "utf-8", errors: str = "replace") -> str:
+        """
+        获取保留的内容
+
+        参数:
+            encoding: 文本编码
+            errors: 解码错误处理方式
+
+        返回:
+            输出文本，截断时中间插入省略标记
+        """
+        if not self.truncated:
+            return (bytes(self.head) + bytes(self.tail)).decode(encoding, errors)
+        omitted = self.total_bytes - len(self.head) - len(self.tail)
+        return (
+            bytes(self.head).decode(encoding, errors)
+            + f"\n...[已省略 {omitted} 字节]...\n"
+            + bytes(self.tail).decode(encoding, errors)
+        )
+
+
+async def _pump(stream: asyncio.StreamReader, name: str, buffer: OutputBuffer, events: asyncio.Queue):
+    """
+    读取一个输出流，写入缓冲区并按行产出事件
+    """
+    pending = b""
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.write(chunk)
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            await events.put({"type": name, "line": line.decode("utf-8", "replace")})
+        if len(pending) > MAX_EVENT_LINE:
+            await events.put({"type": name, "line": pending.decode("utf-8", "replace")})
+            pending = b""
+    if pending:
+        await events.put({"type": name, "line": pending.decode("utf-8", "replace")})
+
+
+async def _kill_process_group(process: asyncio.subprocess.Process, grace: float):
+    """
+    终止进程及其所在的进程组，先发送 SIGTERM，宽限期后发送 SIGKILL
+    """
+    if process.returncode is not None:
+        return
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), grace)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return
+    else:
+        # Windows 上结束整个进程树
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    await process.wait()
+
+
+async def stream_command(command: str, cwd: Optional[str] = None, timeout: float = 30,
+                         max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES, env: Optional[Dict[str, str]] = None,
+                         kill_grace: float = 2.0,
+                         cancel_token: Optional[CancellationToken] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    执行命令并逐条产出事件
+
+    事件类型:
+        {"type": "start", "pid": ...}
+        {"type": "stdout" | "stderr", "line": ...}
+        {"type": "exit", "returncode": ..., "timed_out": ..., "cancelled": ..., "duration": ...,
+         "stdout": ..., "stderr": ..., "stdout_bytes": ..., "stderr_bytes": ..., "truncated": ...}
+
+    参数:
+        command: 要执行的命令
+        cwd: 工作目录
+        timeout: 超时时间（秒），超时后终止整个进程组
+        max_output_bytes: 每个输出流最多保留的字节数
+        env: 环境变量
+        kill_grace: 发送 SIGTERM 后等待进程退出的时间（秒）
+        cancel_token: 取消令牌；令牌的截止时间早于 timeout 时以令牌为准，令牌被取消时立即终止进程组
+
+    返回:
+        事件的异步迭代器
+
+    异常:
+        ToolCancelledError: 如果启动命令前令牌已被取消
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    cancelled_event = asyncio.Event()
+    remove_callback = None
+    if cancel_token is not None:
+        cancel_token.check()
+        token_remaining = cancel_token.remaining()
+        if token_remaining is not None:
+            deadline = min(deadline, start + token_remaining)
+        loop = asyncio.get_running_loop()
+
+        def on_cancel():
+            # 取消可能发生在其他线程中
+            try:
+                loop.call_soon_threadsafe(cancelled_event.set)
+            except RuntimeError:
+                # 事件循环已关闭，命令已经结束
+                pass
+
+        remove_callback = cancel_token.add_callback(on_cancel)
+    if os.name == "posix":
+        process_group = {"start_new_session": True}
+    else:
+        process_group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        **process_group
+    )
+    yield {"type": "start", "pid": process.pid}
+
+    events: asyncio.Queue = asyncio.Queue(maxsize=1024)
+    stdout = OutputBuffer(max_output_bytes)
+    stderr = OutputBuffer(max_output_bytes)
+    pumps = asyncio.gather(
+        _pump(process.stdout, "stdout", stdout, events),
+        _pump(process.stderr, "stderr", stderr, events)
+    )
+    cancel_wait = asyncio.ensure_future(cancelled_event.wait())
+    timed_out = False
+    cancelled = False
+    try:
+        while not pumps.done() or not events.empty():
+            if cancelled_event.is_set():
+                cancelled = True
+                break
+            if not events.empty():
+                yield events.get_nowait()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            get_event = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({get_event, pumps, cancel_wait}, timeout=remaining,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if get_event in done:
+                yield get_event.result()
+            else:
+                get_event.cancel()
+
+        if timed_out or cancelled:
+            await _kill_process_group(process, kill_grace)
+        else:
+            exit_wait = asyncio.ensure_future(process.wait())
+            done, _ = await asyncio.wait({exit_wait, cancel_wait}, timeout=max(deadline - time.monotonic(), 0),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if exit_wait not in done:
+                exit_wait.cancel()
+                cancelled = cancel_wait in done
+                timed_out = not cancelled
+                await _kill_process_group(process, kill_grace)
+    finally:
+        if remove_callback is not None:
+            remove_callback()
+        cancel_wait.cancel()
+        if process.returncode is None:
+            await _kill_process_group(process, kill_grace)
+        if not pumps.done():
+            pumps.cancel()
+        await asyncio.gather(pumps, return_exceptions=True)
+
+    yield {
+        "type": "exit",
+        "returncode": process.returncode,
+        "timed_out": timed_out,
+        "cancelled": cancelled,
+        "duration": time.monotonic() - start,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "stdout_bytes": stdout.total_bytes,
+        "stderr_bytes": stderr.total_bytes,
+        "truncated": stdout.truncated or stderr.truncated
+    }
+
+
+async def run_command_async(command: str, cwd: Optional[str] = None, timeout: float = 30,
+                            max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+                            on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                            env: Optional[Dict[str, str]] = None,
+                            cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+    """
+    执行命令并返回最终结果
+
+    参数:
+        command: 要执行的命令
+        cwd: 工作目录
+        timeout: 超时时间（秒）
+        max_output_bytes: 每个输出流最多保留的字节数
+        on_event: 每个输出事件的回调函数
+        env: 环境变量
+        cancel_token: 取消令牌
+
+    返回:
+        exit 事件（去掉 type 字段）并附带 command 和 cwd
+    """
+    result: Dict[str, Any] = {}
+    async for event in stream_command(command, cwd, timeout, max_output_bytes, env, cancel_token=cancel_token):
+        if event["type"] == "exit":
+            result = {key: value for key, value in event.items() if key != "type"}
+        elif on_event is not None:
+            on_event(event)
+    return {"command": command, "cwd": cwd, **result}
+
+
+def run_sync(coroutine_factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    在同步代码中运行协程
+
+    当前线程已经有正在运行的事件循环时，在独立线程中运行，避免嵌套事件循环。
+
+    参数:
+        coroutine_factory: 创建协程的函数
+
+    返回:
+        协程的返回值
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine_factory())
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(lambda: asyncio.run(coroutine_factory())).result()
+
+
+class ConcurrentCommandRunner:
+    """
+    有限并发的命令执行器
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES):
+        """
+        初始化并发命令执行器
+
+        参数:
+            max_concurrency: 同时执行的最大命令数
+            max_output_bytes: 每个输出流最多保留的字节数
+        """
+        self.max_concurrency = max_concurrency
+        self.max_output_bytes = max_output_bytes
+
+    async def run_many_async(self, commands: List[Dict[str, Any]],
+                             on_event: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                             cancel_token: Optional[CancellationToken] = None) -> List[Dict[str, Any]]:
+        """
+        并发执行多条命令
+
+        参数:
+            commands: 命令列表，每项为 {"command": ..., "cwd": ..., "timeout": ...}
+            on_event: 输出事件回调，参数为 (命令序号, 事件)
+            cancel_token: 取消令牌，取消时终止所有正在执行的命令，尚未开始的命令不再启动
+
+        返回:
+            与输入顺序一致的结果列表；单条命令启动失败时该项包含 error 字段
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(position: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                callback = (lambda event: on_event(position, event)) if on_event else None
+                try:
+                    return await run_command_async(
+                        spec["command"],
+                        cwd=spec.get("cwd"),
+                        timeout=spec.get("timeout", 30),
+                        max_output_bytes=spec.get("max_output_bytes", self.max_output_bytes),
+                        on_event=callback,
+                        env=spec.get("env"),
+                        cancel_token=cancel_token
+                    )
+                except Exception as e:
+                    return {"command": spec.get("command"), "cwd": spec.get("cwd"), "error": str(e)}
+
+        return await asyncio.gather(*(run_one(i, spec) for i, spec in enumerate(commands)))
+
+    def run_many(self, commands: List[Dict[str, Any]],
+                 on_event: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                 cancel_token: Optional[CancellationToken] = None) -> List[Dict[str, Any]]:
+        """
+        并发执行多条命令（同步接口）
+
+        参数:
+            commands: 命令列表
+            on_event: 输出事件回调
+            cancel_token: 取消令牌
+
+        返回:
+            与输入顺序一致的结果列表
+        """
+        return run_sync(lambda: self.run_many_async(commands, on_event, cancel_token))
@@ -0,0 +1,427 @@
+"""
+全文内容索引
+
+在磁盘上（SQLite）维护工作区文件的三元组（trigram）倒排索引，用于正则表达式的
+全文查找：先从正则中提取必须出现的字面量，用它们的三元组筛选候选文件，
+再只对候选文件执行真正的正则匹配。
+
+索引按文件的 (修改时间, 大小) 增量更新：刷新时只重新索引发生变化的文件，
+删除已经不存在的文件。三元组基于ASCII小写化后的字节，因此同一个索引同时支持
+区分大小写和不区分大小写的查询。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Set, Tuple
+
+try:
+    import re._parser as sre_parse
+    from re._constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT, POSSESSIVE_REPEAT, ATOMIC_GROUP
+    _REPEAT_OPS = (MAX_REPEAT, MIN_REPEAT, POSSESSIVE_REPEAT)
+except ImportError:
+    # Python 3.10 及更早版本
+    import sre_parse
+    from sre_constants import LITERAL, SUBPATTERN, BRANCH, MAX_REPEAT, MIN_REPEAT
+    ATOMIC_GROUP = None
+    _REPEAT_OPS = (MAX_REPEAT, MIN_REPEAT)
+
+from .workspace_index import DEFAULT_EXCLUDE_DIRS, default_index_path, _subtree_bounds
+
+
+# 超过该大小的文件不建立索引
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+# 没有建立索引的大文件在查找时直接扫描的最大大小，更大的文件在结果中列为跳过
+DEFAULT_MAX_SCAN_SIZE = 16 * 1024 * 1024
+# 检查二进制文件时读取的字节数
+BINARY_CHECK_SIZE = 8192
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    root TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    indexed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram BLOB NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_trigrams_file ON trigrams(file_id);
+"""
+
+
+def extract_trigrams(data: bytes) -> Set[bytes]:
+    """
+    提取字节串中所有（小写化后的）三元组
+
+    参数:
+        data: 字节串
+
+    返回:
+        三元组集合
+    """
+    data = data.lower()
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def _required_literals(parsed) -> List[List[bytes]]:
+    """
+    从解析后的正则表达式中提取必须出现的字面量
+
+    返回的结构是"或-与"形式：外层列表中任意一个分支匹配即可，
+    每个分支内的字面量必须全部出现。返回空列表表示无法筛选。
+
+    参数:
+        parsed: sre_parse 解析得到的子模式
+
+    返回:
+        字面量分支列表
+    """
+    alternatives: List[List[bytes]] = [[]]
+    current = bytearray()
+
+    def flush():
+        if len(current) >= 3:
+            for alternative in alternatives:
+                alternative.append(bytes(current))
+        current.clear()
+
+    for op, av in parsed:
+        if op is LITERAL:
+            current.extend(chr(av).encode("utf-8"))
+            continue
+        flush()
+        if op is SUBPATTERN:
+            inner = _required_literals(av[-1])
+        elif op is ATOMIC_GROUP:
+            inner = _required_literals(av)
+        elif op in _REPEAT_OPS:
+            low, _, body = av
+            inner = _required_literals(body) if low >= 1 else [[]]
+        elif op is BRANCH:
+            inner = []
+            for branch in av[1]:
+                branch_literals = _required_literals(branch)
+                if not branch_literals or any(not literals for literals in branch_literals):
+                    # 某个分支没有字面量，整个分支结构无法用于筛选
+                    inner = [[]]
+                    break
+                inner.extend(branch_literals)
+        else:
+            continue
+
+        if not inner or inner == [[]]:
+            continue
+        if len(inner) == 1:
+            for alternative in alternatives:
+                alternative.extend(inner[0])
+        else:
+            # 分支展开为多个候选组合，数量过多时放弃该分支的约束
+            if len(alternatives) * len(inner) > 16:
+                continue
+            alternatives = [alternative + literals for alternative in alternatives for literals in inner]
+    flush()
+    return alternatives
+
+
+def query_trigrams(pattern: str) -> Optional[List[Set[bytes]]]:
+    """
+    计算正则表达式对应的三元组查询
+
+    参数:
+        pattern: 正则表达式
+
+    返回:
+        三元组集合的列表（任意一个集合全部命中即为候选），为None时表示无法筛选，需要检查所有文件
+    """
+    alternatives = _required_literals(sre_parse.parse(pattern))
+    result = []
+    for literals in alternatives:
+        trigrams: Set[bytes] = set()
+        for literal in literals:
+            trigrams |= extract_trigrams(literal)
+        if not trigrams:
+            return None
+        result.append(trigrams)
+    return result or None
+
+
+class ContentIndex:
+    """
+    基于三元组的持久化全文索引，线程安全
+    """
+
+    def __init__(self, roots: Optional[Iterable[str]] = None, index_path: Optional[str] = None,
+                 exclude_dirs: Iterable[str] = DEFAULT_EXCLUDE_DIRS, max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+        """
+        初始化全文索引
+
+        参数:
+            roots: 要索引的根目录列表，默认为当前工作目录
+            index_path: 索引数据库路径，为None时使用用户缓存目录，':memory:' 表示不持久化
+            exclude_dirs: 跳过的目录名称
+            max_file_size: 建立索引的最大文件大小（字节）
+        """
+        self.roots: List[str] = []
+        self.index_path = index_path or default_index_path("content_index.db")
+        self.exclude_dirs = set(exclude_dirs)
+        self.max_file_size = max_file_size
+        self.last_refresh: Optional[float] = None
+        self._lock = threading.RLock()
+
+        if self.index_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        if self.index_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        for root in roots if roots is not None else [os.getcwd()]:
+            self.add_root(root)
+
+    def add_root(self, root: str) -> str:
+        """
+        添加一个要索引的根目录（不会立即扫描）
+
+        参数:
+            root: 根目录路径
+
+        返回:
+            规范化后的根目录路径
+        """
+        root = os.path.abspath(root)
+        with self._lock:
+            if any(root == old or root.startswith(old + os.sep) for old in self.roots):
+                # 已经被某个根目录覆盖
+                return root
+            # 新根目录覆盖的旧根目录不再单独扫描
+            self.roots = [old for old in self.roots if not old.startswith(root + os.sep)]
+            self.roots.append(root)
+            self.last_refresh = None
+        return root
+
+    def covers(self, path: str) -> bool:
+        """
+        判断路径是否在某个根目录下
+
+        参数:
+            path: 路径
+
+        返回:
+            是否在索引范围内
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            return any(path == root or path.startswith(root + os.sep) for root in self.roots)
+
+    def close(self):
+        """
+        关闭索引数据库
+        """
+        with self._lock:
+            self._conn.close()
+
+    def _iter_files(self, root: str) -> Iterator[Tuple[str, os.stat_result]]:
+        """
+        遍历根目录下的所有普通文件
+        """
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in self.exclude_dirs:
+                                    stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                yield entry.path, entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        增量刷新索引：重新索引变化的文件，删除不存在的文件
+
+        返回:
+            刷新统计信息
+        """
+        start = time.perf_counter()
+        stats = {"files_checked": 0, "files_indexed": 0, "files_removed": 0, "files_skipped": 0}
+        with self._lock:
+            conn = self._conn
+            try:
+                for root in self.roots:
+                    known = {path: (file_id, size, mtime_ns) for file_id, path, size, mtime_ns in conn.execute(
+                        "SELECT id, path, size, mtime_ns FROM files WHERE path > ? AND path < ?",
+                        _subtree_bounds(root))}
+                    for path, st in self._iter_files(root):
+                        stats["files_checked"] += 1
+                        previous = known.pop(path, None)
+                        if previous is not None and previous[1:] == (st.st_size, st.st_mtime_ns):
+                            continue
+                        if previous is not None:
+                            self._remove_file(previous[0])
+                        if self._index_file(root, path, st):
+                            stats["files_indexed"] += 1
+                        else:
+                            stats["files_skipped"] += 1
+                    for file_id, _, _ in known.values():
+                        self._remove_file(file_id)
+                        stats["files_removed"] += 1
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self.last_refresh = time.time()
+        stats["elapsed"] = time.perf_counter() - start
+        return stats
+
+    def _index_file(self, root: str, path: str, st: os.stat_result) -> bool:
+        """
+        为单个文件建立索引（调用方需持有锁）
+
+        过大或二进制的文件也会记录在 files 表中（indexed=0），以免每次刷新都重新读取。
+
+        返回:
+            是否建立了三元组索引
+        """
+        data = None
+        if st.st_size <= self.max_file_size:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                return False
+            if b"\0" in data[:BINARY_CHECK_SIZE]:
+                data = None
+
+        cursor = self._conn.execute(
+            "INSERT INTO files (path, root, size, mtime_ns, indexed) VALUES (?, ?, ?, ?, ?)",
+            (path, root, st.st_size, st.st_mtime_ns, int(data is not None))
+        )
+        if data is None:
+            return False
+        file_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)",
+            ((trigram, file_id) for trigram in extract_trigrams(data))
+        )
+        return True
+
+    def _remove_file(self, file_id: int):
+        """
+        删除单个文件的索引（调用方需持有锁）
+        """
+        self._conn.execute("DELETE FROM trigrams WHERE file_id = ?", (file_id,))
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def candidates(self, pattern: str, path: Optional[str] = None) -> List[str]:
+        """
+        根据正则表达式筛选可能匹配的文件
+
+        参数:
+            pattern: 正则表达式
+            path: 只返回该目录下的文件
+
+        返回:
+            候选文件路径列表（按路径排序）
+        """
+        query = query_trigrams(pattern)
+        clauses, params = self._scope_clauses(path)
+        clauses.append("indexed = 1")
+        if query is not None:
+            # 任意一个分支的三元组全部命中即为候选
+            subqueries = []
+            for trigrams in query:
+                subqueries.append(
+                    f"SELECT file_id FROM trigrams WHERE trigram IN ({', '.join('?' * len(trigrams))}) "
+                    f"GROUP BY file_id HAVING COUNT(*) = ?"
+                )
+                params.extend(trigrams)
+                params.append(len(trigrams))
+            clauses.append(f"id IN ({' UNION '.join(subqueries)})")
+
+        sql = "SELECT path FROM files WHERE " + " AND ".join(clauses) + " ORDER BY path"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def oversized(self, path: Optional[str] = None) -> List[Tuple[str, int]]:
+        """
+        列出因超过 max_file_size 而没有建立三元组索引的文件，查找时需要直接扫描
+
+        参数:
+            path: 只返回该目录下的文件
+
+        返回:
+            (文件路径, 大小) 列表（按路径排序）
+        """
+        clauses, params = self._scope_clauses(path)
+        clauses.append("indexed = 0 AND size > ?")
+        params.append(self.max_file_size)
+        sql = "SELECT path, size FROM files WHERE " + " AND ".join(clauses) + " ORDER BY path"
+        with self._lock:
+            return [(row[0], row[1]) for row in self._conn.execute(sql, params)]
+
+    def _scope_clauses(self, path: Optional[str]) -> Tuple[List[str], List[Any]]:
+        """
+        限定查询范围为各根目录（以及 path）下的文件的条件
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if self.roots:
+            clauses.append("(" + " OR ".join(["(path > ? AND path < ?)"] * len(self.roots)) + ")")
+            for root in self.roots:
+                params.extend(_subtree_bounds(root))
+        if path:
+            low, high = _subtree_bounds(os.path.abspath(path))
+            clauses.append("path > ? AND path < ?")
+            params.extend([low, high])
+        return clauses, params
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取索引统计信息
+
+        返回:
+            统计信息字典
+        """
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM files WHERE indexed = 1").fetchone()[0]
+            postings = self._conn.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0]
+        return {
+            "roots": list(self.roots),
+            "index_path": self.index_path,
+            "files": files,
+            "postings": postings,
+            "last_refresh": self.last_refresh
+        }
+
+
+# 全局全文索引实例
+_content_index = None
+_content_index_lock = threading.Lock()
+
+
+def get_content_index() -> ContentIndex:
+    """
+    获取全局全文索引实例（默认索引当前工作目录）
+
+    返回:
+        全文索引实例
+    """
+    global _content_index
+    if _content_index is None:
+        with _content_index_lock:
+            if _content_index is None:
+                _content_index = ContentIndex()
+    return _content_index
@@ -0,0 +1,179 @@
+"""
+文件内容缓存
+
+在进程内缓存文件的原始字节，供文件读取工具重复使用。缓存项以
+(inode, 修改时间, 文件大小) 校验，文件在外部被修改后会自动失效；
+通过 FileWriterTool/FileAppenderTool 写入时会主动失效对应路径。
+
+缓存按总字节数做LRU淘汰，超过单项上限的大文件不进入缓存。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .line_index import stat_key
+
+
+class FileContentCache:
+    """
+    线程安全的文件内容LRU缓存
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 8 * 1024 * 1024):
+        """
+        初始化文件内容缓存
+
+        参数:
+            max_bytes: 缓存的总字节预算
+            max_entry_bytes: 单个文件可缓存的最大字节数
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        # 绝对路径 -> (状态键, 文件内容)
+        self._entries: "OrderedDict[str, Tuple[Tuple[str, int, int, int], bytes]]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    def get(self, file_path: str, st: Optional[os.stat_result] = None) -> Optional[bytes]:
+        """
+        获取缓存的文件内容
+
+        参数:
+            file_path: 文件路径
+            st: 已经获取的文件状态，为None时重新获取
+
+        返回:
+            文件内容，未命中或已失效时返回None
+        """
+        key = stat_key(file_path, st)
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(key[0])
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                # 文件已被修改，丢弃旧内容
+                self._remove(key[0])
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, file_path: str, data: bytes, st: Optional[os.stat_result] = None):
+        """
+        缓存文件内容
+
+        参数:
+            file_path: 文件路径
+            data: 文件的完整内容
+            st: 读取内容前获取的文件状态
+        """
+        if len(data) > self.max_entry_bytes:
+            return
+        key = stat_key(file_path, st)
+        with self._lock:
+            if key[0] in self._entries:
+                self._remove(key[0])
+            self._entries[key[0]] = (key, data)
+            self._current_bytes += len(data)
+            while self._current_bytes > self.max_bytes:
+                path, (_, old) = self._entries.popitem(last=False)
+                self._current_bytes -= len(old)
+                self._stats["evictions"] += 1
+
+    def load(self, file_path: str, st: Optional[os.stat_result] = None) -> Optional[bytes]:
+        """
+        获取文件内容，未命中时读取文件并写入缓存
+
+        参数:
+            file_path: 文件路径
+            st: 已经获取的文件状态，为None时重新获取
+
+        返回:
+            文件内容；文件超过单项上限时返回None，由调用方自行读取
+        """
+        if st is None:
+            st = os.stat(file_path)
+        if st.st_size > self.max_entry_bytes:
+            return None
+        data = self.get(file_path, st)
+        if data is not None:
+            return data
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        # 读取期间文件发生变化时不缓存，避免内容与状态键不一致
+        if len(data) == st.st_size and stat_key(file_path) == stat_key(file_path, st):
+            self.put(file_path, data, st)
+        return data
+
+    def invalidate(self, file_path: str):
+        """
+        使指定文件的缓存失效
+
+        参数:
+            file_path: 文件路径
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        返回:
+            统计信息字典，包含命中率
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0
+            }
+
+    def _remove(self, path: str):
+        """
+        删除缓存项（调用方需持有锁）
+        """
+        _, data = self._entries.pop(path)
+        self._current_bytes -= len(data)
+
+
+# 全局文件内容缓存
+_file_cache = None
+_file_cache_lock = threading.Lock()
+
+
+def get_file_cache() -> FileContentCache:
+    """
+    获取全局文件内容缓存实例
+
+    返回:
+        文件内容缓存实例
+    """
+    global _file_cache
+    if _file_cache is None:
+        with _file_cache_lock:
+            if _file_cache is None:
+                _file_cache = FileContentCache()
+    return _file_cache
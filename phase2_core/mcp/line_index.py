@@ -0,0 +1,219 @@
+"""
+文件换行索引
+
+为文本文件建立"行号 -> 字节偏移"的索引，使按行读取只需要一次 seek 和一次与
+目标行数成正比的读取。索引按 (路径, inode, 修改时间, 文件大小) 缓存，文件变化后
+会自动重建。
+"""
+
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Tuple, Optional, Any
+
+from .cancellation import checkpoint
+
+
+# 建立索引和反向查找时每次读取的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+def stat_key(file_path: str, st: Optional[os.stat_result] = None) -> Tuple[str, int, int, int]:
+    """
+    根据文件状态生成缓存键
+
+    参数:
+        file_path: 文件路径
+        st: 已经获取的文件状态，为None时重新获取
+
+    返回:
+        (绝对路径, inode, 修改时间(纳秒), 文件大小)
+    """
+    if st is None:
+        st = os.stat(file_path)
+    return (os.path.abspath(file_path), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class LineIndex:
+    """
+    单个文件的换行索引
+
+    offsets[i] 是第 i+1 行的起始字节偏移，最后追加文件大小作为哨兵，
+    因此第 n 行（从1开始）的字节范围为 [offsets[n-1], offsets[n])。
+    """
+
+    def __init__(self, offsets: array, file_size: int):
+        """
+        初始化换行索引
+
+        参数:
+            offsets: 每行的起始偏移（含文件大小哨兵）
+            file_size: 文件大小
+        """
+        self.offsets = offsets
+        self.file_size = file_size
+
+    @property
+    def total_lines(self) -> int:
+        """
+        文件总行数
+        """
+        return len(self.offsets) - 1
+
+    def byte_range(self, start_line: int, end_line: Optional[int] = None) -> Tuple[int, int]:
+        """
+        计算行范围对应的字节范围
+
+        参数:
+            start_line: 起始行号（从1开始，包含）
+            end_line: 结束行号（包含），为None时读到文件末尾
+
+        返回:
+            (起始偏移, 结束偏移)
+        """
+        total = self.total_lines
+        start_line = min(max(start_line, 1), total + 1)
+        if end_line is None or end_line > total:
+            end_line = total
+        end_line = max(end_line, start_line - 1)
+        return self.offsets[start_line - 1], self.offsets[end_line]
+
+    @classmethod
+    def build(cls, file_path: str, cancel_token: Any = None) -> "LineIndex":
+        """
+        扫描文件建立索引
+
+        参数:
+            file_path: 文件路径
+            cancel_token: 取消令牌，每读取一个数据块检查一次
+
+        返回:
+            换行索引
+        """
+        offsets = array("q", [0])
+        position = 0
+        with open(file_path, "rb") as f:
+            while True:
+                checkpoint(cancel_token)
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                find = chunk.find
+                index = find(b"\n")
+                while index != -1:
+                    offsets.append(position + index + 1)
+                    index = find(b"\n", index + 1)
+                position += len(chunk)
+        # 文件不以换行结尾时，最后一行的起始偏移已经在 offsets 中，只需补上哨兵
+        if offsets[-1] != position:
+            offsets.append(position)
+        return cls(offsets, position)
+
+
+class LineIndexCache:
+    """
+    换行索引的LRU缓存，线程安全
+    """
+
+    def __init__(self, max_entries: int = 64):
+        """
+        初始化缓存
+
+        参数:
+            max_entries: 最多缓存的文件数量
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int, int], LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str, st: Optional[os.stat_result] = None, cancel_token: Any = None) -> LineIndex:
+        """
+        获取文件的换行索引，必要时重新建立
+
+        参数:
+            file_path: 文件路径
+            st: 已经获取的文件状态
+            cancel_token: 取消令牌
+
+        返回:
+            换行索引
+        """
+        key = stat_key(file_path, st)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        # 在锁外扫描文件，避免阻塞其他线程
+        index = LineIndex.build(file_path, cancel_token)
+        with self._lock:
+            # 同一路径的旧版本索引已经失效
+            for old_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[old_key]
+            self._entries[key] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+def tail_offset(f, file_size: int, lines: int, cancel_token: Any = None) -> int:
+    """
+    从文件末尾向前查找最后若干行的起始偏移，不需要建立完整索引
+
+    参数:
+        f: 以二进制模式打开的文件对象
+        file_size: 文件大小
+        lines: 行数
+        cancel_token: 取消令牌，每读取一个数据块检查一次
+
+    返回:
+        最后 lines 行的起始字节偏移
+    """
+    if lines <= 0 or file_size == 0:
+        return file_size
+
+    position = file_size
+    # 文件以换行结尾时，最后一个换行不算作新的一行
+    f.seek(file_size - 1)
+    if f.read(1) == b"\n":
+        position -= 1
+
+    remaining = lines
+    while position > 0:
+        checkpoint(cancel_token)
+        read_size = min(CHUNK_SIZE, position)
+        f.seek(position - read_size)
+        chunk = f.read(read_size)
+        index = len(chunk)
+        while True:
+            index = chunk.rfind(b"\n", 0, index)
+            if index == -1:
+                break
+            remaining -= 1
+            if remaining == 0:
+                return position - read_size + index + 1
+        position -= read_size
+    return 0
+
+
+# 全局换行索引缓存
+_line_index_cache = LineIndexCache()
+
+
+def get_line_index_cache() -> LineIndexCache:
+    """
+    获取全局换行索引缓存
+
+    返回:
+        换行索引缓存实例
+    """
+    return _line_index_cache
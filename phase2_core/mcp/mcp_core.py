@@ -1,13 +1,19 @@
+import json
 import os
 import sys
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Callable, TYPE_CHECKING
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from phase2_core.architectures.llm_manager import get_llm_manager, call_llm
-from .tool_interface import get_tool_registry, ToolError
-from .tools import initialize_tools
+from .tool_interface import get_tool_registry, ToolRegistry, ToolError, ToolCancelledError, ParameterValidationError
+from .plugins import register_lazy_tools
+from .cancellation import CancellationToken, checkpoint
+
+if TYPE_CHECKING:
+    # LLM管理器依赖 requests 等较重的模块，只在创建MCP时才导入
+    from phase2_core.architectures.llm_manager import LLMManager
 
 
 class MCPError(Exception):
@@ -22,14 +28,22 @@ class MCP:
     Master Control Program，主控程序，负责协调LLM模型和工具的调用
     """
 
-    def __init__(self):
+    def __init__(self, tool_registry: Optional[ToolRegistry] = None, llm_manager: Optional["LLMManager"] = None):
         """
         初始化MCP
+
+        参数:
+            tool_registry: 工具注册表，为None时使用全局工具注册表并以延迟加载方式注册内置工具
+            llm_manager: LLM管理器，为None时使用全局LLM管理器
         """
-        self.llm_manager = get_llm_manager()
-        self.tool_registry = get_tool_registry()
-        # 初始化工具
-        initialize_tools()
+        if llm_manager is None:
+            from phase2_core.architectures.llm_manager import get_llm_manager
+            llm_manager = get_llm_manager()
+        self.llm_manager = llm_manager
+        if tool_registry is None:
+            # 注册工具描述符，工具实现在第一次执行时才导入
+            tool_registry = register_lazy_tools(get_tool_registry())
+        self.tool_registry = tool_registry
 
     def execute_task(self, task: str, context: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
         """
@@ -39,41 +53,56 @@ class MCP:
             task: 任务描述
             context: 任务上下文
             **kwargs: 额外参数
+                step_callback: 每个计划步骤完成后调用的回调函数，参数为步骤结果
+                timeout: 整个任务的时间预算（秒），LLM调用和工具执行共用
+                cancel_token: 取消令牌，与 timeout 同时指定时取较早的截止时间
 
         返回:
             执行结果字典
 
         异常:
+            ToolCancelledError: 如果任务被取消或超过时间预算
             MCPError: 如果执行失败
         """
+        cancel_token = kwargs.get("cancel_token")
+        if kwargs.get("timeout") is not None or cancel_token is not None:
+            cancel_token = CancellationToken(kwargs.get("timeout"), parent=cancel_token)
         try:
             # 1. 分析任务
-            analysis_result = self.analyze_task(task, context)
+            analysis_result = self.analyze_task(task, context, cancel_token=cancel_token)
 
             # 2. 制定执行计划
             plan = self.create_execution_plan(analysis_result)
 
             # 3. 执行计划
-            execution_result = self.execute_plan(plan, context)
+            execution_result = self.execute_plan(plan, context, step_callback=kwargs.get("step_callback"),
+                                                 cancel_token=cancel_token)
 
             # 4. 处理结果
-            final_result = self.process_result(execution_result, context)
+            final_result = self.process_result(execution_result, context, cancel_token=cancel_token)
 
             return {
                 "success": True,
                 "result": final_result,
                 "plan": plan
             }
+        except ToolCancelledError:
+            raise
         except Exception as e:
             raise MCPError(f"执行任务失败: {str(e)}")
+        finally:
+            if cancel_token is not None:
+                cancel_token.close()
 
-    def analyze_task(self, task: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def analyze_task(self, task: str, context: Optional[Dict[str, Any]] = None,
+                     cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         分析任务
 
         参数:
             task: 任务描述
             context: 任务上下文
+            cancel_token: 取消令牌
 
         返回:
             分析结果字典
@@ -99,10 +128,9 @@ class MCP:
         """
 
         # 调用LLM分析任务
-        response = call_llm(prompt)
+        response = self._call_llm(prompt, cancel_token)
 
         # 解析LLM响应
-        import json
         try:
             analysis_result = json.loads(response)
         except json.JSONDecodeError:
@@ -178,45 +206,58 @@ class MCP:
 
         return plan
 
-    def execute_plan(self, plan: List[Dict[str, Any]], context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def execute_plan(self, plan: List[Dict[str, Any]], context: Optional[Dict[str, Any]] = None,
+                     step_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     cancel_token: Optional[CancellationToken] = None) -> List[Dict[str, Any]]:
         """
         执行计划
 
         参数:
             plan: 执行计划
             context: 任务上下文
+            step_callback: 每个步骤完成后调用的回调函数，参数为步骤结果
+            cancel_token: 取消令牌，每个步骤开始前检查，并传给工具和LLM调用
 
         返回:
             执行结果列表
+
+        异常:
+            ToolCancelledError: 如果计划被取消或超过截止时间
         """
         execution_results = []
-        current_context = context or {}
+        # 复制上下文，避免不同任务或会话共享同一个可变字典
+        current_context = dict(context or {})
 
         for step in plan:
+            checkpoint(cancel_token)
             step_type = step.get("step_type")
 
             if step_type == "llm":
                 # 执行LLM步骤
-                result = self._execute_llm_step(step, current_context)
+                result = self._execute_llm_step(step, current_context, cancel_token)
             elif step_type == "tool":
                 # 执行工具步骤
-                result = self._execute_tool_step(step, current_context)
+                result = self._execute_tool_step(step, current_context, cancel_token)
             else:
                 raise MCPError(f"未知的步骤类型: {step_type}")
 
             execution_results.append(result)
             # 更新上下文
             current_context["last_result"] = result
+            if step_callback is not None:
+                step_callback(result)
 
         return execution_results
 
-    def _execute_llm_step(self, step: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _execute_llm_step(self, step: Dict[str, Any], context: Dict[str, Any],
+                          cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         执行LLM步骤
 
         参数:
             step: 步骤信息
             context: 上下文信息
+            cancel_token: 取消令牌
 
         返回:
             执行结果
@@ -225,7 +266,7 @@ class MCP:
         prompt = self._build_llm_prompt(step, context)
 
         # 调用LLM
-        response = call_llm(prompt)
+        response = self._call_llm(prompt, cancel_token)
 
         return {
             "step_type": "llm",
@@ -233,13 +274,15 @@ class MCP:
             "result": response
         }
 
-    def _execute_tool_step(self, step: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    def _execute_tool_step(self, step: Dict[str, Any], context: Dict[str, Any],
+                           cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         执行工具步骤
 
         参数:
             step: 步骤信息
             context: 上下文信息
+            cancel_token: 取消令牌
 
         返回:
             执行结果
@@ -255,11 +298,13 @@ class MCP:
             raise MCPError(f"获取工具失败: {str(e)}")
 
         # 生成工具执行参数
-        parameters = self._generate_tool_parameters(tool, context)
+        parameters = self._generate_tool_parameters(tool, context, cancel_token)
 
-        # 执行工具
+        # 执行工具（幂等工具的重复调用直接返回缓存结果）
         try:
-            tool_result = tool.execute(**parameters)
+            tool_result = self.tool_registry.execute_tool(tool_name, parameters, cancel_token=cancel_token)
+        except ToolCancelledError:
+            raise
         except Exception as e:
             raise MCPError(f"执行工具失败: {str(e)}")
 
@@ -299,20 +344,27 @@ class MCP:
 
         return prompt
 
-    def _generate_tool_parameters(self, tool: Any, context: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_tool_parameters(self, tool: Any, context: Dict[str, Any],
+                                  cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         生成工具执行参数
 
+        LLM生成的参数先经过工具参数模式的校验和类型转换；校验失败时把结构化的错误交给LLM
+        修正一次，仍然失败则放弃执行。
+
         参数:
             tool: 工具实例
             context: 上下文信息
+            cancel_token: 取消令牌
 
         返回:
-            工具执行参数
+            校验和转换后的工具执行参数
+
+        异常:
+            MCPError: 如果无法生成有效的参数
         """
-        # 获取工具参数信息
-        parameters_info = tool.get_parameters()
-        required_params = [param for param, info in parameters_info.items() if info.get("required", False)]
+        # 获取编译后的参数模式
+        schema = tool.get_schema()
 
         # 使用LLM生成参数
         prompt = f"""
@@ -320,39 +372,90 @@ class MCP:
 
         工具描述：{tool.description}
 
-        必需参数：{required_params}
+        必需参数：{schema.required}
 
-        参数信息：{parameters_info}
+        参数信息：{schema.parameters}
 
         上下文信息：{context}
 
         请返回一个JSON对象，包含所有必需的参数。
         """
+        parameters = self._parse_tool_parameters(self._call_llm(prompt, cancel_token))
 
-        # 调用LLM生成参数
-        response = call_llm(prompt)
+        try:
+            return schema.validate(parameters)
+        except ParameterValidationError as e:
+            errors = e.errors
 
-        # 解析LLM响应
-        import json
+        # 修正一次：只提供参数模式、上次的参数和错误，不再重复上下文
+        repair_prompt = f"""
+        为工具 '{tool.name}' 生成的参数没有通过校验。
+
+        参数信息：{schema.parameters}
+
+        上次生成的参数：{json.dumps(parameters, ensure_ascii=False, default=str)}
+
+        校验错误：{json.dumps(errors, ensure_ascii=False, default=str)}
+
+        请修正这些错误，返回完整的JSON参数对象。
+        """
+        parameters = self._parse_tool_parameters(self._call_llm(repair_prompt, cancel_token))
+        try:
+            return schema.validate(parameters)
+        except ParameterValidationError as e:
+            raise MCPError(f"无法生成有效的工具参数: {str(e)}")
+
+    def _call_llm(self, prompt: str, cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        调用LLM，有截止时间时以剩余时间作为请求超时
+
+        参数:
+            prompt: 提示词
+            cancel_token: 取消令牌
+
+        返回:
+            模型响应
+
+        异常:
+            ToolCancelledError: 如果调用前已取消，或调用期间超过截止时间
+        """
+        if cancel_token is None:
+            return self.llm_manager.call(prompt)
+        cancel_token.check()
+        remaining = cancel_token.remaining()
+        if remaining is None:
+            return self.llm_manager.call(prompt)
+        try:
+            return self.llm_manager.call(prompt, timeout=remaining)
+        except Exception:
+            # 请求因截止时间而超时时报告取消，而不是LLM错误
+            cancel_token.check()
+            raise
+
+    def _parse_tool_parameters(self, response: str) -> Dict[str, Any]:
+        """
+        解析LLM返回的工具参数
+
+        异常:
+            MCPError: 如果响应不是JSON对象
+        """
         try:
             parameters = json.loads(response)
         except json.JSONDecodeError:
             raise MCPError(f"无法解析LLM生成的工具参数: {response}")
-
-        # 验证必需参数
-        for param in required_params:
-            if param not in parameters:
-                raise MCPError(f"缺少必需的工具参数: {param}")
-
+        if not isinstance(parameters, dict):
+            raise MCPError(f"LLM生成的工具参数不是JSON对象: {response}")
         return parameters
 
-    def process_result(self, execution_results: List[Dict[str, Any]], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def process_result(self, execution_results: List[Dict[str, Any]], context: Optional[Dict[str, Any]] = None,
+                       cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         处理执行结果
 
         参数:
             execution_results: 执行结果列表
             context: 任务上下文
+            cancel_token: 取消令牌
 
         返回:
             处理后的结果
@@ -371,7 +474,7 @@ class MCP:
         """
 
         # 调用LLM生成摘要
-        summary = call_llm(summary_prompt)
+        summary = self._call_llm(summary_prompt, cancel_token)
 
         return {
             "summary": summary,
@@ -390,6 +493,7 @@ class MCP:
 
 # 全局MCP实例
 _mcp_instance = None
+_mcp_instance_lock = threading.Lock()
 
 
 def get_mcp() -> MCP:
@@ -401,7 +505,9 @@ def get_mcp() -> MCP:
     """
     global _mcp_instance
     if _mcp_instance is None:
-        _mcp_instance = MCP()
+        with _mcp_instance_lock:
+            if _mcp_instance is None:
+                _mcp_instance = MCP()
     return _mcp_instance
 
 
@@ -0,0 +1,258 @@
+"""
+工具参数校验
+
+把工具 get_parameters() 返回的参数模式编译成校验函数，在工具执行前完成：
+    - 类型检查和宽松转换（例如 "42" -> 42、"true" -> True、JSON字符串 -> 列表/对象）
+    - 缺失参数填充默认值，值为None的可选参数视为未提供
+    - enum 取值检查，minimum/maximum 范围检查
+    - format 为 "path" 的参数展开 ~ 并规范化为绝对路径
+
+校验失败时抛出 ParameterValidationError，其 errors 字段是结构化的错误列表，
+可以直接交给LLM修正参数。模式中未声明的参数原样保留。
+"""
+
+import json
+import os
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+from .tool_interface import ParameterValidationError
+
+
+_TRUE_STRINGS = ("true", "yes", "1", "on")
+_FALSE_STRINGS = ("false", "no", "0", "off")
+
+
+class _Invalid(Exception):
+    """
+    单个参数转换失败（内部使用）
+    """
+    pass
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Invalid()
+
+
+def _coerce_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise _Invalid()
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise _Invalid()
+
+
+def _coerce_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise _Invalid()
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise _Invalid()
+
+
+def _coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in _TRUE_STRINGS:
+            return True
+        if lowered in _FALSE_STRINGS:
+            return False
+    raise _Invalid()
+
+
+def _coerce_array(value: Any) -> list:
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith("["):
+            try:
+                parsed = json.loads(stripped)
+            except ValueError:
+                raise _Invalid()
+            if isinstance(parsed, list):
+                return parsed
+            raise _Invalid()
+        # 单个字符串视为只有一个元素的列表
+        return [value]
+    raise _Invalid()
+
+
+def _coerce_object(value: Any) -> dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            raise _Invalid()
+        if isinstance(parsed, dict):
+            return parsed
+    raise _Invalid()
+
+
+_COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "string": _coerce_string,
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean,
+    "array": _coerce_array,
+    "object": _coerce_object,
+    "any": lambda value: value,
+}
+
+
+def _normalize_path(value: str) -> str:
+    """
+    展开用户目录并规范化为绝对路径
+    """
+    return os.path.abspath(os.path.expanduser(value))
+
+
+class _CompiledParameter:
+    """
+    编译后的单个参数
+    """
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.type = spec.get("type", "any")
+        self.required = bool(spec.get("required", False))
+        self.has_default = "default" in spec
+        self.default = spec.get("default")
+        self.enum = tuple(spec["enum"]) if spec.get("enum") else None
+        self.minimum = spec.get("minimum")
+        self.maximum = spec.get("maximum")
+        self.is_path = spec.get("format") == "path"
+        self.coerce = _COERCERS.get(self.type, _COERCERS["any"])
+
+    def check(self, value: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """
+        检查并转换参数值
+
+        返回:
+            (转换后的值, 错误)，没有错误时错误为None
+        """
+        try:
+            value = self.coerce(value)
+        except _Invalid:
+            return value, self._error("invalid_type", f"参数 '{self.name}' 应为 {self.type} 类型",
+                                      expected=self.type, value=value)
+        if self.enum is not None and value not in self.enum:
+            return value, self._error("invalid_choice", f"参数 '{self.name}' 只能是 {list(self.enum)} 之一",
+                                      expected=list(self.enum), value=value)
+        if self.minimum is not None and value < self.minimum:
+            return value, self._error("out_of_range", f"参数 '{self.name}' 不能小于 {self.minimum}",
+                                      expected=f">= {self.minimum}", value=value)
+        if self.maximum is not None and value > self.maximum:
+            return value, self._error("out_of_range", f"参数 '{self.name}' 不能大于 {self.maximum}",
+                                      expected=f"<= {self.maximum}", value=value)
+        if self.is_path:
+            value = _normalize_path(value)
+        return value, None
+
+    def _error(self, code: str, message: str, expected: Any = None, value: Any = None) -> Dict[str, Any]:
+        error = {"parameter": self.name, "code": code, "message": message}
+        if expected is not None:
+            error["expected"] = expected
+        if value is not None:
+            # 避免把很长的值（例如文件内容）放进错误信息
+            error["value"] = value if not isinstance(value, str) or len(value) <= 200 else value[:200] + "..."
+        return error
+
+
+class CompiledSchema:
+    """
+    编译后的工具参数模式，可以在多个线程中并发使用
+    """
+
+    def __init__(self, tool_name: str, parameters: Dict[str, Any]):
+        """
+        编译参数模式
+
+        参数:
+            tool_name: 工具名称（用于错误信息）
+            parameters: get_parameters() 返回的参数模式
+        """
+        self.tool_name = tool_name
+        self.parameters = parameters
+        self._compiled = [_CompiledParameter(name, spec) for name, spec in parameters.items()]
+
+    @property
+    def required(self) -> List[str]:
+        """
+        必需参数列表
+        """
+        return [param.name for param in self._compiled if param.required]
+
+    def validate(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        校验并转换参数
+
+        参数:
+            values: 原始参数
+
+        返回:
+            转换后的新参数字典（已填充默认值）
+
+        异常:
+            ParameterValidationError: 如果有参数无效，errors 中包含所有错误
+        """
+        if not isinstance(values, dict):
+            raise ParameterValidationError(self.tool_name, [
+                {"parameter": None, "code": "invalid_type", "message": "参数必须是JSON对象", "expected": "object"}
+            ])
+
+        result = dict(values)
+        errors = []
+        for param in self._compiled:
+            value = result.get(param.name)
+            if value is None:
+                result.pop(param.name, None)
+                if param.required:
+                    errors.append({"parameter": param.name, "code": "missing", "message": f"缺少必需参数 '{param.name}'"})
+                elif param.has_default:
+                    result[param.name] = param.default
+                continue
+            value, error = param.check(value)
+            if error is not None:
+                errors.append(error)
+            else:
+                result[param.name] = value
+
+        if errors:
+            raise ParameterValidationError(self.tool_name, errors)
+        return result
+
+
+def compile_schema(tool_name: str, parameters: Dict[str, Any]) -> CompiledSchema:
+    """
+    编译工具参数模式
+
+    参数:
+        tool_name: 工具名称
+        parameters: 参数模式
+
+    返回:
+        编译后的参数模式
+    """
+    return CompiledSchema(tool_name, parameters)
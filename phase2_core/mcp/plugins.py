@@ -0,0 +1,346 @@
+"""
+插件式工具加载
+
+工具以轻量的描述符（名称、描述、参数模式、实现所在的模块和类）注册到工具注册表，
+实现模块在工具第一次执行时才被导入和实例化。获取工具列表、生成提示词等只需要描述符的
+操作不会导入任何工具实现。
+
+描述符来源:
+    - 清单文件：JSON数组，内置工具的清单为同目录下的 tool_manifest.json
+    - 入口点：第三方包在 "learn_agent.tool_manifests" 组中声明入口点，指向一个描述符字典列表
+      （或返回该列表的函数）；入口点所在的模块应当足够轻量，不要导入工具实现
+
+描述符格式:
+    {
+        "name": "file_reader",
+        "description": "...",
+        "module": "phase2_core.mcp.tools",
+        "class": "FileReaderTool",
+        "options": {},              # 可选，传给工具构造函数的参数
+        "parameters": {...}         # 与 get_parameters() 的返回值一致
+    }
+
+内置工具修改参数后需要重新生成清单:
+    python -m phase2_core.mcp.plugins --write
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+from typing import Dict, Any, Optional, List
+
+from .tool_interface import BaseTool, ToolError, ToolRegistry
+
+
+# 内置工具清单路径
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_manifest.json")
+# 第三方工具清单的入口点组
+ENTRY_POINT_GROUP = "learn_agent.tool_manifests"
+
+
+class ToolDescriptor:
+    """
+    工具描述符
+    """
+
+    def __init__(self, name: str, description: str, module: str, class_name: str,
+                 parameters: Dict[str, Any], options: Optional[Dict[str, Any]] = None):
+        """
+        初始化工具描述符
+
+        参数:
+            name: 工具名称
+            description: 工具描述
+            module: 实现所在的模块
+            class_name: 实现类名
+            parameters: 参数模式
+            options: 传给工具构造函数的参数
+        """
+        self.name = name
+        self.description = description
+        self.module = module
+        self.class_name = class_name
+        self.parameters = parameters
+        self.options = options or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ToolDescriptor":
+        """
+        从字典创建描述符
+
+        参数:
+            data: 描述符字典
+
+        返回:
+            描述符实例
+
+        异常:
+            ToolError: 如果缺少必要字段
+        """
+        missing = [key for key in ("name", "description", "module", "class") if not data.get(key)]
+        if missing:
+            raise ToolError(f"工具描述符缺少字段: {', '.join(missing)}")
+        return cls(
+            name=data["name"],
+            description=data["description"],
+            module=data["module"],
+            class_name=data["class"],
+            parameters=data.get("parameters") or {},
+            options=data.get("options")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+
+        返回:
+            描述符字典
+        """
+        data = {
+            "name": self.name,
+            "description": self.description,
+            "module": self.module,
+            "class": self.class_name
+        }
+        if self.options:
+            data["options"] = self.options
+        data["parameters"] = self.parameters
+        return data
+
+
+class LazyTool(BaseTool):
+    """
+    延迟加载的工具代理
+
+    名称、描述和参数来自描述符；第一次执行（或访问实现相关的属性）时导入模块并实例化工具，
+    之后的调用全部转发给实际的工具实例。加载过程是线程安全的。
+    """
+
+    def __init__(self, descriptor: ToolDescriptor):
+        """
+        初始化延迟加载的工具
+
+        参数:
+            descriptor: 工具描述符
+        """
+        super().__init__(descriptor.name, descriptor.description)
+        self.descriptor = descriptor
+        self._tool: Optional[BaseTool] = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """
+        实现是否已经加载
+        """
+        return self._tool is not None
+
+    def load(self) -> BaseTool:
+        """
+        导入并实例化工具实现
+
+        返回:
+            实际的工具实例
+
+        异常:
+            ToolError: 如果导入或实例化失败
+        """
+        if self._tool is not None:
+            return self._tool
+        with self._load_lock:
+            if self._tool is None:
+                descriptor = self.descriptor
+                try:
+                    module = importlib.import_module(descriptor.module)
+                    tool = getattr(module, descriptor.class_name)(**descriptor.options)
+                except Exception as e:
+                    raise ToolError(f"加载工具 '{descriptor.name}' 失败: {str(e)}")
+                if tool.name != descriptor.name:
+                    raise ToolError(f"工具 '{descriptor.name}' 的实现名称为 '{tool.name}'，与描述符不一致")
+                self._tool = tool
+        return self._tool
+
+    def execute(self, **kwargs) -> Dict[str, Any]:
+        """
+        执行工具（第一次执行时加载实现）
+        """
+        return self.load().execute(**kwargs)
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """
+        获取工具参数信息（不加载实现）
+        """
+        return self.descriptor.parameters
+
+    @property
+    def cpu_bound(self) -> bool:
+        return self.load().cpu_bound
+
+    @property
+    def idempotent(self) -> bool:
+        return self.load().idempotent
+
+    @property
+    def cache_ttl(self) -> Optional[float]:
+        return self.load().cache_ttl
+
+    def cache_dependencies(self, **kwargs) -> Optional[List[str]]:
+        return self.load().cache_dependencies(**kwargs)
+
+    def invalidated_paths(self, **kwargs) -> Optional[List[str]]:
+        return self.load().invalidated_paths(**kwargs)
+
+    def io_metrics(self, result: Dict[str, Any], **kwargs) -> Dict[str, float]:
+        return self.load().io_metrics(result, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # 其他属性（如 CommandExecutorTool.execute_many）转发给实际的工具实例
+        if name.startswith("_") or name == "descriptor":
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __reduce__(self):
+        # 在进程池中按描述符重新创建，子进程中再加载实现
+        return LazyTool, (self.descriptor,)
+
+
+def load_manifest(manifest_path: str = DEFAULT_MANIFEST_PATH) -> List[ToolDescriptor]:
+    """
+    读取工具清单文件
+
+    参数:
+        manifest_path: 清单文件路径
+
+    返回:
+        描述符列表
+
+    异常:
+        ToolError: 如果清单文件无法读取或格式错误
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ToolError(f"读取工具清单失败: {str(e)}")
+    if not isinstance(data, list):
+        raise ToolError(f"工具清单格式错误: {manifest_path}")
+    return [ToolDescriptor.from_dict(item) for item in data]
+
+
+def discover_entry_points(group: str = ENTRY_POINT_GROUP) -> List[ToolDescriptor]:
+    """
+    从已安装包的入口点发现工具描述符
+
+    参数:
+        group: 入口点组名
+
+    返回:
+        描述符列表；无法加载的入口点会被跳过
+    """
+    from importlib.metadata import entry_points
+
+    descriptors = []
+    for ep in entry_points(group=group):
+        try:
+            manifest = ep.load()
+            if callable(manifest):
+                manifest = manifest()
+            descriptors.extend(ToolDescriptor.from_dict(item) for item in manifest)
+        except Exception as e:
+            print(f"加载工具入口点 '{ep.name}' 失败: {str(e)}")
+    return descriptors
+
+
+def register_lazy_tools(registry: ToolRegistry, manifest_path: Optional[str] = DEFAULT_MANIFEST_PATH,
+                        use_entry_points: Optional[bool] = None) -> ToolRegistry:
+    """
+    以延迟加载的方式注册清单和入口点中的工具
+
+    已注册的同名工具会被保留，重复调用是安全的。
+    扫描入口点需要导入 importlib.metadata 并遍历所有已安装的包，开销与内置工具的导入相当，
+    因此默认关闭，可通过参数或环境变量 LEARN_AGENT_TOOL_ENTRY_POINTS=1 开启。
+
+    参数:
+        registry: 目标工具注册表
+        manifest_path: 清单文件路径，为None时不读取清单
+        use_entry_points: 是否从入口点发现第三方工具，为None时读取环境变量
+
+    返回:
+        完成注册的工具注册表
+    """
+    descriptors = load_manifest(manifest_path) if manifest_path else []
+    if use_entry_points is None:
+        use_entry_points = os.environ.get("LEARN_AGENT_TOOL_ENTRY_POINTS", "") in ("1", "true", "yes")
+    if use_entry_points:
+        descriptors.extend(discover_entry_points())
+    for descriptor in descriptors:
+        registry.register_tool(LazyTool(descriptor), exist_ok=True)
+    return registry
+
+
+def build_manifest() -> List[Dict[str, Any]]:
+    """
+    根据内置工具的实现生成清单
+
+    返回:
+        描述符字典列表
+    """
+    from .tools import initialize_tools
+
+    registry = initialize_tools(ToolRegistry())
+    return [
+        ToolDescriptor(
+            name=tool.name,
+            description=tool.description,
+            module=type(tool).__module__,
+            class_name=type(tool).__name__,
+            parameters=tool.get_parameters()
+        ).to_dict()
+        for tool in registry.get_all_tools().values()
+    ]
+
+
+def check_manifest(manifest_path: str = DEFAULT_MANIFEST_PATH) -> List[str]:
+    """
+    检查清单是否与内置工具的实现一致
+
+    参数:
+        manifest_path: 清单文件路径
+
+    返回:
+        不一致的工具名称列表，为空表示一致
+    """
+    expected = {item["name"]: item for item in build_manifest()}
+    actual = {descriptor.name: descriptor.to_dict() for descriptor in load_manifest(manifest_path)}
+    return sorted(name for name in expected.keys() | actual.keys() if expected.get(name) != actual.get(name))
+
+
+def main():
+    """
+    命令行入口：生成或检查内置工具清单
+    """
+    parser = argparse.ArgumentParser(description="生成或检查内置工具清单")
+    parser.add_argument("--write", action="store_true", help="重新生成清单文件")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="清单文件路径")
+    args = parser.parse_args()
+
+    if args.write:
+        with open(args.manifest, 'w', encoding='utf-8') as f:
+            json.dump(build_manifest(), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"已写入工具清单: {args.manifest}")
+        return
+
+    mismatched = check_manifest(args.manifest)
+    if mismatched:
+        print(f"工具清单与实现不一致: {', '.join(mismatched)}")
+        print("请运行 python -m phase2_core.mcp.plugins --write 重新生成")
+        sys.exit(1)
+    print("工具清单与实现一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+工具结果缓存
+
+由 ToolRegistry.execute_tool 使用的记忆化层，依据工具声明的元数据决定是否缓存：
+
+    idempotent                      结果只取决于参数和文件系统状态时为True
+    cache_ttl                       缓存有效期（秒），为None时不过期
+    cache_dependencies(**params)    结果依赖的路径列表；缓存命中前会比较这些路径的状态
+                                    (inode, 修改时间, 大小)，返回None表示本次调用不缓存
+    invalidated_paths(**params)     写入类工具会修改的路径；返回None表示影响未知，清空全部缓存
+
+路径失效时，依赖该路径、其上级目录或其下级路径的缓存项都会被删除；
+没有声明依赖路径的缓存项在任何写入后都会失效。
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+
+def _path_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    获取路径的状态签名，路径不存在时返回None
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _paths_overlap(a: str, b: str) -> bool:
+    """
+    两个路径是否相同或存在上下级关系
+    """
+    if a == b:
+        return True
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return longer.startswith(shorter.rstrip(os.sep) + os.sep)
+
+
+class _CacheEntry:
+    """
+    一个缓存项
+    """
+
+    def __init__(self, result: Dict[str, Any], dependencies: List[str],
+                 signatures: List[Optional[Tuple[int, int, int]]], expires_at: Optional[float]):
+        self.result = result
+        self.dependencies = dependencies
+        self.signatures = signatures
+        self.expires_at = expires_at
+
+
+class ToolResultCache:
+    """
+    线程安全的工具结果LRU缓存
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        初始化工具结果缓存
+
+        参数:
+            max_entries: 最多缓存的结果数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "expirations": 0}
+
+    def call(self, tool: Any, parameters: Dict[str, Any], func: Optional[Callable[[], Dict[str, Any]]] = None
+             ) -> Dict[str, Any]:
+        """
+        通过缓存执行工具
+
+        参数:
+            tool: 工具实例
+            parameters: 工具参数
+            func: 实际执行工具的函数，为None时调用 tool.execute(**parameters)
+
+        返回:
+            工具执行结果（命中缓存时返回副本）
+        """
+        if func is None:
+            func = lambda: tool.execute(**parameters)
+
+        if not tool.idempotent:
+            try:
+                return func()
+            finally:
+                # 写入可能已经部分完成，无论成功与否都需要失效
+                self.invalidate_paths(tool.invalidated_paths(**parameters))
+
+        dependencies = tool.cache_dependencies(**parameters)
+        key = self._make_key(tool.name, parameters) if dependencies is not None else None
+        if key is None:
+            return func()
+
+        dependencies = [os.path.abspath(path) for path in dependencies]
+        signatures = [_path_signature(path) for path in dependencies]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self._stats["expirations"] += 1
+                elif entry.signatures == signatures:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return copy.deepcopy(entry.result)
+                else:
+                    del self._entries[key]
+            self._stats["misses"] += 1
+
+        result = func()
+        # 只缓存成功的结果，且执行期间依赖没有发生变化
+        if result.get("success") and [_path_signature(path) for path in dependencies] == signatures:
+            expires_at = time.monotonic() + tool.cache_ttl if tool.cache_ttl is not None else None
+            with self._lock:
+                self._entries[key] = _CacheEntry(copy.deepcopy(result), dependencies, signatures, expires_at)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def invalidate_paths(self, paths: Optional[List[str]]):
+        """
+        使依赖指定路径的缓存项失效
+
+        参数:
+            paths: 被修改的路径列表，为None时清空全部缓存
+        """
+        with self._lock:
+            if paths is None:
+                removed = list(self._entries)
+            else:
+                paths = [os.path.abspath(path) for path in paths]
+                if not paths:
+                    return
+                removed = [
+                    key for key, entry in self._entries.items()
+                    if not entry.dependencies or any(
+                        _paths_overlap(dependency, path) for dependency in entry.dependencies for path in paths)
+                ]
+            for key in removed:
+                del self._entries[key]
+            self._stats["invalidations"] += len(removed)
+
+    def invalidate_tool(self, tool_name: str):
+        """
+        使某个工具的所有缓存项失效
+
+        参数:
+            tool_name: 工具名称
+        """
+        with self._lock:
+            removed = [key for key in self._entries if key[0] == tool_name]
+            for key in removed:
+                del self._entries[key]
+            self._stats["invalidations"] += len(removed)
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        返回:
+            统计信息字典，包含命中率
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0
+            }
+
+    @staticmethod
+    def _make_key(tool_name: str, parameters: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """
+        生成缓存键，参数无法序列化时返回None
+        """
+        try:
+            return tool_name, json.dumps(parameters, sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,154 @@
+"""
+MCP运行时
+
+MCPRuntime 持有所有会话共享的只读工具目录和LLM连接池，并为每个会话创建
+轻量的 MCP 实例。
+
+并发约定:
+    - MCPRuntime 的所有公开方法都可以在多个线程中并发调用。
+    - 工具目录在初始化完成后被冻结，之后只读，不需要额外加锁即可共享。
+    - LLM管理器（包含HTTP连接池）由所有会话共享，连接池大小由 pool_maxsize 控制。
+    - 每个 MCP 会话只应在同一时刻被一个线程使用；会话之间不共享任何可变上下文。
+    - 工具实例本身应该是无状态的，同一工具可能在多个线程中同时执行。
+"""
+
+import threading
+import uuid
+from typing import Dict, Any, Optional, List, TYPE_CHECKING
+
+from .tool_interface import ToolRegistry
+from .plugins import register_lazy_tools
+from .mcp_core import MCP
+
+if TYPE_CHECKING:
+    from phase2_core.architectures.llm_manager import LLMManager
+
+
+class MCPRuntime:
+    """
+    多会话MCP运行时，负责共享资源的初始化和会话的创建
+    """
+
+    def __init__(self, llm_manager: Optional["LLMManager"] = None, pool_maxsize: int = 32):
+        """
+        初始化MCP运行时
+
+        共享资源在第一次使用时才会创建，创建过程是线程安全的。
+
+        参数:
+            llm_manager: 共享的LLM管理器，为None时自动创建
+            pool_maxsize: 自动创建LLM管理器时使用的HTTP连接池大小
+        """
+        self.pool_maxsize = pool_maxsize
+        self._llm_manager = llm_manager
+        self._tool_registry: Optional[ToolRegistry] = None
+        self._init_lock = threading.Lock()
+        self._sessions_lock = threading.Lock()
+        self._session_count = 0
+
+    def _ensure_initialized(self):
+        """
+        初始化共享的工具目录和LLM管理器（只执行一次）
+        """
+        if self._tool_registry is not None:
+            return
+        with self._init_lock:
+            if self._tool_registry is not None:
+                return
+            if self._llm_manager is None:
+                from phase2_core.architectures.llm_manager import LLMManager
+                self._llm_manager = LLMManager(pool_maxsize=self.pool_maxsize)
+            # 只注册工具描述符，工具实现在第一次执行时才导入
+            registry = register_lazy_tools(ToolRegistry())
+            registry.freeze()
+            # 最后赋值，保证其他线程看到的目录已经完整初始化
+            self._tool_registry = registry
+
+    @property
+    def tool_registry(self) -> ToolRegistry:
+        """
+        共享的只读工具目录
+        """
+        self._ensure_initialized()
+        return self._tool_registry
+
+    @property
+    def llm_manager(self) -> "LLMManager":
+        """
+        共享的LLM管理器
+        """
+        self._ensure_initialized()
+        return self._llm_manager
+
+    def create_session(self, session_id: Optional[str] = None) -> MCP:
+        """
+        创建一个新的MCP会话
+
+        参数:
+            session_id: 会话ID，为None时自动生成
+
+        返回:
+            绑定到共享工具目录和LLM管理器的MCP实例
+        """
+        self._ensure_initialized()
+        session = MCP(tool_registry=self._tool_registry, llm_manager=self._llm_manager)
+        session.session_id = session_id or uuid.uuid4().hex
+        with self._sessions_lock:
+            self._session_count += 1
+        return session
+
+    def execute_task(self, task: str, context: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        在一个新的会话中执行任务
+
+        参数:
+            task: 任务描述
+            context: 任务上下文
+            **kwargs: 额外参数
+
+        返回:
+            执行结果字典
+
+        异常:
+            MCPError: 如果执行失败
+        """
+        return self.create_session().execute_task(task, context, **kwargs)
+
+    def get_available_tools(self) -> List[Dict[str, Any]]:
+        """
+        获取所有可用的工具
+
+        返回:
+            工具信息列表
+        """
+        return self.tool_registry.get_tool_info_list()
+
+    def get_session_count(self) -> int:
+        """
+        获取已创建的会话数量
+
+        返回:
+            会话数量
+        """
+        with self._sessions_lock:
+            return self._session_count
+
+
+# 全局MCP运行时实例
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> MCPRuntime:
+    """
+    获取全局MCP运行时实例
+
+    返回:
+        MCP运行时实例
+    """
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = MCPRuntime()
+    return _runtime
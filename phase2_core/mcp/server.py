@@ -0,0 +1,619 @@
+"""
+MCP本地服务器
+
+通过 JSON-RPC 2.0 over HTTP 对外提供 MCP 的能力，仅使用标准库实现。
+
+接口:
+    POST /rpc       普通JSON-RPC调用，返回一个JSON响应
+    POST /stream    流式JSON-RPC调用，以分块传输返回NDJSON事件
+                    (queued / started / step / result / error)
+    GET  /health    服务状态（队列长度、工作协程数量等）
+    GET  /metrics   服务状态、工具性能指标和结果缓存统计
+
+支持的方法:
+    execute_task(task, context=None)      执行任务（进入队列）
+    execute_tool(tool_name, parameters)   直接执行某个工具（进入队列）
+    execute_tools(calls, max_workers=8)   批量执行多个工具调用（进入队列）
+    get_available_tools()                 获取所有可用的工具
+    get_tool_info(tool_name)              获取单个工具的信息
+    get_tool_stats(tool_name=None)        获取工具性能指标
+
+请求在有界队列中排队，队列已满时立即返回 SERVER_BUSY（HTTP 503），由客户端负责退避重试。
+每个请求都有截止时间，可通过请求头 X-Request-Timeout（秒）指定，超时返回 DEADLINE_EXCEEDED。
+X-Request-Timeout 必须是正的有限数，否则返回HTTP 400；超过服务器的 max_timeout 时按 max_timeout 处理。
+任务本身在线程池中执行，并收到一个与请求截止时间一致的取消令牌；超时或客户端断开时令牌被取消，
+正在执行的工具在下一个检查点停止，正在运行的命令的进程组被终止。
+
+启动方式:
+    python -m phase2_core.mcp.server --host 127.0.0.1 --port 8765
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from .tool_interface import ToolError, ToolCancelledError, ParameterValidationError
+from .mcp_core import MCPError
+from .cancellation import CancellationToken
+from .runtime import MCPRuntime, get_runtime
+
+
+# JSON-RPC错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+EXECUTION_ERROR = -32000
+SERVER_BUSY = -32001
+DEADLINE_EXCEEDED = -32002
+
+# 错误码对应的HTTP状态码
+_HTTP_STATUS = {
+    PARSE_ERROR: 400,
+    INVALID_REQUEST: 400,
+    SERVER_BUSY: 503,
+    DEADLINE_EXCEEDED: 504
+}
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+
+class RPCError(Exception):
+    """
+    JSON-RPC调用异常
+    """
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为JSON-RPC错误对象
+        """
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+class _HTTPError(Exception):
+    """
+    无法处理的HTTP请求（在读取请求时发现），直接以对应的状态码响应
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _Job:
+    """
+    队列中的一个待执行请求
+    """
+
+    def __init__(self, func: Callable[..., Any], deadline: float, events: Optional[asyncio.Queue]):
+        self.func = func
+        self.deadline = deadline
+        self.events = events
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_time = time.monotonic()
+        # 与请求截止时间一致的取消令牌，传给任务函数
+        self.cancel_token = CancellationToken(max(deadline - self.enqueued_time, 0.0))
+
+
+class MCPServer:
+    """
+    基于asyncio的MCP JSON-RPC服务器
+    """
+
+    def __init__(self, runtime: Optional[MCPRuntime] = None, host: str = "127.0.0.1", port: int = 8765,
+                 workers: int = 4, queue_size: int = 64, default_timeout: float = 60.0,
+                 max_body_size: int = 1024 * 1024, max_timeout: float = 600.0):
+        """
+        初始化服务器
+
+        参数:
+            runtime: MCP运行时，为None时使用全局运行时
+            host: 监听地址
+            port: 监听端口，为0时由系统分配
+            workers: 并发执行请求的工作协程（及线程）数量
+            queue_size: 等待队列的最大长度，超过后拒绝新请求
+            default_timeout: 默认请求截止时间（秒）
+            max_body_size: 请求体的最大字节数
+            max_timeout: 请求头 X-Request-Timeout 允许的最长截止时间（秒），更大的值按该值处理
+        """
+        self.runtime = runtime or get_runtime()
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.default_timeout = default_timeout
+        self.max_body_size = max_body_size
+        self.max_timeout = max_timeout
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {
+            "requests": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "errors": 0
+        }
+
+    async def start(self):
+        """
+        启动服务器和工作协程
+        """
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mcp-server")
+        self._worker_tasks = [asyncio.create_task(self._worker_loop()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # 端口为0时记录实际分配的端口
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        停止服务器
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def serve_forever(self):
+        """
+        启动服务器并一直运行
+        """
+        await self.start()
+        print(f"MCP服务器已启动: http://{self.host}:{self.port}")
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    # ---- 方法实现 ----
+
+    def _resolve_method(self, method: str, params: Any) -> Tuple[bool, Callable[..., Any]]:
+        """
+        解析JSON-RPC方法
+
+        参数:
+            method: 方法名
+            params: 方法参数
+
+        返回:
+            (是否需要进入队列, 无参可调用对象)，可调用对象接受可选的步骤回调和取消令牌
+
+        异常:
+            RPCError: 如果方法不存在或参数无效
+        """
+        if params is None:
+            params = {}
+        if not isinstance(params, dict):
+            raise RPCError(INVALID_PARAMS, "params 必须是对象")
+
+        if method == "get_available_tools":
+            return False, lambda step_callback=None, cancel_token=None: self.runtime.get_available_tools()
+
+        if method == "get_tool_info":
+            tool_name = params.get("tool_name")
+            if not isinstance(tool_name, str):
+                raise RPCError(INVALID_PARAMS, "缺少参数: tool_name")
+            return False, lambda step_callback=None, cancel_token=None: self.runtime.tool_registry.get_tool(tool_name).get_info()
+
+        if method == "get_tool_stats":
+            tool_name = params.get("tool_name")
+            if tool_name is not None and not isinstance(tool_name, str):
+                raise RPCError(INVALID_PARAMS, "tool_name 必须是字符串")
+            return False, lambda step_callback=None, cancel_token=None: self.runtime.tool_registry.get_tool_stats(tool_name)
+
+        if method == "execute_task":
+            task = params.get("task")
+            if not isinstance(task, str):
+                raise RPCError(INVALID_PARAMS, "缺少参数: task")
+            context = params.get("context")
+
+            def run_task(step_callback=None, cancel_token=None):
+                return self.runtime.execute_task(task, context, step_callback=step_callback, cancel_token=cancel_token)
+            return True, run_task
+
+        if method == "execute_tool":
+            tool_name = params.get("tool_name")
+            parameters = params.get("parameters") or {}
+            if not isinstance(tool_name, str) or not isinstance(parameters, dict):
+                raise RPCError(INVALID_PARAMS, "缺少参数: tool_name 或 parameters 格式错误")
+
+            def run_tool(step_callback=None, cancel_token=None):
+                return self.runtime.tool_registry.execute_tool(tool_name, parameters, cancel_token=cancel_token)
+            return True, run_tool
+
+        if method == "execute_tools":
+            calls = params.get("calls")
+            max_workers = params.get("max_workers", 8)
+            if not isinstance(calls, list) or not all(isinstance(call, dict) for call in calls):
+                raise RPCError(INVALID_PARAMS, "缺少参数: calls 或 calls 格式错误")
+            if not isinstance(max_workers, int) or max_workers < 1:
+                raise RPCError(INVALID_PARAMS, "max_workers 必须是正整数")
+
+            def run_tools(step_callback=None, cancel_token=None):
+                return self.runtime.tool_registry.execute_many(calls, max_workers=max_workers, executor="thread",
+                                                               cancel_token=cancel_token)
+            return True, run_tools
+
+        raise RPCError(METHOD_NOT_FOUND, f"方法不存在: {method}")
+
+    # ---- 队列和工作协程 ----
+
+    def _submit(self, func: Callable[..., Any], deadline: float, events: Optional[asyncio.Queue]) -> _Job:
+        """
+        将请求放入等待队列
+
+        异常:
+            RPCError: 如果队列已满
+        """
+        job = _Job(func, deadline, events)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise RPCError(SERVER_BUSY, "服务器繁忙，请稍后重试")
+        return job
+
+    async def _worker_loop(self):
+        """
+        工作协程：从队列取出请求，在线程池中执行
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(loop, job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, loop: asyncio.AbstractEventLoop, job: _Job):
+        """
+        执行一个请求并设置其结果
+        """
+        # 调用方已经超时或断开，直接跳过
+        if job.future.done():
+            return
+        remaining = job.deadline - time.monotonic()
+        if remaining <= 0:
+            job.future.set_exception(RPCError(DEADLINE_EXCEEDED, "请求在队列中等待超时"))
+            return
+
+        step_callback = None
+        if job.events is not None:
+            events = job.events
+            events.put_nowait({"event": "started", "queue_wait": time.monotonic() - job.enqueued_time})
+
+            def step_callback(step_result):
+                loop.call_soon_threadsafe(events.put_nowait, {"event": "step", "step": step_result})
+
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self._executor,
+                                     lambda: job.func(step_callback=step_callback, cancel_token=job.cancel_token)),
+                remaining
+            )
+        except asyncio.TimeoutError:
+            # 通知仍在线程池中执行的任务尽快停止
+            job.cancel_token.cancel("请求执行超时")
+            if not job.future.done():
+                job.future.set_exception(RPCError(DEADLINE_EXCEEDED, "请求执行超时"))
+            return
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        if not job.future.done():
+            job.future.set_result(result)
+
+    # ---- 请求处理 ----
+
+    async def _call(self, request: Any, deadline: float, events: Optional[asyncio.Queue] = None) -> Any:
+        """
+        处理一个JSON-RPC请求，返回方法执行结果
+
+        异常:
+            RPCError: 如果调用失败
+        """
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            raise RPCError(INVALID_REQUEST, "无效的JSON-RPC请求")
+
+        queued, func = self._resolve_method(request["method"], request.get("params"))
+        try:
+            if not queued:
+                return func()
+
+            job = self._submit(func, deadline, events)
+            if events is not None:
+                events.put_nowait({"event": "queued", "queue_depth": self._queue.qsize()})
+            try:
+                return await asyncio.wait_for(asyncio.shield(job.future), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                job.future.cancel()
+                job.cancel_token.cancel("请求执行超时")
+                raise RPCError(DEADLINE_EXCEEDED, "请求执行超时")
+            except asyncio.CancelledError:
+                # 客户端已断开
+                job.future.cancel()
+                job.cancel_token.cancel("客户端已断开")
+                raise
+        except RPCError as e:
+            if e.code == DEADLINE_EXCEEDED:
+                self.stats["timeouts"] += 1
+            raise
+        except ToolCancelledError as e:
+            if e.deadline_exceeded:
+                self.stats["timeouts"] += 1
+                raise RPCError(DEADLINE_EXCEEDED, str(e))
+            self.stats["errors"] += 1
+            raise RPCError(EXECUTION_ERROR, str(e))
+        except ParameterValidationError as e:
+            self.stats["errors"] += 1
+            raise RPCError(INVALID_PARAMS, str(e), e.to_dict())
+        except (MCPError, ToolError) as e:
+            self.stats["errors"] += 1
+            raise RPCError(EXECUTION_ERROR, str(e))
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise RPCError(INTERNAL_ERROR, str(e))
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        处理一个HTTP连接（每个连接处理一个请求）
+        """
+        try:
+            try:
+                request_line, headers, body = await self._read_http_request(reader)
+            except _HTTPError as e:
+                await self._write_response(writer, e.status, {"error": e.message})
+                return
+            if request_line is None:
+                return
+            method, path = request_line
+            self.stats["requests"] += 1
+
+            if method == "GET" and path == "/health":
+                await self._write_response(writer, 200, self.get_status())
+                return
+            if method == "GET" and path == "/metrics":
+                await self._write_response(writer, 200, self.get_metrics())
+                return
+            if path not in ("/rpc", "/stream"):
+                await self._write_response(writer, 404, {"error": "not found"})
+                return
+            if method != "POST":
+                await self._write_response(writer, 405, {"error": "method not allowed"})
+                return
+            if body is None:
+                await self._write_response(writer, 413, {"error": "payload too large"})
+                return
+
+            timeout = self.default_timeout
+            if "x-request-timeout" in headers:
+                try:
+                    timeout = float(headers["x-request-timeout"])
+                except ValueError:
+                    timeout = math.nan
+                # nan 和 inf 会让截止时间失效，非正数的请求没有意义
+                if not (math.isfinite(timeout) and timeout > 0):
+                    await self._write_response(writer, 400, {"error": "invalid x-request-timeout"})
+                    return
+                timeout = min(timeout, self.max_timeout)
+            deadline = time.monotonic() + timeout
+
+            try:
+                request = json.loads(body)
+            except (ValueError, UnicodeDecodeError):
+                await self._write_rpc_error(writer, None, RPCError(PARSE_ERROR, "无法解析JSON"))
+                return
+            request_id = request.get("id") if isinstance(request, dict) else None
+
+            if path == "/stream":
+                await self._handle_stream(writer, request, request_id, deadline)
+                return
+
+            try:
+                result = await self._call(request, deadline)
+            except RPCError as e:
+                await self._write_rpc_error(writer, request_id, e)
+                return
+            await self._write_response(writer, 200, {"jsonrpc": "2.0", "id": request_id, "result": result})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_stream(self, writer: asyncio.StreamWriter, request: Any, request_id: Any, deadline: float):
+        """
+        以NDJSON分块流的形式返回执行过程中的事件
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        call = asyncio.create_task(self._call(request, deadline, events))
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        try:
+            while True:
+                get_event = asyncio.create_task(events.get())
+                done, _ = await asyncio.wait({get_event, call}, return_when=asyncio.FIRST_COMPLETED)
+                if get_event in done:
+                    await self._write_chunk(writer, {"jsonrpc": "2.0", "id": request_id, **get_event.result()})
+                    continue
+                get_event.cancel()
+                # 调用结束后先输出剩余的事件
+                while not events.empty():
+                    await self._write_chunk(writer, {"jsonrpc": "2.0", "id": request_id, **events.get_nowait()})
+                try:
+                    final = {"event": "result", "result": call.result()}
+                except RPCError as e:
+                    final = {"event": "error", "error": e.to_dict()}
+                await self._write_chunk(writer, {"jsonrpc": "2.0", "id": request_id, **final})
+                break
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            if not call.done():
+                call.cancel()
+
+    async def _read_http_request(self, reader: asyncio.StreamReader) -> Tuple[Optional[Tuple[str, str]], Dict[str, str], Optional[bytes]]:
+        """
+        读取一个HTTP请求
+
+        返回:
+            (请求行(方法, 路径), 请求头字典, 请求体)；请求体超过限制时为None
+
+        异常:
+            _HTTPError: 如果 Content-Length 不是非负整数
+        """
+        line = await reader.readline()
+        if not line:
+            return None, {}, b""
+        parts = line.decode("latin-1").split()
+        if len(parts) < 2:
+            return None, {}, b""
+        method, path = parts[0].upper(), parts[1].split("?", 1)[0]
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        value = headers.get("content-length", "") or "0"
+        # int() 还接受符号、空白和下划线，这里只允许十进制数字
+        if not (value.isascii() and value.isdigit()):
+            raise _HTTPError(400, "invalid content-length")
+        length = int(value)
+        if length > self.max_body_size:
+            return (method, path), headers, None
+        body = await reader.readexactly(length) if length else b""
+        return (method, path), headers, body
+
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Any):
+        """
+        写入一个完整的JSON响应
+        """
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def _write_rpc_error(self, writer: asyncio.StreamWriter, request_id: Any, error: RPCError):
+        """
+        写入一个JSON-RPC错误响应
+        """
+        payload = {"jsonrpc": "2.0", "id": request_id, "error": error.to_dict()}
+        await self._write_response(writer, _HTTP_STATUS.get(error.code, 200), payload)
+
+    async def _write_chunk(self, writer: asyncio.StreamWriter, payload: Dict[str, Any]):
+        """
+        写入一行NDJSON分块
+        """
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取服务器状态
+
+        返回:
+            状态字典
+        """
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "sessions": self.runtime.get_session_count(),
+            **self.stats
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取服务器和工具的性能指标
+
+        返回:
+            指标字典：server（同 get_status）、tools（按工具名称）、result_cache
+        """
+        registry = self.runtime.tool_registry
+        return {
+            "server": self.get_status(),
+            "tools": registry.get_tool_stats(),
+            "result_cache": registry.result_cache.get_stats()
+        }
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="MCP JSON-RPC/HTTP 服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--workers", type=int, default=4, help="工作协程数量")
+    parser.add_argument("--queue-size", type=int, default=64, help="等待队列最大长度")
+    parser.add_argument("--timeout", type=float, default=60.0, help="默认请求截止时间（秒）")
+    parser.add_argument("--max-timeout", type=float, default=600.0, help="X-Request-Timeout 允许的最长截止时间（秒）")
+    args = parser.parse_args()
+
+    server = MCPServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        default_timeout=args.timeout,
+        max_timeout=args.max_timeout
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("MCP服务器已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MCP服务器测试
+
+在进程内以 port=0 启动 MCPServer，使用模拟的运行时（不访问LLM），测试背压、截止时间、
+请求头校验和NDJSON流式响应。
+
+运行方式:
+    python phase2_core/mcp/test_server.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import unittest
+from typing import Any, Dict, List, Tuple
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase2_core.mcp.server import MCPServer, SERVER_BUSY, DEADLINE_EXCEEDED
+
+
+class StubRuntime:
+    """
+    模拟运行时，execute_task 按任务描述执行不同的行为：
+        - block:    阻塞直到 release 被设置（或被取消）
+        - sleep:    等待取消令牌，最多5秒
+        - steps:    报告两个步骤后返回
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.cancelled = threading.Event()
+
+    def get_available_tools(self) -> List[Dict[str, Any]]:
+        return []
+
+    def execute_task(self, task: str, context=None, step_callback=None, cancel_token=None) -> Dict[str, Any]:
+        if task == "block":
+            self.started.set()
+            while not self.release.wait(0.01):
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+        elif task == "sleep":
+            if cancel_token.wait(5.0):
+                self.cancelled.set()
+        elif task == "steps":
+            for step in (1, 2):
+                step_callback({"step": step})
+        return {"success": True, "result": task}
+
+
+def rpc_body(task: str, request_id: int = 1) -> bytes:
+    payload = {"jsonrpc": "2.0", "id": request_id, "method": "execute_task", "params": {"task": task}}
+    return json.dumps(payload).encode("utf-8")
+
+
+async def send(port: int, path: str, body: bytes = b"", headers: Dict[str, str] = None,
+               content_length: str = None) -> Tuple[int, bytes, bytes]:
+    """
+    发送一个HTTP请求
+
+    返回:
+        (状态码, 响应头, 响应体)
+    """
+    headers = dict(headers or {})
+    headers["Content-Length"] = str(len(body)) if content_length is None else content_length
+    head = f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    response_head, _, response_body = response.partition(b"\r\n\r\n")
+    return int(response_head.split(b" ", 2)[1]), response_head, response_body
+
+
+def decode_chunks(data: bytes) -> List[Dict[str, Any]]:
+    """
+    解析分块传输的NDJSON响应体
+    """
+    events = []
+    while data:
+        size, _, rest = data.partition(b"\r\n")
+        length = int(size, 16)
+        if length == 0:
+            break
+        events.extend(json.loads(line) for line in rest[:length].splitlines() if line)
+        data = rest[length + 2:]
+    return events
+
+
+class TestMCPServer(unittest.IsolatedAsyncioTestCase):
+    """
+    测试 MCPServer 的HTTP和队列行为
+    """
+
+    async def asyncSetUp(self):
+        """
+        测试前的设置：一个工作协程、长度为1的等待队列
+        """
+        self.runtime = StubRuntime()
+        self.server = MCPServer(runtime=self.runtime, port=0, workers=1, queue_size=1, default_timeout=5.0,
+                                max_timeout=10.0)
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        """
+        测试后释放阻塞的任务并停止服务器
+        """
+        self.runtime.release.set()
+        await self.server.stop()
+
+    async def test_queue_full_returns_503(self):
+        """
+        测试工作协程忙碌且等待队列已满时立即返回503，之前的请求照常完成
+        """
+        running = asyncio.create_task(send(self.server.port, "/rpc", rpc_body("block", 1)))
+        await asyncio.get_running_loop().run_in_executor(None, self.runtime.started.wait, 5.0)
+        queued = asyncio.create_task(send(self.server.port, "/rpc", rpc_body("noop", 2)))
+        while self.server._queue.qsize() < 1:
+            await asyncio.sleep(0.01)
+
+        status, _, body = await send(self.server.port, "/rpc", rpc_body("noop", 3))
+        self.assertEqual(status, 503)
+        self.assertEqual(json.loads(body)["error"]["code"], SERVER_BUSY)
+        self.assertEqual(self.server.stats["rejected"], 1)
+
+        self.runtime.release.set()
+        for request in (running, queued):
+            status, _, body = await request
+            self.assertEqual(status, 200)
+            self.assertTrue(json.loads(body)["result"]["success"])
+
+    async def test_deadline_exceeded_cancels_task(self):
+        """
+        测试超过 X-Request-Timeout 时返回504，并通过取消令牌通知正在执行的任务
+        """
+        status, _, body = await send(self.server.port, "/rpc", rpc_body("sleep"),
+                                     headers={"X-Request-Timeout": "0.2"})
+        self.assertEqual(status, 504)
+        self.assertEqual(json.loads(body)["error"]["code"], DEADLINE_EXCEEDED)
+        cancelled = await asyncio.get_running_loop().run_in_executor(None, self.runtime.cancelled.wait, 5.0)
+        self.assertTrue(cancelled)
+        self.assertEqual(self.server.stats["timeouts"], 1)
+
+    async def test_request_timeout_capped(self):
+        """
+        测试超过 max_timeout 的 X-Request-Timeout 按 max_timeout 处理
+        """
+        self.server.max_timeout = 0.2
+        status, _, _ = await send(self.server.port, "/rpc", rpc_body("sleep"), headers={"X-Request-Timeout": "1e9"})
+        self.assertEqual(status, 504)
+
+    async def test_invalid_request_timeout_returns_400(self):
+        """
+        测试无效的 X-Request-Timeout 返回400
+        """
+        for value in ("nan", "inf", "-1", "0", "soon"):
+            status, _, _ = await send(self.server.port, "/rpc", rpc_body("noop"),
+                                      headers={"X-Request-Timeout": value})
+            self.assertEqual(status, 400, value)
+
+    async def test_invalid_content_length_returns_400(self):
+        """
+        测试无效的 Content-Length 返回400，过大的请求体返回413
+        """
+        for value in ("abc", "-1", "+5", "1_0"):
+            status, _, body = await send(self.server.port, "/rpc", rpc_body("noop"), content_length=value)
+            self.assertEqual(status, 400, value)
+            self.assertIn("content-length", json.loads(body)["error"])
+        status, _, _ = await send(self.server.port, "/rpc", content_length=str(self.server.max_body_size + 1))
+        self.assertEqual(status, 413)
+
+    async def test_stream_events(self):
+        """
+        测试 /stream 按顺序返回 queued、started、step 和 result 事件
+        """
+        status, head, body = await send(self.server.port, "/stream", rpc_body("steps", 7))
+        self.assertEqual(status, 200)
+        self.assertIn(b"Transfer-Encoding: chunked", head)
+        events = decode_chunks(body)
+        self.assertEqual([event["event"] for event in events], ["queued", "started", "step", "step", "result"])
+        self.assertTrue(all(event["id"] == 7 for event in events))
+        self.assertEqual([event["step"]["step"] for event in events if event["event"] == "step"], [1, 2])
+        self.assertEqual(events[-1]["result"]["result"], "steps")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,16 @@
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Any, Optional, List
 
+from .result_cache import ToolResultCache
+from .tool_metrics import ToolMetrics
+
+
+# execute_many 支持的执行器类型
+EXECUTOR_TYPES = ("auto", "thread", "process")
+
 
 class ToolError(Exception):
     """
@@ -9,11 +19,55 @@ class ToolError(Exception):
     pass
 
 
+class ToolCancelledError(ToolError):
+    """
+    工具调用被取消或超过截止时间
+    """
+
+    def __init__(self, message: Optional[str] = None, deadline_exceeded: bool = False):
+        self.deadline_exceeded = deadline_exceeded
+        super().__init__(message or ("已超过截止时间" if deadline_exceeded else "操作已取消"))
+
+
+class ParameterValidationError(ToolError):
+    """
+    工具参数校验失败
+
+    errors 为结构化的错误列表，每项包含 parameter、code（missing、invalid_type、
+    invalid_choice、out_of_range）、message，以及可选的 expected 和 value。
+    """
+
+    def __init__(self, tool_name: str, errors: List[Dict[str, Any]]):
+        self.tool_name = tool_name
+        self.errors = errors
+        super().__init__(f"工具 '{tool_name}' 的参数无效: " + "; ".join(error["message"] for error in errors))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典
+
+        返回:
+            {"tool_name": ..., "errors": [...]}
+        """
+        return {"tool_name": self.tool_name, "errors": self.errors}
+
+
 class BaseTool(ABC):
     """
     工具基类，所有工具都需要继承此类
+
+    cpu_bound 为True的工具在 ToolRegistry.execute_many(executor="auto") 中使用进程池执行，
+    此时工具实例和参数需要可以被pickle。
+
+    idempotent 为True表示结果只取决于参数和文件系统状态，ToolRegistry.execute_tool 会缓存其结果，
+    缓存在 cache_ttl 秒后过期（None表示不过期），并在 cache_dependencies() 返回的路径发生变化时失效。
     """
 
+    cpu_bound = False
+    idempotent = False
+    cache_ttl: Optional[float] = None
+    _schema = None
+
     def __init__(self, name: str, description: str):
         """
         初始化工具
@@ -30,6 +84,9 @@ class BaseTool(ABC):
         """
         执行工具
 
+        通过 ToolRegistry 执行时，kwargs 中可能包含 cancel_token（CancellationToken），
+        长时间运行的工具应当定期调用 cancellation.checkpoint(cancel_token)。
+
         参数:
             **kwargs: 工具执行参数
 
@@ -51,7 +108,7 @@ class BaseTool(ABC):
         return {
             "name": self.name,
             "description": self.description,
-            "parameters": self.get_parameters()
+            "parameters": self.get_schema().parameters
         }
 
     @abstractmethod
@@ -64,6 +121,70 @@ class BaseTool(ABC):
         """
         pass
 
+    def get_schema(self):
+        """
+        获取编译后的参数模式（第一次调用时编译，之后复用）
+
+        返回:
+            CompiledSchema 实例
+        """
+        if self._schema is None:
+            from .param_validation import compile_schema
+            self._schema = compile_schema(self.name, self.get_parameters())
+        return self._schema
+
+    def validate_parameters(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        校验并转换执行参数
+
+        参数:
+            parameters: 原始参数
+
+        返回:
+            转换后的参数（已填充默认值、规范化路径）
+
+        异常:
+            ParameterValidationError: 如果参数无效
+        """
+        return self.get_schema().validate(parameters)
+
+    def cache_dependencies(self, **kwargs) -> Optional[List[str]]:
+        """
+        获取本次调用的结果所依赖的路径（仅对 idempotent 工具有效）
+
+        参数:
+            **kwargs: 工具执行参数
+
+        返回:
+            路径列表；空列表表示没有具体依赖，任何写入都会使结果失效；None表示本次调用不缓存
+        """
+        return []
+
+    def invalidated_paths(self, **kwargs) -> Optional[List[str]]:
+        """
+        获取本次调用会修改的路径，执行后依赖这些路径的缓存结果将失效
+
+        参数:
+            **kwargs: 工具执行参数
+
+        返回:
+            路径列表；None表示影响范围未知，清空全部缓存
+        """
+        return []
+
+    def io_metrics(self, result: Dict[str, Any], **kwargs) -> Dict[str, float]:
+        """
+        从一次成功调用的结果中提取需要累计的数值指标，例如 bytes_read、bytes_written、process_time
+
+        参数:
+            result: 工具执行结果
+            **kwargs: 工具执行参数
+
+        返回:
+            指标名称到数值的映射
+        """
+        return {}
+
 
 class FileTool(BaseTool):
     """
@@ -84,6 +205,8 @@ class FileTool(BaseTool):
 class ExecTool(BaseTool):
     """
     命令执行工具基类
+
+    命令可能修改任意文件，执行后清空全部缓存结果。
     """
 
     def __init__(self, name: str, description: str):
@@ -96,6 +219,12 @@ class ExecTool(BaseTool):
         """
         super().__init__(name, description)
 
+    def invalidated_paths(self, **kwargs) -> Optional[List[str]]:
+        """
+        命令的影响范围未知
+        """
+        return None
+
 
 class APITool(BaseTool):
     """
@@ -116,6 +245,9 @@ class APITool(BaseTool):
 class ToolRegistry:
     """
     工具注册表，用于管理所有可用的工具
+
+    注册和注销操作由内部锁保护，可以在多个线程中并发调用。
+    调用 freeze() 之后注册表变为只读，可以在多个会话之间安全共享。
     """
 
     def __init__(self):
@@ -123,20 +255,35 @@ class ToolRegistry:
         初始化工具注册表
         """
         self.tools: Dict[str, BaseTool] = {}
+        self.result_cache = ToolResultCache()
+        self.metrics = ToolMetrics()
+        self._lock = threading.RLock()
+        self._frozen = False
 
-    def register_tool(self, tool: BaseTool):
+    def register_tool(self, tool: BaseTool, exist_ok: bool = False) -> BaseTool:
         """
         注册工具
 
         参数:
             tool: 工具实例
+            exist_ok: 工具名称已存在时是否忽略，为True时返回已注册的工具
+
+        返回:
+            注册表中的工具实例
 
         异常:
-            ToolError: 如果工具名称已存在
+            ToolError: 如果工具名称已存在或注册表已冻结
         """
-        if tool.name in self.tools:
-            raise ToolError(f"工具名称 '{tool.name}' 已存在")
-        self.tools[tool.name] = tool
+        with self._lock:
+            existing = self.tools.get(tool.name)
+            if existing is not None:
+                if exist_ok:
+                    return existing
+                raise ToolError(f"工具名称 '{tool.name}' 已存在")
+            if self._frozen:
+                raise ToolError(f"工具注册表已冻结，无法注册工具 '{tool.name}'")
+            self.tools[tool.name] = tool
+            return tool
 
     def unregister_tool(self, tool_name: str):
         """
@@ -146,11 +293,28 @@ class ToolRegistry:
             tool_name: 工具名称
 
         异常:
-            ToolError: 如果工具不存在
+            ToolError: 如果工具不存在或注册表已冻结
         """
-        if tool_name not in self.tools:
-            raise ToolError(f"工具 '{tool_name}' 不存在")
-        del self.tools[tool_name]
+        with self._lock:
+            if tool_name not in self.tools:
+                raise ToolError(f"工具 '{tool_name}' 不存在")
+            if self._frozen:
+                raise ToolError(f"工具注册表已冻结，无法注销工具 '{tool_name}'")
+            del self.tools[tool_name]
+
+    def freeze(self):
+        """
+        冻结注册表，此后不允许再注册或注销工具
+        """
+        with self._lock:
+            self._frozen = True
+
+    @property
+    def frozen(self) -> bool:
+        """
+        注册表是否已冻结
+        """
+        return self._frozen
 
     def get_tool(self, tool_name: str) -> BaseTool:
         """
@@ -175,9 +339,10 @@ class ToolRegistry:
         获取所有工具
 
         返回:
-            工具字典，键为工具名称，值为工具实例
+            工具字典的副本，键为工具名称，值为工具实例
         """
-        return self.tools
+        with self._lock:
+            return dict(self.tools)
 
     def get_tool_info_list(self) -> List[Dict[str, Any]]:
         """
@@ -186,11 +351,243 @@ class ToolRegistry:
         返回:
             工具信息列表
         """
-        return [tool.get_info() for tool in self.tools.values()]
+        return [tool.get_info() for tool in self.get_all_tools().values()]
+
+    def execute_tool(self, tool_name: str, parameters: Optional[Dict[str, Any]] = None,
+                     use_cache: bool = True, timeout: Optional[float] = None,
+                     cancel_token: Any = None) -> Dict[str, Any]:
+        """
+        校验参数后执行工具，按工具元数据使用结果缓存，并记录工具的性能指标
+
+        参数:
+            tool_name: 工具名称
+            parameters: 工具参数
+            use_cache: 是否使用结果缓存；为False时仍会执行写入类工具的缓存失效
+            timeout: 本次调用的时间预算（秒）
+            cancel_token: 取消令牌（CancellationToken），与 timeout 同时指定时取较早的截止时间
+
+        返回:
+            工具执行结果
+
+        异常:
+            ParameterValidationError: 如果参数无效（此时工具不会被执行）
+            ToolCancelledError: 如果调用被取消或超过时间预算
+            ToolError: 如果工具不存在或执行失败
+        """
+        tool = self.get_tool(tool_name)
+        start = time.perf_counter()
+        call_token = None
+        try:
+            parameters = tool.validate_parameters(parameters or {})
+            if timeout is not None:
+                from .cancellation import CancellationToken
+                cancel_token = call_token = CancellationToken(timeout, parent=cancel_token)
+            # 写入类工具始终经过缓存层，以便执行后使相关缓存失效
+            cache = self.result_cache if use_cache or not tool.idempotent else None
+            result = _call_tool(tool, parameters, cache, cancel_token)
+        except Exception as e:
+            self.metrics.record(tool.name, time.perf_counter() - start, error_type=type(e).__name__)
+            raise
+        finally:
+            if call_token is not None:
+                call_token.close()
+        self._record_result(tool, parameters, result, time.perf_counter() - start)
+        return result
+
+    def execute_many(self, calls: List[Dict[str, Any]], max_workers: int = 8, executor: str = "auto",
+                     timeout: Optional[float] = None, cancel_token: Any = None) -> Dict[str, Any]:
+        """
+        批量执行工具调用
+
+        I/O密集的工具在有界线程池中执行；executor="auto" 时 cpu_bound 的工具在进程池中执行。
+        单个调用失败不影响其他调用，错误记录在对应的结果项中。
+
+        参数:
+            calls: 调用列表，每项为 {"tool_name": ..., "parameters": {...}}
+            max_workers: 每个池的最大并发数
+            executor: 执行器类型：auto、thread、process
+            timeout: 整批调用的超时时间（秒），超时后取消正在执行的调用，尚未完成的调用记为失败
+            cancel_token: 取消令牌；线程池中的调用会收到派生的令牌，进程池中的调用只能在开始前取消
+
+        返回:
+            结果字典：results（与输入顺序一致）、succeeded、failed、elapsed、total_tool_time
+
+        异常:
+            ToolError: 如果执行器类型无效
+        """
+        if executor not in EXECUTOR_TYPES:
+            raise ToolError(f"不支持的执行器类型: {executor}")
+
+        from .cancellation import CancellationToken
+        batch_token = CancellationToken(timeout, parent=cancel_token)
+        start = time.perf_counter()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        thread_jobs = []
+        process_jobs = []
+        for index, call in enumerate(calls):
+            tool_name = call.get("tool_name")
+            parameters = call.get("parameters") or {}
+            try:
+                tool = self.get_tool(tool_name)
+            except ToolError as e:
+                results[index] = _failed_result(index, tool_name, e, 0.0)
+                continue
+            try:
+                parameters = tool.validate_parameters(parameters)
+            except ToolError as e:
+                self.metrics.record(tool.name, 0.0, error_type=type(e).__name__)
+                results[index] = _failed_result(index, tool_name, e, 0.0)
+                continue
+            use_process = executor == "process" or (executor == "auto" and tool.cpu_bound)
+            (process_jobs if use_process else thread_jobs).append((index, tool, parameters))
+
+        pools = []
+        futures = {}
+        try:
+            groups = [(thread_jobs, ThreadPoolExecutor)]
+            if process_jobs:
+                # 进程池依赖 multiprocessing，导入开销较大，只在需要时导入
+                from concurrent.futures import ProcessPoolExecutor
+                groups.append((process_jobs, ProcessPoolExecutor))
+            for jobs, pool_class in groups:
+                if not jobs:
+                    continue
+                pool = pool_class(max_workers=min(max_workers, len(jobs)))
+                pools.append(pool)
+                for index, tool, parameters in jobs:
+                    try:
+                        # 进程池中的调用无法共享结果缓存和取消令牌
+                        if pool_class is ThreadPoolExecutor:
+                            future = pool.submit(_run_tool, tool, parameters, self.result_cache, batch_token)
+                        else:
+                            future = pool.submit(_run_tool, tool, parameters)
+                        futures[future] = (index, tool, parameters)
+                    except Exception as e:
+                        results[index] = _failed_result(index, tool.name, e, 0.0)
+
+            done, not_done = wait(futures, timeout=timeout)
+            if not_done:
+                # 通知仍在执行的工具尽快停止
+                batch_token.cancel("批量执行超时")
+            # 指标在当前进程中记录，进程池中的调用也会被统计
+            for future in done:
+                index, tool, parameters = futures[future]
+                tool_name = tool.name
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    # 进程池中序列化失败或工作进程异常退出
+                    self.metrics.record(tool_name, 0.0, error_type=type(e).__name__)
+                    results[index] = _failed_result(index, tool_name, e, 0.0)
+                    continue
+                if "error" in outcome:
+                    self.metrics.record(tool_name, outcome["elapsed"], error_type=outcome["error_type"])
+                    results[index] = {"index": index, "tool_name": tool_name, "success": False, **outcome}
+                else:
+                    self._record_result(tool, parameters, outcome["output"], outcome["elapsed"])
+                    results[index] = {
+                        "index": index,
+                        "tool_name": tool_name,
+                        "success": bool(outcome["output"].get("success", False)),
+                        "result": outcome["output"].get("result"),
+                        "elapsed": outcome["elapsed"]
+                    }
+            for future in not_done:
+                future.cancel()
+                index, tool, _ = futures[future]
+                error = ToolError("批量执行超时")
+                self.metrics.record(tool.name, time.perf_counter() - start, error_type=type(error).__name__)
+                results[index] = _failed_result(index, tool.name, error, 0.0)
+        finally:
+            for pool in pools:
+                pool.shutdown(wait=False, cancel_futures=True)
+            batch_token.close()
+
+        succeeded = sum(1 for item in results if item["success"])
+        return {
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "elapsed": time.perf_counter() - start,
+            "total_tool_time": sum(item["elapsed"] for item in results)
+        }
+
+    def get_tool_stats(self, tool_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取工具的性能指标（只统计通过 execute_tool/execute_many 的调用）
+
+        参数:
+            tool_name: 工具名称，为None时返回所有被调用过的工具
+
+        返回:
+            指标字典：calls、unsuccessful（返回 success=False）、errors、error_rate、error_types、
+            latency（total/mean/max/p50/p95/p99/buckets），以及 bytes_read、bytes_written、process_time 等累计值
+        """
+        return self.metrics.get_stats(tool_name)
+
+    def _record_result(self, tool: BaseTool, parameters: Dict[str, Any], result: Any, elapsed: float):
+        """
+        记录一次正常返回的调用
+        """
+        try:
+            io = tool.io_metrics(result, **parameters) if isinstance(result, dict) else None
+        except Exception:
+            # 指标提取失败不影响工具调用
+            io = None
+        self.metrics.record(tool.name, elapsed, result=result, io=io)
+
+
+def _call_tool(tool: BaseTool, parameters: Dict[str, Any], cache: Optional[ToolResultCache] = None,
+               cancel_token: Any = None) -> Dict[str, Any]:
+    """
+    执行工具调用，可选使用结果缓存并传入取消令牌
+    """
+    if cancel_token is None:
+        func = lambda: tool.execute(**parameters)
+    else:
+        cancel_token.check()
+        func = lambda: tool.execute(**parameters, cancel_token=cancel_token)
+    if cache is None:
+        return func()
+    return cache.call(tool, parameters, func)
+
+
+def _run_tool(tool: BaseTool, parameters: Dict[str, Any], cache: Optional[ToolResultCache] = None,
+              cancel_token: Any = None) -> Dict[str, Any]:
+    """
+    执行单个工具调用并计时（在线程池或进程池中运行）
+
+    返回:
+        {"output": 工具返回值, "elapsed": 耗时} 或 {"error": ..., "error_type": ..., "elapsed": 耗时}
+    """
+    start = time.perf_counter()
+    try:
+        output = _call_tool(tool, parameters, cache, cancel_token)
+    except Exception as e:
+        return {"error": str(e), "error_type": type(e).__name__, "elapsed": time.perf_counter() - start}
+    return {"output": output, "elapsed": time.perf_counter() - start}
+
+
+def _failed_result(index: int, tool_name: Optional[str], error: Exception, elapsed: float) -> Dict[str, Any]:
+    """
+    构造失败的批量执行结果项
+    """
+    result = {
+        "index": index,
+        "tool_name": tool_name,
+        "success": False,
+        "error": str(error),
+        "error_type": type(error).__name__,
+        "elapsed": elapsed
+    }
+    if isinstance(error, ParameterValidationError):
+        result["errors"] = error.errors
+    return result
 
 
 # 全局工具注册表实例
 _tool_registry = None
+_tool_registry_lock = threading.Lock()
 
 
 def get_tool_registry() -> ToolRegistry:
@@ -202,5 +599,20 @@ def get_tool_registry() -> ToolRegistry:
     """
     global _tool_registry
     if _tool_registry is None:
-        _tool_registry = ToolRegistry()
+        with _tool_registry_lock:
+            if _tool_registry is None:
+                _tool_registry = ToolRegistry()
     return _tool_registry
+
+
+def get_tool_stats(tool_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    获取全局工具注册表的工具性能指标
+
+    参数:
+        tool_name: 工具名称，为None时返回所有工具
+
+    返回:
+        指标字典
+    """
+    return get_tool_registry().get_tool_stats(tool_name)
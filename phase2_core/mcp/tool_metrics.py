@@ -0,0 +1,135 @@
+"""
+工具性能指标
+
+ToolRegistry 通过 ToolMetrics 记录每个工具的调用情况：
+    - 调用次数、返回 success=False 的次数、异常次数以及按异常类型的分布
+    - 耗时直方图（固定桶边界），以及由直方图估算的 p50/p95/p99
+    - 工具通过 BaseTool.io_metrics() 报告的数值指标的累计值，
+      例如 bytes_read、bytes_written、process_time（命令进程运行时间）
+
+记录只在内存中累加，线程安全；get_stats() 返回可以直接序列化为JSON的字典。
+"""
+
+import bisect
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+
+# 耗时直方图的桶上界（秒），最后一个桶收集所有更慢的调用
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _ToolCounters:
+    """
+    单个工具的计数器（内部使用，由 ToolMetrics 的锁保护）
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.unsuccessful = 0
+        self.errors = 0
+        self.error_types: Dict[str, int] = {}
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.totals: Dict[str, float] = {}
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        由直方图估算分位数，在桶内线性插值
+        """
+        if self.calls == 0:
+            return None
+        rank = fraction * self.calls
+        seen = 0
+        for position, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[position - 1] if position > 0 else 0.0
+                upper = LATENCY_BUCKETS[position] if position < len(LATENCY_BUCKETS) else self.latency_max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.latency_max)
+            seen += count
+        return self.latency_max
+
+    def to_dict(self) -> Dict[str, Any]:
+        bucket_labels = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            "calls": self.calls,
+            "unsuccessful": self.unsuccessful,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "error_types": dict(self.error_types),
+            "latency": {
+                "total": self.latency_total,
+                "mean": self.latency_total / self.calls if self.calls else None,
+                "max": self.latency_max,
+                "p50": self.percentile(0.50),
+                "p95": self.percentile(0.95),
+                "p99": self.percentile(0.99),
+                "buckets": dict(zip(bucket_labels, self.buckets))
+            },
+            **self.totals
+        }
+
+
+class ToolMetrics:
+    """
+    按工具名称汇总的性能指标
+    """
+
+    def __init__(self):
+        """
+        初始化性能指标
+        """
+        self._counters: Dict[str, _ToolCounters] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool_name: str, elapsed: float, result: Any = None, error_type: Optional[str] = None,
+               io: Optional[Dict[str, float]] = None):
+        """
+        记录一次工具调用
+
+        参数:
+            tool_name: 工具名称
+            elapsed: 耗时（秒）
+            result: 工具返回的结果字典（调用抛出异常时为None）
+            error_type: 异常类名，调用成功返回时为None
+            io: 工具报告的数值指标，累加到同名的总计上
+        """
+        with self._lock:
+            counters = self._counters.get(tool_name)
+            if counters is None:
+                counters = self._counters[tool_name] = _ToolCounters()
+            counters.calls += 1
+            counters.latency_total += elapsed
+            counters.latency_max = max(counters.latency_max, elapsed)
+            counters.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            if error_type is not None:
+                counters.errors += 1
+                counters.error_types[error_type] = counters.error_types.get(error_type, 0) + 1
+            elif isinstance(result, dict) and not result.get("success", True):
+                counters.unsuccessful += 1
+            for key, value in (io or {}).items():
+                counters.totals[key] = counters.totals.get(key, 0) + value
+
+    def get_stats(self, tool_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取性能指标
+
+        参数:
+            tool_name: 工具名称，为None时返回所有工具
+
+        返回:
+            工具名称到指标字典的映射；指定工具时只返回该工具的指标（没有调用记录时为空字典）
+        """
+        with self._lock:
+            if tool_name is not None:
+                counters = self._counters.get(tool_name)
+                return counters.to_dict() if counters is not None else {}
+            return {name: counters.to_dict() for name, counters in sorted(self._counters.items())}
+
+    def reset(self):
+        """
+        清空所有指标
+        """
+        with self._lock:
+            self._counters.clear()
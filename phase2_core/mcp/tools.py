@@ -1,30 +1,73 @@
+import base64
+import fnmatch
+import itertools
+import json
+import mmap
 import os
-import subprocess
-from typing import Dict, Any, Optional
+import re
+import time
+from typing import Dict, Any, Optional, List, Iterator, Callable
 
-from .tool_interface import FileTool, ExecTool, ToolError
+from .tool_interface import FileTool, ExecTool, ToolError, ToolCancelledError, ToolRegistry, get_tool_registry
+from .line_index import CHUNK_SIZE, get_line_index_cache, tail_offset
+from .file_cache import get_file_cache
+from .workspace_index import WorkspaceIndex, get_workspace_index
+from .content_index import BINARY_CHECK_SIZE, DEFAULT_MAX_SCAN_SIZE, ContentIndex, get_content_index
+from .command_runner import ConcurrentCommandRunner, DEFAULT_MAX_OUTPUT_BYTES, run_command_async, run_sync
+from .write_buffer import FSYNC_POLICIES, commit_temp_file, get_append_pool, write_temp_file
+from .cancellation import CancellationToken, checkpoint
+
+
+def _remove_quietly(path: str):
+    """
+    删除文件，忽略错误
+    """
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
 
 
 class FileReaderTool(FileTool):
     """
     文件读取工具
+
+    支持按字节范围（offset/length）、按行范围（start_line/end_line）或读取末尾若干行（tail），
+    读取开销与请求的范围成正比，而不是与文件大小成正比。按行读取使用缓存的换行索引。
+    文本读取默认与文本模式的 open() 一样把 \\r\\n 和 \\r 转换为 \\n（newline=""时保持原样），
+    offset/length 始终是原始字节的范围。binary=True 时返回基于 mmap 的零拷贝 memoryview。
     """
 
+    idempotent = True
+
     def __init__(self):
         """
         初始化文件读取工具
         """
         super().__init__(
             name="file_reader",
-            description="读取文件内容"
+            description="读取文件内容，支持按字节范围、按行范围、读取末尾若干行和二进制读取"
         )
 
-    def execute(self, file_path: str, **kwargs) -> Dict[str, Any]:
+    def execute(self, file_path: str, offset: Optional[int] = None, length: Optional[int] = None,
+                start_line: Optional[int] = None, end_line: Optional[int] = None, tail: Optional[int] = None,
+                encoding: str = "utf-8", errors: str = "strict", newline: Optional[str] = None,
+                binary: bool = False, cancel_token: Optional[CancellationToken] = None, **kwargs) -> Dict[str, Any]:
         """
         执行文件读取
 
         参数:
             file_path: 文件路径
+            offset: 起始字节偏移
+            length: 读取的字节数，为None时读到文件末尾
+            start_line: 起始行号（从1开始，包含）
+            end_line: 结束行号（包含），为None时读到文件末尾
+            tail: 读取文件最后的行数
+            encoding: 文本编码
+            errors: 解码错误处理方式（'strict'、'replace'、'ignore'等）
+            newline: 为None时把 \\r\\n 和 \\r 转换为 \\n，为""时保持原样
+            binary: 是否以二进制方式读取，为True时content为memoryview
+            cancel_token: 取消令牌，每读取一个数据块检查一次
             **kwargs: 额外参数
 
         返回:
@@ -34,6 +77,11 @@ class FileReaderTool(FileTool):
             ToolError: 如果读取失败
         """
         try:
+            # 先写出该文件尚未刷新的追加内容
+            pool = get_append_pool()
+            if pool.has_pending(file_path):
+                pool.flush(file_path)
+
             # 检查文件是否存在
             if not os.path.exists(file_path):
                 raise ToolError(f"文件 '{file_path}' 不存在")
@@ -42,16 +90,65 @@ class FileReaderTool(FileTool):
             if not os.path.isfile(file_path):
                 raise ToolError(f"路径 '{file_path}' 不是文件")
 
-            # 读取文件内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            byte_mode = offset is not None or length is not None
+            line_mode = start_line is not None or end_line is not None
+            if sum([byte_mode, line_mode, tail is not None]) > 1:
+                raise ToolError("offset/length、start_line/end_line 和 tail 不能同时使用")
+            if (offset is not None and offset < 0) or (length is not None and length < 0):
+                raise ToolError("offset 和 length 不能为负数")
+            if newline not in (None, ""):
+                raise ToolError(f"不支持的 newline: {newline!r}，可选: None、\"\"")
+
+            st = os.stat(file_path)
+            file_size = st.st_size
+            extra: Dict[str, Any] = {}
+
+            # 计算要读取的字节范围
+            if line_mode:
+                index = get_line_index_cache().get(file_path, st, cancel_token)
+                start, end = index.byte_range(start_line or 1, end_line)
+                extra["start_line"] = start_line or 1
+                extra["end_line"] = min(end_line, index.total_lines) if end_line is not None else index.total_lines
+                extra["total_lines"] = index.total_lines
+            elif tail is not None:
+                with open(file_path, 'rb') as f:
+                    start = tail_offset(f, file_size, tail, cancel_token)
+                end = file_size
+                extra["tail"] = tail
+            else:
+                start = min(offset or 0, file_size)
+                end = file_size if length is None else min(start + length, file_size)
+
+            if binary:
+                content = self._map_range(file_path, start, end)
+                size = len(content)
+            else:
+                # 读取整个文件时使用并填充内容缓存；按范围读取只使用已缓存的内容，
+                # 未命中时只读取请求的范围，不为此读入整个文件
+                if byte_mode or line_mode or tail is not None:
+                    cached = get_file_cache().get(file_path, st)
+                else:
+                    cached = get_file_cache().load(file_path, st)
+                if cached is not None:
+                    data = cached[start:end]
+                else:
+                    with open(file_path, 'rb') as f:
+                        data = self._read_range(f, start, end, cancel_token)
+                content = data.decode(encoding, errors)
+                if newline is None and "\r" in content:
+                    content = content.replace("\r\n", "\n").replace("\r", "\n")
+                size = len(content)
 
             return {
                 "success": True,
                 "result": {
                     "file_path": file_path,
                     "content": content,
-                    "size": len(content)
+                    "size": size,
+                    "offset": start,
+                    "length": end - start,
+                    "file_size": file_size,
+                    **extra
                 }
             }
         except ToolError:
@@ -59,6 +156,66 @@ class FileReaderTool(FileTool):
         except Exception as e:
             raise ToolError(f"读取文件失败: {str(e)}")
 
+    @staticmethod
+    def _read_range(f, start: int, end: int, cancel_token: Optional[CancellationToken] = None) -> bytes:
+        """
+        分块读取字节范围 [start, end)
+
+        参数:
+            f: 以二进制模式打开的文件对象
+            start: 起始偏移
+            end: 结束偏移
+            cancel_token: 取消令牌，每读取一个数据块检查一次
+
+        返回:
+            读取到的字节
+        """
+        total = max(end - start, 0)
+        buffer = bytearray(total)
+        view = memoryview(buffer)
+        f.seek(start)
+        read = 0
+        while read < total:
+            checkpoint(cancel_token)
+            count = f.readinto(view[read:read + min(CHUNK_SIZE, total - read)])
+            if not count:
+                break
+            read += count
+        return bytes(view[:read])
+
+    @staticmethod
+    def _map_range(file_path: str, start: int, end: int) -> memoryview:
+        """
+        通过 mmap 映射文件并返回字节范围 [start, end) 的零拷贝视图
+
+        返回的 memoryview 会保持映射有效，释放视图后映射随之关闭。
+
+        参数:
+            file_path: 文件路径
+            start: 起始偏移
+            end: 结束偏移
+
+        返回:
+            memoryview
+        """
+        if end <= start:
+            return memoryview(b"")
+        with open(file_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped)[start:end]
+
+    def cache_dependencies(self, file_path: str = "", binary: bool = False, **kwargs) -> Optional[List[str]]:
+        """
+        读取结果依赖文件本身；二进制读取返回的 memoryview 引用了 mmap，不缓存
+        """
+        return None if binary else [file_path]
+
+    def io_metrics(self, result: Dict[str, Any], **kwargs) -> Dict[str, float]:
+        """
+        读取的字节数
+        """
+        return {"bytes_read": result.get("result", {}).get("length", 0)}
+
     def get_parameters(self) -> Dict[str, Any]:
         """
         获取工具参数信息
@@ -69,8 +226,58 @@ class FileReaderTool(FileTool):
         return {
             "file_path": {
                 "type": "string",
+                "format": "path",
                 "description": "要读取的文件路径",
                 "required": True
+            },
+            "offset": {
+                "type": "integer",
+                "description": "起始字节偏移",
+                "required": False
+            },
+            "length": {
+                "type": "integer",
+                "description": "读取的字节数，默认读到文件末尾",
+                "required": False
+            },
+            "start_line": {
+                "type": "integer",
+                "description": "起始行号（从1开始，包含）",
+                "required": False
+            },
+            "end_line": {
+                "type": "integer",
+                "description": "结束行号（包含），默认读到文件末尾",
+                "required": False
+            },
+            "tail": {
+                "type": "integer",
+                "description": "读取文件最后的行数",
+                "required": False
+            },
+            "encoding": {
+                "type": "string",
+                "description": "文本编码",
+                "required": False,
+                "default": "utf-8"
+            },
+            "errors": {
+                "type": "string",
+                "description": "解码错误处理方式：strict、replace、ignore",
+                "required": False,
+                "default": "strict"
+            },
+            "newline": {
+                "type": "string",
+                "enum": [""],
+                "description": "默认把 \\r\\n 和 \\r 转换为 \\n；为空字符串时保持原样",
+                "required": False
+            },
+            "binary": {
+                "type": "boolean",
+                "description": "是否以二进制方式读取（返回memoryview）",
+                "required": False,
+                "default": False
             }
         }
 
@@ -78,6 +285,9 @@ class FileReaderTool(FileTool):
 class FileWriterTool(FileTool):
     """
     文件写入工具
+
+    先写入同目录下的临时文件，再通过 os.replace 原子替换目标文件，
+    写入过程中崩溃不会留下被截断的文件。
     """
 
     def __init__(self):
@@ -86,10 +296,11 @@ class FileWriterTool(FileTool):
         """
         super().__init__(
             name="file_writer",
-            description="写入文件内容"
+            description="原子写入文件内容"
         )
 
-    def execute(self, file_path: str, content: str, overwrite: bool = False, **kwargs) -> Dict[str, Any]:
+    def execute(self, file_path: str, content: str, overwrite: bool = False, fsync: str = "none",
+                cancel_token: Optional[CancellationToken] = None, **kwargs) -> Dict[str, Any]:
         """
         执行文件写入
 
@@ -97,6 +308,8 @@ class FileWriterTool(FileTool):
             file_path: 文件路径
             content: 要写入的内容
             overwrite: 是否覆盖已存在的文件
+            fsync: fsync策略：none、file（同步文件内容）、full（同时同步所在目录）
+            cancel_token: 取消令牌，在替换目标文件前检查，取消时目标文件保持不变
             **kwargs: 额外参数
 
         返回:
@@ -109,15 +322,22 @@ class FileWriterTool(FileTool):
             # 检查文件是否已存在
             if os.path.exists(file_path) and not overwrite:
                 raise ToolError(f"文件 '{file_path}' 已存在，请设置 overwrite=True 以覆盖")
-
-            # 确保目录存在
-            directory = os.path.dirname(file_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory, exist_ok=True)
-
-            # 写入文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if fsync not in FSYNC_POLICIES:
+                raise ToolError(f"不支持的fsync策略: {fsync}")
+
+            # 先写出尚未刷新的追加内容并关闭句柄，替换后句柄将指向旧文件
+            get_append_pool().release(file_path)
+
+            # 写入临时文件，确认没有被取消后再替换目标文件
+            temp_path = write_temp_file(file_path, content.encode("utf-8"), fsync)
+            try:
+                checkpoint(cancel_token)
+                commit_temp_file(temp_path, file_path, fsync)
+            except BaseException:
+                _remove_quietly(temp_path)
+                raise
+            finally:
+                get_file_cache().invalidate(file_path)
 
             return {
                 "success": True,
@@ -132,6 +352,18 @@ class FileWriterTool(FileTool):
         except Exception as e:
             raise ToolError(f"写入文件失败: {str(e)}")
 
+    def invalidated_paths(self, file_path: str = "", **kwargs) -> Optional[List[str]]:
+        """
+        写入会修改目标文件
+        """
+        return [file_path]
+
+    def io_metrics(self, result: Dict[str, Any], content: str = "", **kwargs) -> Dict[str, float]:
+        """
+        写入的字节数
+        """
+        return {"bytes_written": len(content.encode("utf-8"))}
+
     def get_parameters(self) -> Dict[str, Any]:
         """
         获取工具参数信息
@@ -142,6 +374,7 @@ class FileWriterTool(FileTool):
         return {
             "file_path": {
                 "type": "string",
+                "format": "path",
                 "description": "要写入的文件路径",
                 "required": True
             },
@@ -155,6 +388,13 @@ class FileWriterTool(FileTool):
                 "description": "是否覆盖已存在的文件",
                 "required": False,
                 "default": False
+            },
+            "fsync": {
+                "type": "string",
+                "enum": list(FSYNC_POLICIES),
+                "description": "fsync策略：none、file、full",
+                "required": False,
+                "default": "none"
             }
         }
 
@@ -162,6 +402,10 @@ class FileWriterTool(FileTool):
 class FileAppenderTool(FileTool):
     """
     文件追加工具
+
+    通过全局追加句柄池复用文件句柄，不再每次调用都打开、关闭文件和检查目录。
+    buffered=True 时内容先进入内存缓冲区，按大小或时间间隔批量写入磁盘；
+    通过 file_reader 读取同一文件前会自动刷新。
     """
 
     def __init__(self):
@@ -170,16 +414,19 @@ class FileAppenderTool(FileTool):
         """
         super().__init__(
             name="file_appender",
-            description="向文件追加内容"
+            description="向文件追加内容，支持写后缓冲"
         )
 
-    def execute(self, file_path: str, content: str, **kwargs) -> Dict[str, Any]:
+    def execute(self, file_path: str, content: str, buffered: bool = False,
+                cancel_token: Optional[CancellationToken] = None, **kwargs) -> Dict[str, Any]:
         """
         执行文件追加
 
         参数:
             file_path: 文件路径
             content: 要追加的内容
+            buffered: 是否写后缓冲（返回时内容可能尚未写入磁盘）
+            cancel_token: 取消令牌，在追加前检查
             **kwargs: 额外参数
 
         返回:
@@ -188,26 +435,34 @@ class FileAppenderTool(FileTool):
         异常:
             ToolError: 如果追加失败
         """
+        checkpoint(cancel_token)
         try:
-            # 确保目录存在
-            directory = os.path.dirname(file_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory, exist_ok=True)
-
-            # 追加文件
-            with open(file_path, 'a', encoding='utf-8') as f:
-                f.write(content)
+            pending = get_append_pool().append(file_path, content.encode("utf-8"), buffered=buffered)
 
             return {
                 "success": True,
                 "result": {
                     "file_path": file_path,
-                    "added_size": len(content)
+                    "added_size": len(content),
+                    "buffered": buffered,
+                    "pending_bytes": pending
                 }
             }
         except Exception as e:
             raise ToolError(f"追加文件失败: {str(e)}")
 
+    def invalidated_paths(self, file_path: str = "", **kwargs) -> Optional[List[str]]:
+        """
+        追加会修改目标文件
+        """
+        return [file_path]
+
+    def io_metrics(self, result: Dict[str, Any], content: str = "", **kwargs) -> Dict[str, float]:
+        """
+        追加的字节数（缓冲写入时可能尚未落盘）
+        """
+        return {"bytes_written": len(content.encode("utf-8"))}
+
     def get_parameters(self) -> Dict[str, Any]:
         """
         获取工具参数信息
@@ -218,6 +473,7 @@ class FileAppenderTool(FileTool):
         return {
             "file_path": {
                 "type": "string",
+                "format": "path",
                 "description": "要追加的文件路径",
                 "required": True
             },
@@ -225,6 +481,157 @@ class FileAppenderTool(FileTool):
                 "type": "string",
                 "description": "要追加的内容",
                 "required": True
+            },
+            "buffered": {
+                "type": "boolean",
+                "description": "是否写后缓冲，适合频繁追加少量内容",
+                "required": False,
+                "default": False
+            }
+        }
+
+
+class BatchFileWriterTool(FileTool):
+    """
+    批量文件写入工具
+
+    一次调用写入多个文件。所有 write 操作先写入各自的临时文件，全部成功后才依次
+    替换目标文件；任何一个文件在准备阶段失败时不会修改任何文件。
+    append 操作在替换完成后通过追加句柄池执行。
+    """
+
+    def __init__(self):
+        """
+        初始化批量文件写入工具
+        """
+        super().__init__(
+            name="file_batch_writer",
+            description="在一次调用中写入或追加多个文件"
+        )
+
+    def execute(self, files: List[Dict[str, Any]], fsync: str = "none",
+                cancel_token: Optional[CancellationToken] = None, **kwargs) -> Dict[str, Any]:
+        """
+        执行批量写入
+
+        参数:
+            files: 文件列表，每项为 {"file_path": ..., "content": ..., "mode": "write" | "append", "overwrite": ...}
+            fsync: fsync策略：none、file、full
+            cancel_token: 取消令牌，在准备每个文件前和提交前检查；提交阶段开始后不再取消
+            **kwargs: 额外参数
+
+        返回:
+            执行结果字典
+
+        异常:
+            ToolError: 如果参数无效或写入失败
+        """
+        if not files:
+            raise ToolError("files 不能为空")
+        if fsync not in FSYNC_POLICIES:
+            raise ToolError(f"不支持的fsync策略: {fsync}")
+
+        # 检查参数
+        paths = set()
+        for spec in files:
+            if not isinstance(spec, dict):
+                raise ToolError("files 中的每一项都必须是包含 file_path 和 content 的对象")
+            file_path = spec.get("file_path")
+            if not file_path or not isinstance(file_path, str) or not isinstance(spec.get("content"), str):
+                raise ToolError("files 中的每一项都需要 file_path 和 content")
+            mode = spec.get("mode", "write")
+            if mode not in ("write", "append"):
+                raise ToolError(f"不支持的写入模式: {mode}")
+            if mode == "write":
+                path = os.path.abspath(file_path)
+                if path in paths:
+                    raise ToolError(f"文件 '{file_path}' 在批量写入中重复出现")
+                paths.add(path)
+                if os.path.exists(file_path) and not spec.get("overwrite", False):
+                    raise ToolError(f"文件 '{file_path}' 已存在，请设置 overwrite=True 以覆盖")
+
+        # 准备阶段：写入所有临时文件
+        prepared = []
+        try:
+            for spec in files:
+                checkpoint(cancel_token)
+                if spec.get("mode", "write") == "write":
+                    temp_path = write_temp_file(spec["file_path"], spec["content"].encode("utf-8"), fsync)
+                    prepared.append((temp_path, spec["file_path"]))
+            checkpoint(cancel_token)
+        except Exception as e:
+            for temp_path, _ in prepared:
+                _remove_quietly(temp_path)
+            if isinstance(e, ToolCancelledError):
+                raise
+            raise ToolError(f"批量写入失败，未修改任何文件: {str(e)}")
+
+        # 提交阶段：替换目标文件并执行追加
+        pool = get_append_pool()
+        results = []
+        written = 0
+        try:
+            for temp_path, file_path in prepared:
+                pool.release(file_path)
+                try:
+                    commit_temp_file(temp_path, file_path, fsync)
+                finally:
+                    get_file_cache().invalidate(file_path)
+                written += 1
+            for spec in files:
+                mode = spec.get("mode", "write")
+                if mode == "append":
+                    pool.append(spec["file_path"], spec["content"].encode("utf-8"))
+                results.append({"file_path": spec["file_path"], "mode": mode, "size": len(spec["content"])})
+        except Exception as e:
+            for temp_path, _ in prepared[written:]:
+                _remove_quietly(temp_path)
+            raise ToolError(f"批量写入失败: {str(e)}")
+
+        return {
+            "success": True,
+            "result": {
+                "files": results,
+                "count": len(results),
+                "total_size": sum(item["size"] for item in results)
+            }
+        }
+
+    def invalidated_paths(self, files: Optional[List[Dict[str, Any]]] = None, **kwargs) -> Optional[List[str]]:
+        """
+        批量写入会修改所有目标文件
+        """
+        if not isinstance(files, list):
+            return None
+        return [spec["file_path"] for spec in files
+                if isinstance(spec, dict) and isinstance(spec.get("file_path"), str) and spec["file_path"]]
+
+    def io_metrics(self, result: Dict[str, Any], files: Optional[List[Dict[str, Any]]] = None,
+                   **kwargs) -> Dict[str, float]:
+        """
+        所有文件写入的字节数之和
+        """
+        return {"bytes_written": sum(len(spec["content"].encode("utf-8")) for spec in files or [])}
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """
+        获取工具参数信息
+
+        返回:
+            参数信息字典
+        """
+        return {
+            "files": {
+                "type": "array",
+                "description": "文件列表，每项包含 file_path、content，可选 mode（write/append，默认write）和 overwrite",
+                "required": True
+            },
+            "fsync": {
+                "type": "string",
+                "enum": list(FSYNC_POLICIES),
+                "description": "fsync策略：none、file、full",
+                "required": False,
+                "default": "none"
             }
         }
 
@@ -232,18 +639,28 @@ class FileAppenderTool(FileTool):
 class CommandExecutorTool(ExecTool):
     """
     命令执行工具
+
+    基于 asyncio 子进程执行命令，输出按行流式回调，每个输出流最多保留
+    max_output_bytes 字节（保留开头和结尾），超时后终止整个进程组。
     """
 
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 4):
         """
         初始化命令执行工具
+
+        参数:
+            max_concurrency: execute_many 同时执行的最大命令数
         """
         super().__init__(
             name="command_executor",
             description="执行系统命令"
         )
+        self.runner = ConcurrentCommandRunner(max_concurrency=max_concurrency)
 
-    def execute(self, command: str, cwd: Optional[str] = None, timeout: int = 30, **kwargs) -> Dict[str, Any]:
+    def execute(self, command: str, cwd: Optional[str] = None, timeout: int = 30,
+                max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+                on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+                cancel_token: Optional[CancellationToken] = None, **kwargs) -> Dict[str, Any]:
         """
         执行命令
 
@@ -251,42 +668,78 @@ class CommandExecutorTool(ExecTool):
             command: 要执行的命令
             cwd: 工作目录
             timeout: 超时时间（秒）
+            max_output_bytes: 每个输出流最多保留的字节数
+            on_event: 输出事件回调，每行 stdout/stderr 调用一次
+            cancel_token: 取消令牌，截止时间早于 timeout 时以令牌为准，取消时终止整个进程组
             **kwargs: 额外参数
 
         返回:
             执行结果字典
 
         异常:
-            ToolError: 如果执行失败
+            ToolCancelledError: 如果命令被取消或超过令牌的截止时间
+            ToolError: 如果执行失败或超时
         """
         try:
-            # 执行命令
-            result = subprocess.run(
+            result = run_sync(lambda: run_command_async(
                 command,
-                shell=True,
-                capture_output=True,
-                text=True,
                 cwd=cwd,
-                timeout=timeout
-            )
+                timeout=timeout,
+                max_output_bytes=max_output_bytes,
+                on_event=on_event,
+                cancel_token=cancel_token
+            ))
+        except ToolCancelledError:
+            raise
+        except Exception as e:
+            raise ToolError(f"执行命令失败: {str(e)}")
 
-            # 检查执行结果
-            success = result.returncode == 0
+        if result["cancelled"]:
+            raise ToolCancelledError(f"命令已取消: {cancel_token.reason}")
+        if result["timed_out"]:
+            if cancel_token is not None and cancel_token.deadline_exceeded:
+                raise ToolCancelledError("命令执行超过截止时间", deadline_exceeded=True)
+            raise ToolError(f"命令执行超时: {timeout}秒")
 
-            return {
-                "success": success,
-                "result": {
-                    "command": command,
-                    "cwd": cwd,
-                    "returncode": result.returncode,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr
-                }
+        # 检查执行结果
+        success = result["returncode"] == 0
+
+        return {
+            "success": success,
+            "result": result
+        }
+
+    def execute_many(self, commands: List[Dict[str, Any]],
+                     cancel_token: Optional[CancellationToken] = None) -> List[Dict[str, Any]]:
+        """
+        并发执行多条命令
+
+        参数:
+            commands: 命令列表，每项为 {"command": ..., "cwd": ..., "timeout": ...}
+            cancel_token: 取消令牌，取消时终止所有正在执行的命令
+
+        返回:
+            与输入顺序一致的执行结果字典列表
+        """
+        results = self.runner.run_many(commands, cancel_token=cancel_token)
+        return [
+            {
+                "success": ("error" not in result and not result["timed_out"] and not result["cancelled"]
+                            and result["returncode"] == 0),
+                "result": result
             }
-        except subprocess.TimeoutExpired:
-            raise ToolError(f"命令执行超时: {timeout}秒")
-        except Exception as e:
-            raise ToolError(f"执行命令失败: {str(e)}")
+            for result in results
+        ]
+
+    def io_metrics(self, result: Dict[str, Any], **kwargs) -> Dict[str, float]:
+        """
+        进程运行时间和读取的输出字节数
+        """
+        details = result.get("result", {})
+        return {
+            "process_time": details.get("duration", 0.0),
+            "bytes_read": details.get("stdout_bytes", 0) + details.get("stderr_bytes", 0)
+        }
 
     def get_parameters(self) -> Dict[str, Any]:
         """
@@ -303,6 +756,7 @@ class CommandExecutorTool(ExecTool):
             },
             "cwd": {
                 "type": "string",
+                "format": "path",
                 "description": "工作目录",
                 "required": False
             },
@@ -311,6 +765,12 @@ class CommandExecutorTool(ExecTool):
                 "description": "超时时间（秒）",
                 "required": False,
                 "default": 30
+            },
+            "max_output_bytes": {
+                "type": "integer",
+                "description": "每个输出流最多保留的字节数，超出时保留开头和结尾",
+                "required": False,
+                "default": DEFAULT_MAX_OUTPUT_BYTES
             }
         }
 
@@ -318,24 +778,49 @@ class CommandExecutorTool(ExecTool):
 class DirectoryListerTool(FileTool):
     """
     目录列表工具
+
+    基于 os.scandir 遍历目录，复用 DirEntry 中的类型信息，每个条目最多一次 stat。
+    支持递归、深度限制、glob/正则过滤、排序和基于游标的分页；
+    iter_items() 提供逐条产出的生成器版本，适合超大目录。
     """
 
+    # 支持的排序方式
+    SORT_KEYS = ("path", "name", "size", "mtime", "type")
+
+    idempotent = True
+    # 递归列表中子目录的变化不会改变顶层目录的修改时间，缓存结果最多保留5秒
+    cache_ttl = 5.0
+
     def __init__(self):
         """
         初始化目录列表工具
         """
         super().__init__(
             name="directory_lister",
-            description="列出目录内容"
+            description="列出目录内容，支持递归、过滤、排序和分页"
         )
 
-    def execute(self, directory_path: str, show_hidden: bool = False, **kwargs) -> Dict[str, Any]:
+    def execute(self, directory_path: str, show_hidden: bool = False, recursive: bool = False,
+                max_depth: Optional[int] = None, include: Optional[Any] = None, exclude: Optional[Any] = None,
+                pattern_type: str = "glob", sort_by: str = "path", reverse: bool = False,
+                limit: Optional[int] = None, cursor: Optional[str] = None,
+                cancel_token: Optional[CancellationToken] = None, **kwargs) -> Dict[str, Any]:
         """
         执行目录列表
 
         参数:
             directory_path: 目录路径
             show_hidden: 是否显示隐藏文件
+            recursive: 是否递归列出子目录
+            max_depth: 递归的最大深度（1表示只列出当前目录）
+            include: 包含模式（字符串或列表），只返回匹配的条目
+            exclude: 排除模式（字符串或列表），匹配的条目及其子目录都会被跳过
+            pattern_type: 模式类型，'glob' 或 'regex'
+            sort_by: 排序方式：path（按路径，流式）、name、size、mtime、type（目录优先）
+            reverse: 是否倒序
+            limit: 每页最多返回的条目数，为None时返回全部
+            cursor: 上一页返回的 next_cursor
+            cancel_token: 取消令牌，每扫描一个目录检查一次
             **kwargs: 额外参数
 
         返回:
@@ -345,35 +830,46 @@ class DirectoryListerTool(FileTool):
             ToolError: 如果列出失败
         """
         try:
-            # 检查目录是否存在
-            if not os.path.exists(directory_path):
-                raise ToolError(f"目录 '{directory_path}' 不存在")
-
-            # 检查是否是目录
-            if not os.path.isdir(directory_path):
-                raise ToolError(f"路径 '{directory_path}' 不是目录")
-
-            # 列出目录内容
-            items = []
-            for item in os.listdir(directory_path):
-                # 跳过隐藏文件（如果不显示）
-                if not show_hidden and item.startswith('.'):
-                    continue
+            if sort_by not in self.SORT_KEYS:
+                raise ToolError(f"不支持的排序方式: {sort_by}")
+            if limit is not None and limit <= 0:
+                raise ToolError("limit 必须大于0")
+            position = self._decode_cursor(cursor) if cursor else {}
+
+            options = {
+                "show_hidden": show_hidden,
+                "recursive": recursive,
+                "max_depth": max_depth,
+                "include": include,
+                "exclude": exclude,
+                "pattern_type": pattern_type,
+                "cancel_token": cancel_token
+            }
 
-                item_path = os.path.join(directory_path, item)
-                items.append({
-                    "name": item,
-                    "path": item_path,
-                    "is_directory": os.path.isdir(item_path),
-                    "size": os.path.getsize(item_path) if os.path.isfile(item_path) else 0
-                })
+            if sort_by == "path" and not reverse:
+                # 按路径顺序流式遍历，游标记录最后一个条目的相对路径，恢复时跳过之前的子树
+                stream = self.iter_items(directory_path, after=position.get("after"), **options)
+                items = list(itertools.islice(stream, limit + 1 if limit else None))
+                next_cursor = None
+                if limit and len(items) > limit:
+                    items = items[:limit]
+                    next_cursor = self._encode_cursor({"after": items[-1]["relative_path"]})
+            else:
+                # 其他排序方式需要先收集全部条目，游标记录偏移量
+                all_items = list(self.iter_items(directory_path, **options))
+                all_items.sort(key=self._sort_key(sort_by), reverse=reverse)
+                offset = position.get("offset", 0)
+                end = offset + limit if limit else len(all_items)
+                items = all_items[offset:end]
+                next_cursor = self._encode_cursor({"offset": end}) if end < len(all_items) else None
 
             return {
                 "success": True,
                 "result": {
                     "directory_path": directory_path,
                     "items": items,
-                    "total_items": len(items)
+                    "total_items": len(items),
+                    "next_cursor": next_cursor
                 }
             }
         except ToolError:
@@ -381,6 +877,178 @@ class DirectoryListerTool(FileTool):
         except Exception as e:
             raise ToolError(f"列出目录失败: {str(e)}")
 
+    def iter_items(self, directory_path: str, show_hidden: bool = False, recursive: bool = False,
+                   max_depth: Optional[int] = None, include: Optional[Any] = None, exclude: Optional[Any] = None,
+                   pattern_type: str = "glob", after: Optional[str] = None,
+                   cancel_token: Optional[CancellationToken] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按路径顺序逐条产出目录条目（深度优先，同一目录内按名称排序）
+
+        参数:
+            directory_path: 目录路径
+            show_hidden: 是否包含隐藏文件
+            recursive: 是否递归子目录
+            max_depth: 递归的最大深度
+            include: 包含模式
+            exclude: 排除模式
+            pattern_type: 模式类型，'glob' 或 'regex'
+            after: 从该相对路径之后开始产出（用于分页恢复）
+            cancel_token: 取消令牌，每扫描一个目录检查一次
+
+        返回:
+            条目字典的迭代器
+
+        异常:
+            ToolError: 如果目录不存在或模式无效
+        """
+        # 检查目录是否存在
+        if not os.path.exists(directory_path):
+            raise ToolError(f"目录 '{directory_path}' 不存在")
+
+        # 检查是否是目录
+        if not os.path.isdir(directory_path):
+            raise ToolError(f"路径 '{directory_path}' 不是目录")
+
+        include_matcher = _compile_patterns(include, pattern_type)
+        exclude_matcher = _compile_patterns(exclude, pattern_type)
+        if not recursive:
+            max_depth = 1
+
+        root_entries = self._scan(directory_path, show_hidden, strict=True)
+        # 栈中每一项为 (相对目录, 深度, 条目迭代器, 剩余的恢复路径)
+        after_parts = tuple(after.split("/")) if after else None
+        stack = [("", 1, iter(root_entries), after_parts)]
+        while stack:
+            rel_dir, depth, entries, after_rest = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+
+            relative_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if exclude_matcher and exclude_matcher(entry.name, relative_path):
+                continue
+
+            # 恢复分页：跳过游标之前的条目，游标路径上的祖先目录只下钻不产出
+            emit = True
+            child_after = None
+            if after_rest:
+                if entry.name < after_rest[0]:
+                    continue
+                if entry.name == after_rest[0]:
+                    emit = False
+                    child_after = after_rest[1:] or None
+                else:
+                    # 已经越过游标位置，之后的条目都正常产出
+                    stack[-1] = (rel_dir, depth, entries, None)
+
+            descend = (max_depth is None or depth < max_depth) and entry.is_dir(follow_symlinks=False)
+
+            if emit and (include_matcher is None or include_matcher(entry.name, relative_path)):
+                yield self._make_item(entry, relative_path, depth)
+
+            if descend:
+                checkpoint(cancel_token)
+                stack.append((relative_path, depth + 1, iter(self._scan(entry.path, show_hidden)), child_after))
+
+    @staticmethod
+    def _scan(path: str, show_hidden: bool, strict: bool = False) -> List[os.DirEntry]:
+        """
+        读取单个目录的条目并按名称排序
+
+        参数:
+            path: 目录路径
+            show_hidden: 是否包含隐藏文件
+            strict: 为False时忽略无法访问的子目录
+
+        返回:
+            条目列表
+        """
+        try:
+            with os.scandir(path) as it:
+                entries = [entry for entry in it if show_hidden or not entry.name.startswith('.')]
+        except OSError:
+            if strict:
+                raise
+            return []
+        entries.sort(key=lambda entry: entry.name)
+        return entries
+
+    @staticmethod
+    def _make_item(entry: os.DirEntry, relative_path: str, depth: int) -> Dict[str, Any]:
+        """
+        根据 DirEntry 生成条目字典，每个条目最多一次 stat
+
+        参数:
+            entry: 目录条目
+            relative_path: 相对于列出目录的路径（使用'/'分隔）
+            depth: 条目深度
+
+        返回:
+            条目字典
+        """
+        try:
+            is_directory = entry.is_dir()
+            st = entry.stat()
+            size = st.st_size if not is_directory else 0
+            mtime = st.st_mtime
+        except OSError:
+            # 失效的符号链接等
+            is_directory, size, mtime = False, 0, None
+        return {
+            "name": entry.name,
+            "path": entry.path,
+            "relative_path": relative_path,
+            "depth": depth,
+            "is_directory": is_directory,
+            "size": size,
+            "mtime": mtime
+        }
+
+    @staticmethod
+    def _sort_key(sort_by: str):
+        """
+        获取排序键函数
+        """
+        if sort_by == "name":
+            return lambda item: (item["name"], item["relative_path"])
+        if sort_by == "size":
+            return lambda item: (item["size"], item["relative_path"])
+        if sort_by == "mtime":
+            return lambda item: (item["mtime"] or 0, item["relative_path"])
+        if sort_by == "type":
+            return lambda item: (not item["is_directory"], item["relative_path"])
+        return lambda item: item["relative_path"].split("/")
+
+    @staticmethod
+    def _encode_cursor(position: Dict[str, Any]) -> str:
+        """
+        编码分页游标
+        """
+        return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Dict[str, Any]:
+        """
+        解码分页游标
+
+        异常:
+            ToolError: 如果游标无效
+        """
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        except (ValueError, UnicodeError):
+            raise ToolError(f"无效的分页游标: {cursor}")
+        if not isinstance(position, dict):
+            raise ToolError(f"无效的分页游标: {cursor}")
+        return position
+
+    def cache_dependencies(self, directory_path: str = "", **kwargs) -> Optional[List[str]]:
+        """
+        列表结果依赖被列出的目录
+        """
+        return [directory_path]
+
     def get_parameters(self) -> Dict[str, Any]:
         """
         获取工具参数信息
@@ -391,6 +1059,7 @@ class DirectoryListerTool(FileTool):
         return {
             "directory_path": {
                 "type": "string",
+                "format": "path",
                 "description": "要列出的目录路径",
                 "required": True
             },
@@ -399,24 +1068,623 @@ class DirectoryListerTool(FileTool):
                 "description": "是否显示隐藏文件",
                 "required": False,
                 "default": False
+            },
+            "recursive": {
+                "type": "boolean",
+                "description": "是否递归列出子目录",
+                "required": False,
+                "default": False
+            },
+            "max_depth": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "递归的最大深度（1表示只列出当前目录）",
+                "required": False
+            },
+            "include": {
+                "type": "array",
+                "description": "包含模式列表，只返回匹配的条目",
+                "required": False
+            },
+            "exclude": {
+                "type": "array",
+                "description": "排除模式列表，匹配的条目及其子目录会被跳过",
+                "required": False
+            },
+            "pattern_type": {
+                "type": "string",
+                "enum": ["glob", "regex"],
+                "description": "模式类型：glob 或 regex",
+                "required": False,
+                "default": "glob"
+            },
+            "sort_by": {
+                "type": "string",
+                "enum": list(self.SORT_KEYS),
+                "description": "排序方式：path、name、size、mtime、type",
+                "required": False,
+                "default": "path"
+            },
+            "reverse": {
+                "type": "boolean",
+                "description": "是否倒序",
+                "required": False,
+                "default": False
+            },
+            "limit": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "每页最多返回的条目数",
+                "required": False
+            },
+            "cursor": {
+                "type": "string",
+                "description": "上一页返回的 next_cursor",
+                "required": False
+            }
+        }
+
+
+class FileSearchTool(FileTool):
+    """
+    文件查找工具
+
+    基于持久化的工作区索引按名称、扩展名、大小和修改时间查找文件，
+    查询前按需增量刷新索引（只检查目录的修改时间）。
+    """
+
+    idempotent = True
+    cache_ttl = 5.0
+
+    def __init__(self, index: Optional[WorkspaceIndex] = None, refresh_interval: float = 5.0):
+        """
+        初始化文件查找工具
+
+        参数:
+            index: 工作区索引，为None时在第一次使用时获取全局索引
+            refresh_interval: 自动刷新索引的最小间隔（秒）
+        """
+        super().__init__(
+            name="file_search",
+            description="在工作区索引中按名称、扩展名、大小和修改时间查找文件"
+        )
+        self._index = index
+        self.refresh_interval = refresh_interval
+
+    @property
+    def index(self) -> WorkspaceIndex:
+        """
+        工作区索引（延迟创建）
+        """
+        if self._index is None:
+            self._index = get_workspace_index()
+        return self._index
+
+    def execute(self, name: Optional[str] = None, extension: Optional[str] = None,
+                min_size: Optional[int] = None, max_size: Optional[int] = None,
+                modified_after: Optional[float] = None, modified_before: Optional[float] = None,
+                path: Optional[str] = None, type: Optional[str] = None, order_by: str = "path",
+                limit: int = 100, refresh: bool = False, cancel_token: Optional[CancellationToken] = None,
+                **kwargs) -> Dict[str, Any]:
+        """
+        执行文件查找
+
+        参数:
+            name: 名称模式，包含通配符时按glob匹配，否则按子串匹配
+            extension: 扩展名
+            min_size: 最小文件大小（字节）
+            max_size: 最大文件大小（字节）
+            modified_after: 修改时间下限（Unix时间戳）
+            modified_before: 修改时间上限（Unix时间戳）
+            path: 只在该目录下查找，目录不在索引范围内时临时遍历该目录（不加入索引）
+            type: 'file' 或 'directory'
+            order_by: 排序字段：path、name、size、mtime
+            limit: 最多返回的条目数
+            refresh: 是否在查询前强制刷新索引
+            cancel_token: 取消令牌，在刷新索引和查询前检查
+            **kwargs: 额外参数
+
+        返回:
+            执行结果字典
+
+        异常:
+            ToolError: 如果查找失败
+        """
+        temporary = None
+        try:
+            if type not in (None, "file", "directory"):
+                raise ToolError(f"不支持的条目类型: {type}")
+            index = self.index
+            if path is not None:
+                if not os.path.isdir(path):
+                    raise ToolError(f"路径 '{path}' 不是目录")
+                if not index.covers(path):
+                    # 不在索引范围内的目录使用一次性的内存索引，不扩大共享索引的根目录
+                    temporary = index = WorkspaceIndex([path], index_path=":memory:",
+                                                       exclude_dirs=index.exclude_dirs)
+
+            refresh_stats = None
+            checkpoint(cancel_token)
+            if refresh or index.last_refresh is None or time.time() - index.last_refresh >= self.refresh_interval:
+                refresh_stats = index.refresh()
+
+            checkpoint(cancel_token)
+            start = time.perf_counter()
+            items = index.search(
+                name=name,
+                extension=extension,
+                min_size=min_size,
+                max_size=max_size,
+                modified_after=modified_after,
+                modified_before=modified_before,
+                path=path,
+                entry_type=type,
+                order_by=order_by,
+                limit=limit
+            )
+
+            return {
+                "success": True,
+                "result": {
+                    "items": items,
+                    "total_items": len(items),
+                    "query_time": time.perf_counter() - start,
+                    "refresh": refresh_stats
+                }
+            }
+        except ToolError:
+            raise
+        except Exception as e:
+            raise ToolError(f"查找文件失败: {str(e)}")
+        finally:
+            if temporary is not None:
+                temporary.close()
+
+    def cache_dependencies(self, path: Optional[str] = None, refresh: bool = False, **kwargs) -> Optional[List[str]]:
+        """
+        查找结果依赖查找目录；强制刷新索引时不使用缓存
+        """
+        if refresh:
+            return None
+        return [path] if path else []
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """
+        获取工具参数信息
+
+        返回:
+            参数信息字典
+        """
+        return {
+            "name": {
+                "type": "string",
+                "description": "名称模式，包含 * ? [ 时按glob匹配，否则按子串匹配",
+                "required": False
+            },
+            "extension": {
+                "type": "string",
+                "description": "扩展名，例如 '.py'",
+                "required": False
+            },
+            "min_size": {
+                "type": "integer",
+                "description": "最小文件大小（字节）",
+                "required": False
+            },
+            "max_size": {
+                "type": "integer",
+                "description": "最大文件大小（字节）",
+                "required": False
+            },
+            "modified_after": {
+                "type": "number",
+                "description": "修改时间下限（Unix时间戳）",
+                "required": False
+            },
+            "modified_before": {
+                "type": "number",
+                "description": "修改时间上限（Unix时间戳）",
+                "required": False
+            },
+            "path": {
+                "type": "string",
+                "format": "path",
+                "description": "只在该目录下查找",
+                "required": False
+            },
+            "type": {
+                "enum": ["file", "directory"],
+                "type": "string",
+                "description": "条目类型：file 或 directory",
+                "required": False
+            },
+            "order_by": {
+                "type": "string",
+                "enum": ["path", "name", "size", "mtime"],
+                "description": "排序字段：path、name、size、mtime",
+                "required": False,
+                "default": "path"
+            },
+            "limit": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "最多返回的条目数",
+                "required": False,
+                "default": 100
+            },
+            "refresh": {
+                "type": "boolean",
+                "description": "是否在查询前强制刷新索引",
+                "required": False,
+                "default": False
             }
         }
 
 
+class ContentSearchTool(FileTool):
+    """
+    全文查找工具
+
+    使用磁盘上的三元组索引筛选候选文件，再对候选文件执行正则匹配，
+    不需要为每次查找启动 grep 进程或扫描所有文件。
+    超过索引大小上限的文本文件没有三元组索引，不超过 max_scan_size 时直接扫描，
+    更大的文件在结果的 skipped_files 中列出。
+    """
+
+    idempotent = True
+    cache_ttl = 5.0
+
+    def __init__(self, index: Optional[ContentIndex] = None, refresh_interval: float = 5.0):
+        """
+        初始化全文查找工具
+
+        参数:
+            index: 全文索引，为None时在第一次使用时获取全局索引
+            refresh_interval: 自动刷新索引的最小间隔（秒）
+        """
+        super().__init__(
+            name="content_search",
+            description="按正则表达式或固定字符串查找文件内容，返回匹配的行"
+        )
+        self._index = index
+        self.refresh_interval = refresh_interval
+
+    @property
+    def index(self) -> ContentIndex:
+        """
+        全文索引（延迟创建）
+        """
+        if self._index is None:
+            self._index = get_content_index()
+        return self._index
+
+    def execute(self, pattern: str, fixed_string: bool = False, ignore_case: bool = False,
+                path: Optional[str] = None, extension: Optional[str] = None, max_results: int = 50,
+                max_matches_per_file: int = 5, snippet_length: int = 200, refresh: bool = False,
+                max_scan_size: int = DEFAULT_MAX_SCAN_SIZE, cancel_token: Optional[CancellationToken] = None,
+                **kwargs) -> Dict[str, Any]:
+        """
+        执行全文查找
+
+        参数:
+            pattern: 正则表达式（fixed_string=True 时为固定字符串）
+            fixed_string: 是否把 pattern 当作固定字符串
+            ignore_case: 是否忽略大小写
+            path: 只在该目录下查找，目录不在索引范围内时直接扫描该目录下的文件（不加入索引）
+            extension: 只查找该扩展名的文件
+            max_results: 最多返回的匹配数
+            max_matches_per_file: 每个文件最多返回的匹配数
+            snippet_length: 匹配行片段的最大长度
+            refresh: 是否在查询前强制刷新索引
+            max_scan_size: 没有建立索引的大文件直接扫描的最大大小（字节），更大的文件列为跳过
+            cancel_token: 取消令牌，在刷新索引前和每读取一个候选文件前检查
+            **kwargs: 额外参数
+
+        返回:
+            执行结果字典；truncated 表示因 max_results 或 max_matches_per_file 省略了匹配
+
+        异常:
+            ToolError: 如果查找失败
+        """
+        temporary = None
+        try:
+            regex_source = re.escape(pattern) if fixed_string else pattern
+            try:
+                regex = re.compile(regex_source, re.IGNORECASE if ignore_case else 0)
+            except re.error as e:
+                raise ToolError(f"无效的正则表达式: {str(e)}")
+
+            index = self.index
+            if path is not None:
+                if not os.path.isdir(path):
+                    raise ToolError(f"路径 '{path}' 不是目录")
+                if not index.covers(path):
+                    # 不在索引范围内的目录使用一次性的内存索引，不扩大共享索引的根目录；
+                    # max_file_size=0 时不读取文件、不建立三元组，所有文件按 max_scan_size 直接扫描
+                    temporary = index = ContentIndex([path], index_path=":memory:",
+                                                     exclude_dirs=index.exclude_dirs, max_file_size=0)
+            if extension and not extension.startswith("."):
+                extension = "." + extension
+
+            refresh_stats = None
+            checkpoint(cancel_token)
+            if refresh or index.last_refresh is None or time.time() - index.last_refresh >= self.refresh_interval:
+                refresh_stats = index.refresh()
+
+            start = time.perf_counter()
+            # (路径, 是否为没有索引、需要直接扫描的大文件)
+            candidates = [(candidate, False) for candidate in index.candidates(regex_source, path)]
+            skipped_files = []
+            for candidate, size in index.oversized(path):
+                if extension and not candidate.lower().endswith(extension.lower()):
+                    continue
+                if size <= max_scan_size:
+                    candidates.append((candidate, True))
+                elif not self._is_binary(candidate):
+                    skipped_files.append({"path": candidate, "size": size, "reason": "too_large"})
+            if extension:
+                candidates = [c for c in candidates if c[0].lower().endswith(extension.lower())]
+            candidates.sort()
+
+            matches = []
+            files_searched = 0
+            truncated = False
+            for candidate, unindexed in candidates:
+                if len(matches) >= max_results:
+                    truncated = True
+                    break
+                checkpoint(cancel_token)
+                try:
+                    if unindexed:
+                        with open(candidate, 'rb') as f:
+                            data = f.read(BINARY_CHECK_SIZE)
+                            if b"\0" in data:
+                                continue
+                            data += f.read(max_scan_size + 1 - len(data))
+                        if len(data) > max_scan_size:
+                            # 文件在刷新后变大
+                            skipped_files.append({"path": candidate, "size": len(data), "reason": "too_large"})
+                            continue
+                    else:
+                        data = get_file_cache().load(candidate)
+                        if data is None:
+                            with open(candidate, 'rb') as f:
+                                data = f.read()
+                except OSError:
+                    # 文件在刷新后被删除
+                    continue
+                files_searched += 1
+                text = data.decode("utf-8", "replace")
+                limit = min(max_matches_per_file, max_results - len(matches))
+                # 多找一个匹配，用来判断是否省略了匹配
+                found = self._find_matches(regex, text, candidate, limit + 1, snippet_length)
+                if len(found) > limit:
+                    truncated = True
+                    found = found[:limit]
+                matches.extend(found)
+
+            return {
+                "success": True,
+                "result": {
+                    "pattern": pattern,
+                    "matches": matches,
+                    "total_matches": len(matches),
+                    "candidate_files": len(candidates),
+                    "files_searched": files_searched,
+                    "skipped_files": skipped_files,
+                    "truncated": truncated,
+                    "query_time": time.perf_counter() - start,
+                    "refresh": refresh_stats
+                }
+            }
+        except ToolError:
+            raise
+        except Exception as e:
+            raise ToolError(f"查找内容失败: {str(e)}")
+        finally:
+            if temporary is not None:
+                temporary.close()
+
+    @staticmethod
+    def _is_binary(file_path: str) -> bool:
+        """
+        按文件开头是否包含NUL字节判断是否为二进制文件（无法读取时视为二进制）
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                return b"\0" in f.read(BINARY_CHECK_SIZE)
+        except OSError:
+            return True
+
+    @staticmethod
+    def _find_matches(regex, text: str, file_path: str, limit: int, snippet_length: int) -> List[Dict[str, Any]]:
+        """
+        在文本中查找匹配并生成行片段
+
+        参数:
+            regex: 编译后的正则表达式
+            text: 文件内容
+            file_path: 文件路径
+            limit: 最多返回的匹配数
+            snippet_length: 行片段的最大长度
+
+        返回:
+            匹配列表
+        """
+        matches = []
+        line_number = 1
+        position = 0
+        last_line_start = -1
+        for match in regex.finditer(text):
+            start = match.start()
+            line_number += text.count("\n", position, start)
+            position = start
+            line_start = text.rfind("\n", 0, start) + 1
+            # 每行只报告第一个匹配
+            if line_start == last_line_start:
+                continue
+            last_line_start = line_start
+            line_end = text.find("\n", start)
+            if line_end == -1:
+                line_end = len(text)
+            line = text[line_start:line_end].rstrip("\r")
+            column = start - line_start
+            if len(line) > snippet_length:
+                # 以匹配位置为中心截取片段
+                begin = max(0, min(column - snippet_length // 2, len(line) - snippet_length))
+                line = line[begin:begin + snippet_length]
+            matches.append({
+                "path": file_path,
+                "line": line_number,
+                "column": column + 1,
+                "text": line,
+                "match": match.group(0)[:snippet_length]
+            })
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def cache_dependencies(self, path: Optional[str] = None, refresh: bool = False, **kwargs) -> Optional[List[str]]:
+        """
+        查找结果依赖查找目录；强制刷新索引时不使用缓存
+        """
+        if refresh:
+            return None
+        return [path] if path else []
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """
+        获取工具参数信息
+
+        返回:
+            参数信息字典
+        """
+        return {
+            "pattern": {
+                "type": "string",
+                "description": "正则表达式（fixed_string=True 时为固定字符串）",
+                "required": True
+            },
+            "fixed_string": {
+                "type": "boolean",
+                "description": "是否把 pattern 当作固定字符串",
+                "required": False,
+                "default": False
+            },
+            "ignore_case": {
+                "type": "boolean",
+                "description": "是否忽略大小写",
+                "required": False,
+                "default": False
+            },
+            "path": {
+                "type": "string",
+                "format": "path",
+                "description": "只在该目录下查找",
+                "required": False
+            },
+            "extension": {
+                "type": "string",
+                "description": "只查找该扩展名的文件，例如 '.py'",
+                "required": False
+            },
+            "max_results": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "最多返回的匹配数",
+                "required": False,
+                "default": 50
+            },
+            "max_matches_per_file": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "每个文件最多返回的匹配数",
+                "required": False,
+                "default": 5
+            },
+            "snippet_length": {
+                "type": "integer",
+                "description": "匹配行片段的最大长度",
+                "required": False,
+                "default": 200
+            },
+            "refresh": {
+                "type": "boolean",
+                "description": "是否在查询前强制刷新索引",
+                "required": False,
+                "default": False
+            },
+            "max_scan_size": {
+                "type": "integer",
+                "minimum": 0,
+                "description": "没有建立索引的大文件直接扫描的最大大小（字节），更大的文件在 skipped_files 中列出",
+                "required": False,
+                "default": DEFAULT_MAX_SCAN_SIZE
+            }
+        }
+
+
+def _compile_patterns(patterns: Optional[Any], pattern_type: str):
+    """
+    将glob或正则模式编译为匹配函数
+
+    参数:
+        patterns: 模式字符串或列表
+        pattern_type: 'glob' 或 'regex'
+
+    返回:
+        接受 (名称, 相对路径) 的匹配函数，没有模式时返回None
+
+    异常:
+        ToolError: 如果模式类型或正则表达式无效
+    """
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    if pattern_type == "glob":
+        regexes = [re.compile(fnmatch.translate(pattern)) for pattern in patterns]
+    elif pattern_type == "regex":
+        try:
+            regexes = [re.compile(pattern) for pattern in patterns]
+        except re.error as e:
+            raise ToolError(f"无效的正则表达式: {str(e)}")
+    else:
+        raise ToolError(f"不支持的模式类型: {pattern_type}")
+
+    if pattern_type == "glob":
+        # glob 模式同时匹配名称和相对路径，例如 '*.py' 与 'src/*.py' 都可用
+        return lambda name, path: any(r.match(name) or r.match(path) for r in regexes)
+    return lambda name, path: any(r.search(path) for r in regexes)
+
+
 # 工具初始化函数
-def initialize_tools():
+def initialize_tools(registry: Optional[ToolRegistry] = None) -> ToolRegistry:
     """
     初始化并注册所有工具
-    """
-    from .tool_interface import get_tool_registry
 
-    registry = get_tool_registry()
+    重复调用是安全的：已注册的同名工具会被保留，不会抛出异常。
+
+    参数:
+        registry: 目标工具注册表，为None时使用全局工具注册表
+
+    返回:
+        完成注册的工具注册表
+    """
+    if registry is None:
+        registry = get_tool_registry()
 
     # 注册文件工具
-    registry.register_tool(FileReaderTool())
-    registry.register_tool(FileWriterTool())
-    registry.register_tool(FileAppenderTool())
-    registry.register_tool(DirectoryListerTool())
+    registry.register_tool(FileReaderTool(), exist_ok=True)
+    registry.register_tool(FileWriterTool(), exist_ok=True)
+    registry.register_tool(FileAppenderTool(), exist_ok=True)
+    registry.register_tool(BatchFileWriterTool(), exist_ok=True)
+    registry.register_tool(DirectoryListerTool(), exist_ok=True)
+    registry.register_tool(FileSearchTool(), exist_ok=True)
+    registry.register_tool(ContentSearchTool(), exist_ok=True)
 
     # 注册命令执行工具
-    registry.register_tool(CommandExecutorTool())
+    registry.register_tool(CommandExecutorTool(), exist_ok=True)
+
+    return registry
@@ -0,0 +1,346 @@
+"""
+工作区文件索引
+
+为配置的根目录维护一个持久化的路径/元数据索引（SQLite），用于按名称、扩展名、
+大小和修改时间快速查找文件，避免每次查找都重新遍历磁盘。
+
+增量刷新按目录的修改时间判断：目录的 mtime 未变化时，其直接子条目集合没有变化，
+只需要继续检查子目录；发生变化的目录才会重新 scandir 并更新条目。
+注意原地修改文件内容不会改变目录的 mtime，因此文件的大小和修改时间可能滞后，
+需要精确元数据时可以调用 refresh(full=True)。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional, List, Iterable
+
+
+# 默认跳过的目录名称
+DEFAULT_EXCLUDE_DIRS = (".git", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache", ".pytest_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    root TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    is_dir INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent);
+CREATE INDEX IF NOT EXISTS idx_entries_name ON entries(name);
+CREATE INDEX IF NOT EXISTS idx_entries_ext ON entries(ext);
+CREATE INDEX IF NOT EXISTS idx_entries_size ON entries(size);
+CREATE INDEX IF NOT EXISTS idx_entries_mtime ON entries(mtime);
+"""
+
+
+def default_index_path(file_name: str = "workspace_index.db") -> str:
+    """
+    获取默认的索引文件路径
+
+    参数:
+        file_name: 索引文件名
+
+    返回:
+        索引文件路径（位于用户缓存目录下）
+    """
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "learn_agent", file_name)
+
+
+def _subtree_bounds(path: str):
+    """
+    计算某个目录下所有子路径在字符串排序中的范围，用于范围删除和前缀查询
+    """
+    return path + os.sep, path + chr(ord(os.sep) + 1)
+
+
+class WorkspaceIndex:
+    """
+    持久化的工作区文件索引，线程安全
+    """
+
+    def __init__(self, roots: Optional[Iterable[str]] = None, index_path: Optional[str] = None,
+                 exclude_dirs: Iterable[str] = DEFAULT_EXCLUDE_DIRS):
+        """
+        初始化工作区索引
+
+        参数:
+            roots: 要索引的根目录列表，默认为当前工作目录
+            index_path: 索引数据库路径，为None时使用用户缓存目录，':memory:' 表示不持久化
+            exclude_dirs: 跳过的目录名称
+        """
+        self.roots: List[str] = []
+        self.index_path = index_path or default_index_path()
+        self.exclude_dirs = set(exclude_dirs)
+        self.last_refresh: Optional[float] = None
+        self._lock = threading.RLock()
+
+        if self.index_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        if self.index_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        for root in roots if roots is not None else [os.getcwd()]:
+            self.add_root(root)
+
+    def add_root(self, root: str) -> str:
+        """
+        添加一个要索引的根目录（不会立即扫描）
+
+        参数:
+            root: 根目录路径
+
+        返回:
+            规范化后的根目录路径
+        """
+        root = os.path.abspath(root)
+        with self._lock:
+            if root not in self.roots:
+                self.roots.append(root)
+                # 新根目录需要在下次查询前扫描
+                self.last_refresh = None
+        return root
+
+    def covers(self, path: str) -> bool:
+        """
+        判断路径是否在某个根目录下
+
+        参数:
+            path: 路径
+
+        返回:
+            是否在索引范围内
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            return any(path == root or path.startswith(root + os.sep) for root in self.roots)
+
+    def close(self):
+        """
+        关闭索引数据库
+        """
+        with self._lock:
+            self._conn.close()
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """
+        增量刷新索引
+
+        参数:
+            full: 是否忽略目录修改时间，重新扫描所有目录
+
+        返回:
+            刷新统计信息
+        """
+        start = time.perf_counter()
+        stats = {"dirs_checked": 0, "dirs_rescanned": 0, "entries_updated": 0, "entries_removed": 0}
+        with self._lock:
+            try:
+                for root in self.roots:
+                    self._refresh_root(root, full, stats)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self.last_refresh = time.time()
+        stats["elapsed"] = time.perf_counter() - start
+        return stats
+
+    def _refresh_root(self, root: str, full: bool, stats: Dict[str, Any]):
+        """
+        刷新一个根目录
+        """
+        conn = self._conn
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            stats["dirs_checked"] += 1
+            try:
+                st = os.stat(directory)
+            except OSError:
+                self._remove_subtree(directory, stats)
+                continue
+
+            row = conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (directory,)).fetchone()
+            if row is not None and row[0] == st.st_mtime_ns and not full:
+                # 目录内容没有变化，只需继续检查子目录
+                stack.extend(path for (path,) in conn.execute(
+                    "SELECT path FROM entries WHERE parent = ? AND is_dir = 1", (directory,)))
+                continue
+
+            stats["dirs_rescanned"] += 1
+            existing = {path: is_dir for path, is_dir in conn.execute(
+                "SELECT path, is_dir FROM entries WHERE parent = ?", (directory,))}
+            rows = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if is_dir and entry.name in self.exclude_dirs:
+                            continue
+                        try:
+                            entry_stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        ext = "" if is_dir else os.path.splitext(entry.name)[1].lower()
+                        rows.append((entry.path, directory, root, entry.name, ext,
+                                     0 if is_dir else entry_stat.st_size, entry_stat.st_mtime, int(is_dir)))
+                        if is_dir:
+                            stack.append(entry.path)
+            except OSError:
+                self._remove_subtree(directory, stats)
+                continue
+
+            seen = {row[0] for row in rows}
+            for path, is_dir in existing.items():
+                if path not in seen:
+                    conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+                    stats["entries_removed"] += 1
+                    if is_dir:
+                        self._remove_subtree(path, stats)
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (directory, root, st.st_mtime_ns))
+            stats["entries_updated"] += len(rows)
+
+    def _remove_subtree(self, directory: str, stats: Dict[str, Any]):
+        """
+        删除目录及其所有子条目
+        """
+        low, high = _subtree_bounds(directory)
+        cursor = self._conn.execute("DELETE FROM entries WHERE path > ? AND path < ?", (low, high))
+        stats["entries_removed"] += max(cursor.rowcount, 0)
+        self._conn.execute("DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)", (directory, low, high))
+
+    def search(self, name: Optional[str] = None, extension: Optional[str] = None,
+               min_size: Optional[int] = None, max_size: Optional[int] = None,
+               modified_after: Optional[float] = None, modified_before: Optional[float] = None,
+               path: Optional[str] = None, entry_type: Optional[str] = None,
+               order_by: str = "path", limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        查询索引
+
+        参数:
+            name: 名称模式；包含 * ? [ 时按glob匹配（区分大小写），否则按子串匹配（不区分大小写）
+            extension: 扩展名（如 '.py' 或 'py'）
+            min_size: 最小文件大小（字节）
+            max_size: 最大文件大小（字节）
+            modified_after: 修改时间下限（Unix时间戳）
+            modified_before: 修改时间上限（Unix时间戳）
+            path: 只返回该目录下的条目
+            entry_type: 'file' 或 'directory'，为None时都返回
+            order_by: 排序字段：path、name、size、mtime（size和mtime按降序）
+            limit: 最多返回的条目数
+
+        返回:
+            条目字典列表
+        """
+        clauses = []
+        params: List[Any] = []
+        if self.roots:
+            clauses.append(f"root IN ({', '.join('?' * len(self.roots))})")
+            params.extend(self.roots)
+        if name:
+            if any(ch in name for ch in "*?["):
+                clauses.append("name GLOB ?")
+                params.append(name)
+            else:
+                escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                clauses.append("name LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+        if extension:
+            extension = extension.lower()
+            clauses.append("ext = ?")
+            params.append(extension if extension.startswith(".") else "." + extension)
+        if min_size is not None:
+            clauses.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            clauses.append("size <= ?")
+            params.append(max_size)
+        if modified_after is not None:
+            clauses.append("mtime >= ?")
+            params.append(modified_after)
+        if modified_before is not None:
+            clauses.append("mtime <= ?")
+            params.append(modified_before)
+        if path:
+            low, high = _subtree_bounds(os.path.abspath(path))
+            clauses.append("path > ? AND path < ?")
+            params.extend([low, high])
+        if entry_type == "file":
+            clauses.append("is_dir = 0")
+        elif entry_type == "directory":
+            clauses.append("is_dir = 1")
+
+        order = {"path": "path", "name": "name, path", "size": "size DESC, path", "mtime": "mtime DESC, path"}
+        sql = "SELECT path, name, ext, size, mtime, is_dir FROM entries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order.get(order_by, 'path')} LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "path": row[0],
+                "name": row[1],
+                "extension": row[2],
+                "size": row[3],
+                "mtime": row[4],
+                "is_directory": bool(row[5])
+            }
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取索引统计信息
+
+        返回:
+            统计信息字典
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            dirs = self._conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]
+        return {
+            "roots": list(self.roots),
+            "index_path": self.index_path,
+            "entries": entries,
+            "directories": dirs,
+            "last_refresh": self.last_refresh
+        }
+
+
+# 全局工作区索引实例
+_workspace_index = None
+_workspace_index_lock = threading.Lock()
+
+
+def get_workspace_index() -> WorkspaceIndex:
+    """
+    获取全局工作区索引实例（默认索引当前工作目录）
+
+    返回:
+        工作区索引实例
+    """
+    global _workspace_index
+    if _workspace_index is None:
+        with _workspace_index_lock:
+            if _workspace_index is None:
+                _workspace_index = WorkspaceIndex()
+    return _workspace_index
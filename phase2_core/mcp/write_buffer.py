@@ -0,0 +1,346 @@
+"""
+文件写入缓冲
+
+- atomic_write: 先写入同目录下的临时文件，再通过 os.replace 替换目标文件，
+  进程崩溃时不会留下只写了一半的文件；可选 fsync 策略。
+- AppendHandlePool: 复用追加写入的文件句柄，并支持写后缓冲（write-behind），
+  缓冲区按大小或时间间隔刷新到磁盘。
+
+fsync 策略:
+    none  不调用 fsync，依赖操作系统回写（默认）
+    file  替换/刷新前对文件调用 fsync
+    full  在 file 的基础上对所在目录调用 fsync，保证重命名本身也已持久化
+"""
+
+import atexit
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+from .file_cache import get_file_cache
+
+
+FSYNC_POLICIES = ("none", "file", "full")
+
+
+def _check_fsync_policy(fsync: str):
+    """
+    检查 fsync 策略是否有效
+
+    异常:
+        ValueError: 如果策略无效
+    """
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"不支持的fsync策略: {fsync}")
+
+
+def _fsync_directory(directory: str):
+    """
+    对目录调用 fsync（Windows 不支持，直接忽略）
+    """
+    if os.name != "posix":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_temp_file(file_path: str, data: bytes, fsync: str = "none") -> str:
+    """
+    把数据写入目标文件所在目录下的临时文件
+
+    参数:
+        file_path: 目标文件路径
+        data: 要写入的数据
+        fsync: fsync策略
+
+    返回:
+        临时文件路径
+    """
+    _check_fsync_policy(fsync)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        # 保留已存在文件的权限
+        try:
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return temp_path
+
+
+def commit_temp_file(temp_path: str, file_path: str, fsync: str = "none"):
+    """
+    用临时文件原子替换目标文件
+
+    参数:
+        temp_path: 临时文件路径
+        file_path: 目标文件路径
+        fsync: fsync策略
+    """
+    os.replace(temp_path, file_path)
+    if fsync == "full":
+        _fsync_directory(os.path.dirname(os.path.abspath(file_path)))
+
+
+def atomic_write(file_path: str, data: bytes, fsync: str = "none"):
+    """
+    原子写入文件：写入临时文件后通过 os.replace 替换
+
+    参数:
+        file_path: 文件路径
+        data: 要写入的数据
+        fsync: fsync策略
+    """
+    temp_path = write_temp_file(file_path, data, fsync)
+    try:
+        commit_temp_file(temp_path, file_path, fsync)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _AppendHandle:
+    """
+    一个被复用的追加句柄及其待写入缓冲
+    """
+
+    def __init__(self, path: str, file):
+        self.path = path
+        self.file = file
+        self.inode = os.fstat(file.fileno()).st_ino
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+
+
+class AppendHandlePool:
+    """
+    追加写入句柄池，线程安全
+
+    每个路径最多保持一个打开的句柄（超过 max_open 时按LRU关闭），避免每次追加都
+    打开、关闭文件和检查目录。buffered 模式下数据先进入内存缓冲区，累计达到
+    flush_bytes 或经过 flush_interval 秒后由后台线程写入磁盘。
+    """
+
+    def __init__(self, max_open: int = 64, flush_interval: float = 1.0, flush_bytes: int = 64 * 1024,
+                 fsync: str = "none"):
+        """
+        初始化句柄池
+
+        参数:
+            max_open: 最多同时打开的句柄数
+            flush_interval: 后台刷新缓冲区的间隔（秒）
+            flush_bytes: 单个文件缓冲达到该字节数时立即刷新
+            fsync: 刷新缓冲区时使用的fsync策略
+        """
+        _check_fsync_policy(fsync)
+        self.max_open = max_open
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self._handles: "OrderedDict[str, _AppendHandle]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stats = {"appends": 0, "flushes": 0, "opens": 0, "bytes_written": 0}
+
+    def append(self, file_path: str, data: bytes, buffered: bool = False) -> int:
+        """
+        追加数据
+
+        参数:
+            file_path: 文件路径
+            data: 要追加的数据
+            buffered: 是否写后缓冲；为False时数据在返回前已交给操作系统
+
+        返回:
+            该文件当前仍在缓冲区中的字节数
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            handle = self._get_handle(path)
+            handle.pending.append(data)
+            handle.pending_bytes += len(data)
+            self._stats["appends"] += 1
+            if not buffered or handle.pending_bytes >= self.flush_bytes:
+                self._flush_handle(handle, fsync=self.fsync if buffered else "none")
+            elif self._flusher is None:
+                self._start_flusher()
+            return handle.pending_bytes
+
+    def has_pending(self, file_path: str) -> bool:
+        """
+        文件是否有尚未写入磁盘的缓冲数据
+
+        参数:
+            file_path: 文件路径
+        """
+        handle = self._handles.get(os.path.abspath(file_path))
+        return handle is not None and handle.pending_bytes > 0
+
+    def flush(self, file_path: Optional[str] = None):
+        """
+        把缓冲数据写入磁盘
+
+        参数:
+            file_path: 文件路径，为None时刷新所有文件
+        """
+        with self._lock:
+            if file_path is None:
+                handles = list(self._handles.values())
+            else:
+                handle = self._handles.get(os.path.abspath(file_path))
+                handles = [handle] if handle is not None else []
+            for handle in handles:
+                self._flush_handle(handle, self.fsync)
+
+    def release(self, file_path: str):
+        """
+        刷新并关闭某个文件的句柄（文件将被替换或删除前调用）
+
+        参数:
+            file_path: 文件路径
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            handle = self._handles.pop(path, None)
+            if handle is not None:
+                try:
+                    self._flush_handle(handle, self.fsync)
+                finally:
+                    handle.file.close()
+
+    def close(self):
+        """
+        刷新所有缓冲区，关闭所有句柄并停止后台线程
+        """
+        self._stop_event.set()
+        with self._lock:
+            for path in list(self._handles):
+                self.release(path)
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=2.0)
+        self._flusher = None
+        self._stop_event.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        返回:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "open_handles": len(self._handles),
+                "pending_bytes": sum(handle.pending_bytes for handle in self._handles.values())
+            }
+
+    def _get_handle(self, path: str) -> _AppendHandle:
+        """
+        获取或打开路径对应的句柄（调用方需持有锁）
+        """
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        handle = _AppendHandle(path, open(path, "ab"))
+        self._stats["opens"] += 1
+        self._handles[path] = handle
+        while len(self._handles) > self.max_open:
+            _, old = self._handles.popitem(last=False)
+            try:
+                self._flush_handle(old, self.fsync)
+            finally:
+                old.file.close()
+        return handle
+
+    def _flush_handle(self, handle: _AppendHandle, fsync: str):
+        """
+        把一个句柄的缓冲数据写入磁盘（调用方需持有锁）
+        """
+        if not handle.pending:
+            return
+        # 文件在外部被替换或删除时重新打开，保证写入的是当前路径上的文件
+        try:
+            current_inode = os.stat(handle.path).st_ino
+        except FileNotFoundError:
+            current_inode = None
+        if current_inode != handle.inode:
+            handle.file.close()
+            handle.file = open(handle.path, "ab")
+            handle.inode = os.fstat(handle.file.fileno()).st_ino
+            self._stats["opens"] += 1
+
+        data = b"".join(handle.pending)
+        handle.pending.clear()
+        handle.pending_bytes = 0
+        handle.file.write(data)
+        handle.file.flush()
+        if fsync != "none":
+            os.fsync(handle.file.fileno())
+        self._stats["flushes"] += 1
+        self._stats["bytes_written"] += len(data)
+        # 文件内容已变化，使文件内容缓存失效
+        get_file_cache().invalidate(handle.path)
+
+    def _start_flusher(self):
+        """
+        启动后台刷新线程（调用方需持有锁）
+        """
+        self._flusher = threading.Thread(target=self._flush_loop, name="append-flusher", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        """
+        后台刷新循环
+        """
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"刷新追加缓冲失败: {str(e)}")
+
+
+# 全局追加句柄池
+_append_pool = None
+_append_pool_lock = threading.Lock()
+
+
+def get_append_pool() -> AppendHandlePool:
+    """
+    获取全局追加句柄池实例，进程退出时自动刷新
+
+    返回:
+        追加句柄池实例
+    """
+    global _append_pool
+    if _append_pool is None:
+        with _append_pool_lock:
+            if _append_pool is None:
+                _append_pool = AppendHandlePool()
+                atexit.register(_append_pool.close)
+    return _append_pool
@@ -2,99 +2,456 @@
 MCP高级功能实现
 """
 
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import math
+import statistics
 import time
 import threading
-import queue
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Iterable, Union, Callable
+
+from phase3_advanced.mcp_advanced.allocation import AllocationPolicy, create_policy
+from phase3_advanced.mcp_advanced.autoscaler import AutoscalePolicy
+from phase3_advanced.mcp_advanced.durable_queue import DurableTaskStore
+from phase3_advanced.mcp_advanced.executors import ExecutorBackend, create_executor
+from phase3_advanced.mcp_advanced.retry import RetryPolicy, TimerWheel, DeadLetterQueue
+from phase3_advanced.mcp_advanced.task_metrics import TaskMetrics
+
+
+# 资源心跳超时时间（秒），超过该时间没有心跳的资源被判定为失效
+HEARTBEAT_TIMEOUT = 30
+
+# 故障检测方式：timeout 按固定超时判断，phi 按心跳间隔的分布自适应判断（phi accrual）
+FAILURE_DETECTORS = ("timeout", "phi")
+
+# 任务的终止状态
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# 任务类型：io 任务在工作线程中执行，cpu 任务由执行后端在其他进程中执行
+TASK_KINDS = ("io", "cpu")
+
+# 依赖失败时的处理方式：fail 使依赖它的任务以 DependencyError 结束，run 照常执行
+DEPENDENCY_FAILURE_MODES = ("fail", "run")
+
+# 记录释放（结果被取走或任务被取消）后保留结果供依赖解析的任务数
+FINISHED_HISTORY = 10000
+
+
+class DependencyError(Exception):
+    """
+    上游任务失败或被取消时，依赖它的任务（on_dependency_failure="fail"）以该异常结束
+    """
+    
+    def __init__(self, task_id: str, dependency: str, error: BaseException):
+        """
+        初始化依赖错误
+        
+        Args:
+            task_id: 任务ID
+            dependency: 失败的上游任务ID
+            error: 上游任务的异常
+        """
+        super().__init__(f"任务 {task_id} 的依赖 {dependency} 失败: {error}")
+        self.task_id = task_id
+        self.dependency = dependency
+        self.__cause__ = error
+
+
+class TaskFuture(concurrent.futures.Future):
+    """
+    任务句柄
+    
+    与 concurrent.futures.Future 兼容，可以使用 result(timeout)、exception(timeout)、add_done_callback()、
+    cancel()（任务开始执行前或失败后等待重试时有效），以及 concurrent.futures.wait() 和 as_completed()。
+    在协程中可以直接 await，或通过 as_asyncio() 转换为 asyncio.Future。
+    
+    任务结束后第一次通过 result() 或 exception() 取走结果时，调度器释放该任务的记录
+    （任务函数、参数和结果），之后 get_task_status() 返回None。
+    """
+    
+    def __init__(self, task_id: str):
+        """
+        初始化任务句柄
+        
+        Args:
+            task_id: 任务ID
+        """
+        super().__init__()
+        self.task_id = task_id
+        self._on_consumed = None
+        self._on_cancel = None
+    
+    def cancel(self) -> bool:
+        if super().cancel():
+            return True
+        # 等待重试的任务句柄处于运行状态，由调度器判断能否取消
+        return self._on_cancel is not None and self._on_cancel(self)
+    
+    def result(self, timeout: Optional[float] = None) -> Any:
+        try:
+            return super().result(timeout)
+        finally:
+            self._consume()
+    
+    def exception(self, timeout: Optional[float] = None) -> Optional[BaseException]:
+        try:
+            return super().exception(timeout)
+        finally:
+            self._consume()
+    
+    def as_asyncio(self, loop=None):
+        """
+        转换为当前（或指定）事件循环中的 asyncio.Future
+        
+        Args:
+            loop: 事件循环，为None时使用当前事件循环
+            
+        Returns:
+            asyncio.Future
+        """
+        import asyncio
+        return asyncio.wrap_future(self, loop=loop)
+    
+    def __await__(self):
+        return self.as_asyncio().__await__()
+    
+    def _consume(self):
+        if self.done() and self._on_consumed is not None:
+            callback, self._on_consumed = self._on_consumed, None
+            callback(self)
+    
+    def _cancel_running(self) -> bool:
+        """
+        把运行状态的句柄结束为已取消（与 cancel() 后再 set_running_or_notify_cancel() 的效果相同）
+        """
+        with self._condition:
+            if self._state != concurrent.futures._base.RUNNING:
+                return False
+            self._state = concurrent.futures._base.CANCELLED_AND_NOTIFIED
+            for waiter in self._waiters:
+                waiter.add_cancelled(self)
+            self._condition.notify_all()
+        self._invoke_callbacks()
+        return True
 
 
 class AdvancedMCP:
     """
     高级MCP系统
     具备智能任务分配、动态资源管理、故障检测与恢复、性能优化功能
+    
+    调度是事件驱动的：没有可用资源的任务按所需的资源类型停放在等待队列中（按优先级和提交顺序排序），
+    只有在任务提交、资源释放或资源注册时才尝试分配。资源释放后直接交给该类型等待队列的队首任务，
+    再通过条件变量唤醒一个工作线程执行，空闲时工作线程阻塞等待，不占用CPU。
+    
+    任务可以通过 depends_on 依赖其他任务。依赖未满足的任务（状态为 blocked）不进入等待队列，
+    上游任务结束时只检查直接依赖它的任务，依赖全部满足后再进入等待队列。
+    
+    远程资源通过 heartbeat() 报告存活，第一次心跳（或以 monitored=True 注册）后开始监控。
+    HeartbeatMonitor 判定资源失效后，资源从分配索引中移除，分配在它上面的任务重新进入等待队列，
+    失效资源上的执行结果被丢弃；失效的资源再次发送心跳时恢复分配。
+    
+    指定 durable_store 时，未结束的任务同时保存在 SQLite 数据库中（见 durable_queue.py），
+    任务函数需要先通过 register_function() 注册名称。start() 时恢复上次运行（或已停止的其他实例）
+    留下的任务；重试策略不持久化，恢复的任务使用默认策略。
+    
+    资源由可替换的分配策略（见 allocation.py）按类型建立索引，每次分配为 O(log R)。
+    
+    工作线程数在 min_workers 和 max_workers 之间按就绪队列长度、任务等待时间和吞吐量自动伸缩
+    （见 autoscaler.py）；两者相等时为固定大小的线程池。kind="cpu" 的任务不占用工作线程，
+    分配到资源后提交给执行后端（见 executors.py，进程池或工作窃取）在其他进程中执行，
+    任务函数和参数需要可以被 pickle。
     """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 4, verbose: bool = True,
+                 allocation_policy: Union[str, AllocationPolicy] = "least_loaded",
+                 min_workers: int = 1, cpu_workers: Optional[int] = None, autoscale_interval: float = 0.5,
+                 cpu_executor: Union[str, ExecutorBackend] = "process", retry_policy: Optional[RetryPolicy] = None,
+                 failure_detector: str = "timeout", heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+                 durable_store: Optional[DurableTaskStore] = None, finished_history: int = FINISHED_HISTORY):
         """
         初始化高级MCP
+        
+        Args:
+            max_workers: 最大工作线程数
+            verbose: 是否打印任务和资源事件
+            allocation_policy: 资源分配策略或策略名称（least_loaded、best_fit、affinity、consistent_hash）
+            min_workers: 最少工作线程数，启动时的线程数
+            cpu_workers: 执行 cpu 任务的进程数，为None时使用CPU核数
+            autoscale_interval: 自动伸缩的采样间隔（秒）
+            cpu_executor: cpu 任务的执行后端或后端名称（process、work_stealing）；
+                          按名称创建的后端在第一个 cpu 任务提交时启动，stop() 时关闭
+            retry_policy: 默认的重试策略，为None时失败的任务不重试（add_task 可以为单个任务指定）
+            failure_detector: 资源故障检测方式：timeout 或 phi
+            heartbeat_timeout: 心跳超时时间（秒）；phi 检测在心跳间隔样本不足时也使用该超时
+            durable_store: 任务持久化存储，为None时任务只保存在内存中
+            finished_history: 记录已释放的任务最多保留多少个的结果（或异常），供之后提交的任务依赖
         """
         self.tasks = {}  # 任务字典
         self.resources = {}  # 资源字典
-        self.task_queue = queue.PriorityQueue()  # 任务优先级队列
         self.worker_threads = []  # 工作线程
-        self.max_workers = 4  # 最大工作线程数
+        self.max_workers = max_workers  # 最大工作线程数
+        self.min_workers = min(min_workers, max_workers)  # 最少工作线程数
+        self.cpu_workers = cpu_workers
+        self.cpu_executor = cpu_executor
+        self.retry_policy = retry_policy
+        self.durable_store = durable_store
+        # 注册的任务函数：名称 -> 函数，以及函数 -> 名称
+        self._functions: Dict[str, Callable] = {}
+        self._function_names: Dict[Callable, str] = {}
+        self.autoscale_interval = autoscale_interval
+        self.autoscale_policy = AutoscalePolicy(self.min_workers, max_workers)
         self.running = False  # 运行状态
+        self.verbose = verbose
         
-        # 性能监控
-        self.performance_metrics = {
-            "tasks_completed": 0,
-            "tasks_failed": 0,
-            "average_execution_time": 0,
-            "resource_utilization": {}
-        }
+        # 调度状态，全部由 self._lock 保护
+        # 可重入：执行后端的结果回调可能在提交 cpu 任务的（持有锁的）线程中立即执行
+        self._lock = threading.RLock()
+        # 等待队列：资源类型（None表示任意类型）-> [(优先级, 提交序号, 任务ID)] 最小堆
+        self._wait_queues: Dict[Optional[str], List[Tuple[int, int, str]]] = {}
+        # 已分配资源、等待工作线程执行的 (任务, 资源ID)
+        self._ready = collections.deque()
+        self._ready_cond = threading.Condition(self._lock)
+        self._sequence = itertools.count()
+        # 等待队列中已取消任务的条目数（惰性删除）
+        self._stale_entries = 0
+        # 上游任务ID -> 依赖它且尚未满足的任务
+        self._dependents: Dict[str, List[Dict[str, Any]]] = {}
+        # 记录已释放的任务ID -> (结果, 异常)，按结束顺序保留最近 finished_history 个
+        self.finished_history = finished_history
+        self._finished: "collections.OrderedDict[str, Tuple[Any, Optional[BaseException]]]" = \
+            collections.OrderedDict()
+        # 线程池状态：线程数、正在执行任务的线程数、需要退出的线程数，以及当前采样周期的统计
+        self._worker_count = 0
+        self._busy_workers = 0
+        self._retiring = 0
+        self._worker_ids = itertools.count()
+        self._wait_total = 0.0
+        self._wait_samples = 0
+        self._finished_in_interval = 0
+        self._autoscale_thread = None
+        self._cpu_backend: Optional[ExecutorBackend] = None
+        if isinstance(allocation_policy, str):
+            allocation_policy = create_policy(allocation_policy)
+        self.allocation_policy = allocation_policy
+        
+        # 性能监控（分片计数器，见 task_metrics.py）
+        self.metrics = TaskMetrics()
+        
+        # 故障恢复：重试由时间轮调度，重试用尽的任务进入死信队列
+        self._timer_wheel = TimerWheel()
+        self.dead_letters = DeadLetterQueue()
         
         # 故障检测
-        self.heartbeat_monitor = HeartbeatMonitor()
+        self.heartbeat_monitor = HeartbeatMonitor(
+            timeout=heartbeat_timeout, detector=failure_detector,
+            on_failure=self._on_resource_failure, on_recovery=self._on_resource_recovery
+        )
     
     def start(self):
         """
         启动MCP
         """
-        self.running = True
+        if self.durable_store is not None:
+            self.durable_store.start()
+            recovered = self.recover_tasks()
+            if recovered:
+                print(f"恢复持久化任务: {len(recovered)}个")
+        
+        with self._lock:
+            self.running = True
+            self._retiring = 0
+            # 启动工作线程
+            for _ in range(self.min_workers):
+                self._spawn_worker_locked()
+        
+        if self.min_workers < self.max_workers:
+            self._autoscale_thread = threading.Thread(target=self._autoscale_loop)
+            self._autoscale_thread.daemon = True
+            self._autoscale_thread.start()
         
-        # 启动工作线程
-        for i in range(self.max_workers):
-            worker = threading.Thread(target=self._worker_loop, args=(i,))
-            worker.daemon = True
-            worker.start()
-            self.worker_threads.append(worker)
+        self._timer_wheel.start()
         
         # 启动心跳监控
         self.heartbeat_monitor.start()
         
-        print(f"高级MCP已启动，工作线程数: {self.max_workers}")
+        print(f"高级MCP已启动，工作线程数: {self.min_workers}-{self.max_workers}")
     
     def stop(self):
         """
         停止MCP
         """
-        self.running = False
+        with self._lock:
+            self.running = False
+            self._ready_cond.notify_all()
+            workers, self.worker_threads = self.worker_threads, []
         
         # 等待工作线程结束
-        for worker in self.worker_threads:
+        for worker in workers:
             worker.join(timeout=2.0)
+        if self._autoscale_thread is not None:
+            self._autoscale_thread.join(timeout=2.0)
+            self._autoscale_thread = None
+        if self._cpu_backend is not None:
+            # 已开始的 cpu 任务继续执行完，尚未开始的任务被取消
+            self._cpu_backend.shutdown()
+            self._cpu_backend = None
+        
+        # 尚未到期的重试保留到下次启动
+        self._timer_wheel.stop()
         
         # 停止心跳监控
         self.heartbeat_monitor.stop()
         
+        if self.durable_store is not None:
+            # 提交缓冲区并释放租约，剩余的任务在下次启动时恢复
+            self.durable_store.stop()
+        
         print("高级MCP已停止")
     
-    def add_task(self, task_id: str, task_func, priority: int = 0, **kwargs):
+    def register_function(self, name: str, func: Callable):
+        """
+        注册任务函数，add_task 可以用名称代替函数；使用持久化存储时任务函数必须注册
+        
+        Args:
+            name: 函数名称
+            func: 任务函数
+            
+        Raises:
+            ValueError: 如果名称已注册为其他函数
+        """
+        existing = self._functions.get(name)
+        if existing is not None and existing is not func:
+            raise ValueError(f"函数名称已注册: {name}")
+        self._functions[name] = func
+        self._function_names[func] = name
+    
+    def add_task(self, task_id: str, task_func: Union[Callable, str], priority: int = 0, resource_type: Optional[str] = None,
+                 affinity: Union[str, List[str], None] = None, kind: str = "io",
+                 depends_on: Optional[List[str]] = None, inputs: Optional[Dict[str, str]] = None,
+                 on_dependency_failure: str = "fail", retry_policy: Optional[RetryPolicy] = None, **kwargs):
         """
         添加任务
         
         Args:
             task_id: 任务ID
-            task_func: 任务函数
-            priority: 任务优先级，值越小优先级越高
+            task_func: 任务函数，或通过 register_function 注册的函数名称
+            priority: 任务优先级，值越小优先级越高，相同优先级按提交顺序执行
+            resource_type: 任务需要的资源类型，为None时可以使用任意类型的资源
+            affinity: 亲和性提示：affinity 策略下为优先使用的资源ID（或列表），
+                      consistent_hash 策略下为哈希键，相同键的任务分配到同一资源
+            kind: 任务类型：io（默认，在工作线程中执行）或 cpu（由执行后端在其他进程中执行）
+            depends_on: 依赖的任务ID，全部结束后才开始分配资源。可以引用尚未提交的任务ID，
+                        该任务提交并结束后依赖才满足；结果已被取走或已取消的任务按保留的结果解析，
+                        超出 finished_history 的任务视为尚未提交
+            inputs: 参数名 -> 上游任务ID，上游任务的结果作为该参数传入（上游任务自动加入依赖）
+            on_dependency_failure: 上游任务失败或被取消时的处理：fail（默认）以 DependencyError 结束
+                                   并继续传递给下游；run 照常执行，inputs 中对应的参数为上游任务的异常
+            retry_policy: 该任务的重试策略，为None时使用 AdvancedMCP 的默认策略
             **kwargs: 任务参数
+            
+        Returns:
+            任务句柄
+            
+        Raises:
+            ValueError: 如果同ID的任务尚未结束、任务类型无效、依赖关系形成环、函数名称没有注册，
+                        或使用持久化存储时任务函数没有注册、参数无法序列化
         """
+        if isinstance(task_func, str):
+            function_name = task_func
+            task_func = self._functions.get(function_name)
+            if task_func is None:
+                raise ValueError(f"函数名称没有注册: {function_name}")
+        else:
+            function_name = self._function_names.get(task_func)
+        if self.durable_store is not None and function_name is None:
+            raise ValueError(f"持久化任务的函数需要先通过 register_function 注册: {task_id}")
+        if kind not in TASK_KINDS:
+            raise ValueError(f"未知的任务类型: {kind}，可选: {', '.join(TASK_KINDS)}")
+        if on_dependency_failure not in DEPENDENCY_FAILURE_MODES:
+            raise ValueError(
+                f"未知的依赖失败处理方式: {on_dependency_failure}，可选: {', '.join(DEPENDENCY_FAILURE_MODES)}"
+            )
+        inputs = dict(inputs or {})
+        dependencies = list(dict.fromkeys([*(depends_on or []), *inputs.values()]))
+        future = TaskFuture(task_id)
+        future._on_consumed = self._release_task_record
+        future._on_cancel = self._cancel_retrying_task
+        future.add_done_callback(self._on_task_cancelled)
+        if self.durable_store is not None:
+            # 任务以任何方式结束（完成、失败、取消）时删除持久化记录
+            future.add_done_callback(self._ack_durable_task)
         task = {
             "id": task_id,
             "function": task_func,
+            "function_name": function_name,
             "priority": priority,
+            "resource_type": resource_type,
+            "affinity": affinity,
+            "kind": kind,
             "args": kwargs,
             "status": "pending",
             "created_time": time.time(),
-            "assigned_resource": None
+            "assigned_resource": None,
+            "future": future,
+            "depends_on": dependencies,
+            "inputs": inputs,
+            "on_dependency_failure": on_dependency_failure,
+            # 尚未满足的依赖
+            "waiting_on": set(),
+            "retry_policy": retry_policy,
+            "attempts": 0,
+            # 等待重试时的定时器ID
+            "retry_timer": None,
+            # 调度轮次：资源失效导致任务重新调度时加一，旧轮次的执行结果被丢弃
+            "epoch": 0
         }
         
-        self.tasks[task_id] = task
-        self.task_queue.put((priority, task_id))
+        with self._lock:
+            existing = self.tasks.get(task_id)
+            if existing is not None and existing["status"] not in TERMINAL_STATUSES:
+                raise ValueError(f"任务已存在且尚未结束: {task_id}")
+            if self._creates_cycle_locked(task_id, dependencies):
+                raise ValueError(f"任务依赖关系形成环: {task_id}")
+            if self.durable_store is not None:
+                # 在锁内写入缓冲区，保证记录先于任务结束时的删除
+                self.durable_store.enqueue({**task, "function": function_name})
+            self.tasks[task_id] = task
+            self._finished.pop(task_id, None)
+            task["status"] = "blocked"
+            failed = []
+            for dependency in dependencies:
+                upstream = self.tasks.get(dependency)
+                if upstream is not None and upstream["status"] in ("completed", "failed"):
+                    outcome = (upstream.get("result"), upstream.get("exception"))
+                elif upstream is None and dependency in self._finished:
+                    # 记录已释放的上游任务
+                    outcome = self._finished[dependency]
+                else:
+                    outcome = None
+                if outcome is not None:
+                    # 已结束的上游任务
+                    dependency_error = self._resolve_dependency_locked(task, dependency, *outcome)
+                    if dependency_error is not None:
+                        # 已经有任务通过前向引用依赖这个任务时，失败继续传递
+                        failed = [(task, dependency_error)] + self._release_dependents_locked(
+                            task_id, None, dependency_error
+                        )
+                        break
+                else:
+                    task["waiting_on"].add(dependency)
+                    self._dependents.setdefault(dependency, []).append(task)
+            if task["status"] == "blocked" and not task["waiting_on"]:
+                self._unblock_locked(task)
+        self._fail_dependents(failed)
         
-        print(f"任务添加成功: {task_id}, 优先级: {priority}")
+        self._log(f"任务添加成功: {task_id}, 优先级: {priority}")
+        return future
     
-    def register_resource(self, resource_id: str, capacity: int, resource_type: str = "general"):
+    def register_resource(self, resource_id: str, capacity: int, resource_type: str = "general",
+                          monitored: bool = False):
         """
         注册资源
         
@@ -102,19 +459,46 @@ class AdvancedMCP:
             resource_id: 资源ID
             capacity: 资源容量
             resource_type: 资源类型
+            monitored: 是否立即开始心跳监控；为False时在第一次 heartbeat() 后开始
         """
         resource = {
             "id": resource_id,
             "capacity": capacity,
             "available": capacity,
             "type": resource_type,
-            "last_heartbeat": time.time()
+            "last_heartbeat": time.time(),
+            "alive": True,
+            # 分配在该资源上、尚未结束的任务：任务ID -> 任务
+            "tasks": {}
         }
         
-        self.resources[resource_id] = resource
-        self.performance_metrics["resource_utilization"][resource_id] = 0.0
+        with self._lock:
+            self.resources[resource_id] = resource
+            self.allocation_policy.add(resource)
+            # 新资源可能满足正在等待的任务
+            self._dispatch_locked((resource_type, None))
+        if monitored:
+            self.heartbeat_monitor.heartbeat(resource_id)
+        else:
+            self.heartbeat_monitor.unwatch(resource_id)
         
-        print(f"资源注册成功: {resource_id}, 容量: {capacity}, 类型: {resource_type}")
+        self._log(f"资源注册成功: {resource_id}, 容量: {capacity}, 类型: {resource_type}")
+    
+    def heartbeat(self, resource_id: str):
+        """
+        报告资源存活
+        
+        Args:
+            resource_id: 资源ID
+            
+        Raises:
+            KeyError: 如果资源没有注册
+        """
+        with self._lock:
+            if resource_id not in self.resources:
+                raise KeyError(f"资源未注册: {resource_id}")
+            self.resources[resource_id]["last_heartbeat"] = time.time()
+        self.heartbeat_monitor.heartbeat(resource_id)
     
     def get_task_status(self, task_id: str) -> Optional[str]:
         """
@@ -124,94 +508,525 @@ class AdvancedMCP:
             task_id: 任务ID
             
         Returns:
-            任务状态，如果任务不存在返回None
+            任务状态，如果任务不存在或结果已被取走（记录已释放）返回None
         """
         if task_id in self.tasks:
             return self.tasks[task_id]["status"]
         return None
     
+    def get_waiting_count(self) -> int:
+        """
+        获取等待资源的任务数
+        
+        Returns:
+            所有等待队列中的任务总数
+        """
+        with self._lock:
+            return sum(len(waiting) for waiting in self._wait_queues.values()) - self._stale_entries
+    
     def get_performance_metrics(self) -> Dict[str, Any]:
         """
-        获取性能指标
+        获取性能指标快照
+        
+        排队时间（提交到开始执行）和执行时间给出 p50/p95/p99/max；按优先级、按资源的细分和资源利用率
+        都在调用时计算，任务结束时只做 O(1) 的记录。
         
         Returns:
-            性能指标字典
+            性能指标字典：tasks_completed、tasks_failed、average_execution_time、queue_wait、execution_time、
+            resource_utilization、by_priority、by_resource
         """
-        return self.performance_metrics
+        total, by_priority, by_resource = self.metrics.snapshot()
+        with self._lock:
+            utilization = {
+                resource_id: (resource["capacity"] - resource["available"]) / resource["capacity"]
+                for resource_id, resource in self.resources.items()
+            }
+        return {
+            "tasks_completed": total["tasks_completed"],
+            "tasks_failed": total["tasks_failed"],
+            "average_execution_time": total["execution_time"]["mean"] or 0,
+            "queue_wait": total["queue_wait"],
+            "execution_time": total["execution_time"],
+            "resource_utilization": utilization,
+            "by_priority": by_priority,
+            "by_resource": by_resource
+        }
+    
+    def get_worker_stats(self) -> Dict[str, Any]:
+        """
+        获取工作线程池状态
+        
+        Returns:
+            线程数、正在执行任务的线程数、就绪队列长度以及线程数范围
+        """
+        with self._lock:
+            return {
+                "workers": self._worker_count - self._retiring,
+                "busy": self._busy_workers,
+                "ready": len(self._ready),
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers
+            }
+    
+    def _spawn_worker_locked(self):
+        """
+        启动一个工作线程（调用方持有 self._lock）
+        """
+        worker = threading.Thread(target=self._worker_loop, args=(next(self._worker_ids),))
+        worker.daemon = True
+        self._worker_count += 1
+        self.worker_threads.append(worker)
+        worker.start()
     
     def _worker_loop(self, worker_id: int):
         """
-        工作线程循环
+        工作线程循环：阻塞等待已分配资源的任务并执行
         
         Args:
             worker_id: 工作线程ID
         """
-        while self.running:
+        while True:
+            with self._lock:
+                while self.running and not self._ready and not self._retiring:
+                    self._ready_cond.wait()
+                if not self.running or self._retiring:
+                    # 停止或缩容时退出
+                    if self._retiring:
+                        self._retiring -= 1
+                    self._worker_count -= 1
+                    if self.running:
+                        self.worker_threads.remove(threading.current_thread())
+                    return
+                task, resource_id, epoch = self._ready.popleft()
+                if task["epoch"] != epoch:
+                    # 资源失效后已重新进入等待队列的任务
+                    continue
+                if not self._start_task_locked(task, resource_id):
+                    continue
+                if task["kind"] == "cpu":
+                    # 在启动前提交的 cpu 任务由工作线程转交给执行后端
+                    self._submit_cpu_task_locked(task, resource_id)
+                    continue
+                self._busy_workers += 1
+            
             try:
-                # 从队列获取任务
-                _, task_id = self.task_queue.get(timeout=1.0)
+                self._execute_task(worker_id, task, resource_id, epoch)
+            except Exception as e:
+                print(f"工作线程 {worker_id} 错误: {str(e)}")
+            finally:
+                with self._lock:
+                    self._busy_workers -= 1
+    
+    def _autoscale_loop(self):
+        """
+        自动伸缩循环：定期采样线程池状态，按伸缩策略增减工作线程
+        """
+        last_sample = time.monotonic()
+        while self.running:
+            time.sleep(self.autoscale_interval)
+            with self._lock:
+                if not self.running:
+                    return
+                now = time.monotonic()
+                workers = self._worker_count - self._retiring
+                mean_wait = self._wait_total / self._wait_samples if self._wait_samples else 0.0
+                # 仍在就绪队列中的任务的等待时间也计入，避免线程全部阻塞时采样不到等待
+                if self._ready:
+                    mean_wait = max(mean_wait, time.time() - self._ready[0][0]["ready_time"])
+                throughput = self._finished_in_interval / max(now - last_sample, 1e-6)
+                target = self.autoscale_policy.decide(
+                    workers, self._busy_workers, len(self._ready), mean_wait, throughput
+                )
+                self._wait_total = 0.0
+                self._wait_samples = 0
+                self._finished_in_interval = 0
+                last_sample = now
+                if target > workers:
+                    for _ in range(target - workers):
+                        self._spawn_worker_locked()
+                elif target < workers:
+                    self._retiring += workers - target
+                    self._ready_cond.notify_all()
+            if target != workers:
+                self._log(f"工作线程数调整: {workers} -> {target}")
+    
+    def _start_task_locked(self, task: Dict[str, Any], resource_id: str) -> bool:
+        """
+        把已分配资源的任务标记为运行中（调用方持有 self._lock）
+        
+        Args:
+            task: 任务信息
+            resource_id: 分配的资源ID
+            
+        Returns:
+            任务是否可以执行；任务在开始前被取消时释放资源并返回False
+        """
+        # 重试或重新调度时任务句柄已经处于运行状态
+        if not task["future"].running() and not task["future"].set_running_or_notify_cancel():
+            self.resources[resource_id]["tasks"].pop(task["id"], None)
+            self._release_resource_locked(resource_id)
+            return False
+        task["status"] = "running"
+        task["start_time"] = time.time()
+        task["attempts"] += 1
+        self._wait_total += task["start_time"] - task["ready_time"]
+        self._wait_samples += 1
+        return True
+    
+    def _submit_cpu_task_locked(self, task: Dict[str, Any], resource_id: str):
+        """
+        把运行中的 cpu 任务提交给执行后端（调用方持有 self._lock），结束时由回调完成任务并释放资源
+        
+        Args:
+            task: 任务信息
+            resource_id: 分配的资源ID
+        """
+        if self._cpu_backend is None:
+            if isinstance(self.cpu_executor, str):
+                self._cpu_backend = create_executor(self.cpu_executor, max_workers=self.cpu_workers)
+            else:
+                self._cpu_backend = self.cpu_executor
+        self._log(f"执行后端开始执行任务: {task['id']}, 分配资源: {resource_id}")
+        epoch = task["epoch"]
+        self._cpu_backend.submit(
+            task["function"], task["args"],
+            lambda result, error: self._complete_task(task, resource_id, epoch, result, error)
+        )
+    
+    def _execute_task(self, worker_id: int, task: Dict[str, Any], resource_id: str, epoch: int):
+        """
+        在当前工作线程中执行任务，结束后释放资源
+        
+        Args:
+            worker_id: 工作线程ID
+            task: 任务信息
+            resource_id: 分配的资源ID
+            epoch: 任务的调度轮次
+        """
+        self._log(f"线程 {worker_id} 开始执行任务: {task['id']}, 分配资源: {resource_id}")
+        try:
+            result = task["function"](**task["args"])
+        except Exception as e:
+            self._complete_task(task, resource_id, epoch, error=e)
+        else:
+            self._complete_task(task, resource_id, epoch, result=result)
+    
+    def _complete_task(self, task: Dict[str, Any], resource_id: str, epoch: int, result: Any = None,
+                       error: Optional[BaseException] = None):
+        """
+        记录任务结果、完成任务句柄并释放资源
+        
+        Args:
+            task: 任务信息
+            resource_id: 分配的资源ID
+            epoch: 开始执行时任务的调度轮次
+            result: 任务结果
+            error: 任务抛出的异常，为None表示成功
+        """
+        task_id = task["id"]
+        with self._lock:
+            if task["epoch"] != epoch:
+                # 执行期间资源被判定失效，任务已重新调度，丢弃这次执行的结果
+                self._log(f"丢弃失效资源上的执行结果: {task_id}, 资源: {resource_id}")
+                return
+            # 从资源的任务表中移除后，资源失效不会再重新调度这个任务
+            self.resources[resource_id]["tasks"].pop(task_id, None)
+        retrying = False
+        try:
+            if error is None:
+                # 更新任务状态
+                task["status"] = "completed"
+                task["end_time"] = time.time()
+                task["result"] = result
                 
-                if task_id in self.tasks:
-                    task = self.tasks[task_id]
-                    
-                    # 智能任务分配：寻找合适的资源
-                    resource_id = self._allocate_resource(task)
-                    
-                    if resource_id:
-                        # 分配资源
-                        self.resources[resource_id]["available"] -= 1
-                        task["assigned_resource"] = resource_id
-                        task["status"] = "running"
-                        task["start_time"] = time.time()
-                        
-                        print(f"线程 {worker_id} 开始执行任务: {task_id}, 分配资源: {resource_id}")
-                        
-                        try:
-                            # 执行任务
-                            result = task["function"](**task["args"])
-                            
-                            # 更新任务状态
-                            task["status"] = "completed"
-                            task["end_time"] = time.time()
-                            task["result"] = result
-                            
-                            # 更新性能指标
-                            self._update_performance_metrics(task, success=True)
-                            
-                            print(f"任务执行成功: {task_id}, 结果: {result}")
-                            
-                        except Exception as e:
-                            # 任务执行失败
-                            task["status"] = "failed"
-                            task["end_time"] = time.time()
-                            task["error"] = str(e)
-                            
-                            # 更新性能指标
-                            self._update_performance_metrics(task, success=False)
-                            
-                            # 故障恢复
-                            self._recover_from_failure(task, e)
-                            
-                            print(f"任务执行失败: {task_id}, 错误: {str(e)}")
-                        finally:
-                            # 释放资源
-                            if resource_id in self.resources:
-                                self.resources[resource_id]["available"] += 1
-                    else:
-                        # 无可用资源，重新放入队列
-                        self.task_queue.put((task["priority"], task_id))
-                        print(f"无可用资源，任务重新排队: {task_id}")
+                # 更新性能指标
+                self._record_metrics(task, resource_id, success=True)
                 
-                self.task_queue.task_done()
+                self._log(f"任务执行成功: {task_id}, 结果: {result}")
+                task["future"].set_result(result)
+            else:
+                # 任务执行失败
+                task["end_time"] = time.time()
+                task["error"] = str(error)
                 
-            except queue.Empty:
+                # 故障恢复
+                retrying = self._recover_from_failure(task, error)
+                if not retrying:
+                    task["status"] = "failed"
+                    task["exception"] = error
+                    
+                    # 更新性能指标
+                    self._record_metrics(task, resource_id, success=False)
+                    
+                    self._log(f"任务执行失败: {task_id}, 错误: {str(error)}")
+                    task["future"].set_exception(error)
+        finally:
+            # 释放下游任务和资源，并交给等待该类型资源的任务（重试的任务稍后重新分配资源）
+            with self._lock:
+                self._finished_in_interval += 1
+                failed = [] if retrying else self._release_dependents_locked(task_id, result, error)
+                self._release_resource_locked(resource_id)
+            self._fail_dependents(failed)
+    
+    def _release_resource_locked(self, resource_id: str):
+        """
+        释放资源并调度等待该类型资源的任务（调用方持有 self._lock）
+        
+        Args:
+            resource_id: 资源ID
+        """
+        resource = self.resources.get(resource_id)
+        if resource is None or not resource["alive"]:
+            return
+        resource["available"] += 1
+        self.allocation_policy.update(resource)
+        self._dispatch_locked((resource["type"], None))
+    
+    def _release_task_record(self, future: TaskFuture):
+        """
+        任务结果被取走后释放任务记录
+        
+        Args:
+            future: 任务句柄
+        """
+        with self._lock:
+            task = self.tasks.get(future.task_id)
+            if task is not None and task["future"] is future and task["status"] in TERMINAL_STATUSES:
+                del self.tasks[future.task_id]
+                if task["status"] == "cancelled":
+                    error = concurrent.futures.CancelledError(f"任务已取消: {future.task_id}")
+                else:
+                    error = task.get("exception")
+                self._remember_finished_locked(future.task_id, task.get("result"), error)
+    
+    def _ack_durable_task(self, future: TaskFuture):
+        """
+        任务句柄完成回调：删除任务的持久化记录
+        
+        任务状态在句柄完成之前已经是终止状态，此时可能已经提交了同ID的新任务；
+        在锁内确认记录仍属于这个句柄，避免删除新任务的记录。
+        
+        Args:
+            future: 任务句柄
+        """
+        with self._lock:
+            task = self.tasks.get(future.task_id)
+            if task is None or task["future"] is future:
+                self.durable_store.ack(future.task_id)
+    
+    def _remember_finished_locked(self, task_id: str, result: Any, error: Optional[BaseException]):
+        """
+        保留记录被释放的任务的结果，之后提交的任务仍然可以依赖它（调用方持有 self._lock）
+        
+        Args:
+            task_id: 任务ID
+            result: 任务结果
+            error: 任务的异常，为None表示成功
+        """
+        self._finished.pop(task_id, None)
+        self._finished[task_id] = (result, error)
+        while len(self._finished) > self.finished_history:
+            self._finished.popitem(last=False)
+    
+    def _on_task_cancelled(self, future: TaskFuture):
+        """
+        任务句柄完成回调：任务在开始执行前被取消时删除任务记录，并把取消传递给下游任务
+        
+        等待队列中的条目保留到到达队首时再丢弃，避免在堆中查找删除。
+        
+        Args:
+            future: 任务句柄
+        """
+        if not future.cancelled():
+            return
+        error = concurrent.futures.CancelledError(f"任务已取消: {future.task_id}")
+        with self._lock:
+            task = self.tasks.get(future.task_id)
+            if task is not None:
+                if task["future"] is not future:
+                    return
+                if task["status"] == "pending":
+                    self._stale_entries += 1
+                task["status"] = "cancelled"
+                del self.tasks[future.task_id]
+                self._remember_finished_locked(future.task_id, None, error)
+            failed = self._release_dependents_locked(future.task_id, None, error)
+        self._fail_dependents(failed)
+    
+    def _creates_cycle_locked(self, task_id: str, dependencies: List[str]) -> bool:
+        """
+        检查新任务的依赖是否形成环（调用方持有 self._lock）
+        
+        沿尚未满足的依赖向上游查找，只访问未结束的任务，找到新任务自己（包括通过对它的前向引用）即为环。
+        
+        Args:
+            task_id: 新任务ID
+            dependencies: 新任务的依赖
+            
+        Returns:
+            是否形成环
+        """
+        stack = list(dependencies)
+        visited = set()
+        while stack:
+            current = stack.pop()
+            if current == task_id:
+                return True
+            if current in visited:
                 continue
-            except Exception as e:
-                print(f"工作线程 {worker_id} 错误: {str(e)}")
+            visited.add(current)
+            upstream = self.tasks.get(current)
+            if upstream is not None and upstream["status"] not in TERMINAL_STATUSES:
+                stack.extend(upstream["waiting_on"])
+        return False
+    
+    def _release_dependents_locked(self, task_id: str, result: Any,
+                                   error: Optional[BaseException]) -> List[Tuple[Dict[str, Any], BaseException]]:
+        """
+        任务结束后处理直接依赖它的任务（调用方持有 self._lock），开销与下游任务数成正比
+        
+        Args:
+            task_id: 结束的任务ID
+            result: 任务结果
+            error: 任务的异常，为None表示成功
+            
+        Returns:
+            因依赖失败需要以异常结束的任务及其异常，由调用方在释放锁后调用 _fail_dependents()
+        """
+        failed = []
+        # 依赖失败沿下游逐层传递，用工作列表代替递归
+        finished = [(task_id, result, error)]
+        while finished:
+            upstream_id, result, error = finished.pop()
+            for dependent in self._dependents.pop(upstream_id, ()):
+                if dependent["status"] != "blocked" or self.tasks.get(dependent["id"]) is not dependent:
+                    continue
+                dependency_error = self._resolve_dependency_locked(dependent, upstream_id, result, error)
+                if dependency_error is not None:
+                    failed.append((dependent, dependency_error))
+                    finished.append((dependent["id"], None, dependency_error))
+        return failed
+    
+    def _resolve_dependency_locked(self, task: Dict[str, Any], dependency: str, result: Any,
+                                   error: Optional[BaseException]) -> Optional[DependencyError]:
+        """
+        满足任务的一个依赖（调用方持有 self._lock）
+        
+        Args:
+            task: 依赖未满足的任务
+            dependency: 结束的上游任务ID
+            result: 上游任务结果
+            error: 上游任务的异常，为None表示成功
+            
+        Returns:
+            任务因依赖失败而结束时返回其异常，否则返回None
+        """
+        task["waiting_on"].discard(dependency)
+        if error is not None and task["on_dependency_failure"] == "fail":
+            dependency_error = DependencyError(task["id"], dependency, error)
+            task["status"] = "failed"
+            task["error"] = str(dependency_error)
+            task["exception"] = dependency_error
+            task["end_time"] = time.time()
+            return dependency_error
+        for name, upstream_id in task["inputs"].items():
+            if upstream_id == dependency:
+                task["args"][name] = result if error is None else error
+        if not task["waiting_on"]:
+            self._unblock_locked(task)
+        return None
+    
+    def _unblock_locked(self, task: Dict[str, Any]):
+        """
+        依赖全部满足的任务进入等待队列（调用方持有 self._lock）
+        
+        Args:
+            task: 任务信息
+        """
+        task["status"] = "pending"
+        self._park_locked(task)
+        self._dispatch_locked((task["resource_type"],))
+    
+    def _fail_dependents(self, failed: List[Tuple[Dict[str, Any], BaseException]]):
+        """
+        在锁外完成因依赖失败而结束的任务的句柄
+        
+        Args:
+            failed: 任务及其异常
+        """
+        for task, error in failed:
+            self._log(f"任务因依赖失败而结束: {task['id']}, 错误: {str(error)}")
+            try:
+                task["future"].set_exception(error)
+            except concurrent.futures.InvalidStateError:
+                # 任务已被取消
+                pass
+    
+    def _park_locked(self, task: Dict[str, Any]):
+        """
+        把任务放入其资源类型的等待队列（调用方持有 self._lock）
+        
+        Args:
+            task: 任务信息
+        """
+        waiting = self._wait_queues.setdefault(task["resource_type"], [])
+        task["sequence"] = next(self._sequence)
+        heapq.heappush(waiting, (task["priority"], task["sequence"], task["id"]))
+    
+    def _dispatch_locked(self, queue_keys: Iterable[Optional[str]]):
+        """
+        为指定等待队列的队首任务分配资源，并唤醒工作线程执行（调用方持有 self._lock）
+        
+        只查看可能因本次事件而变得可执行的队列，按优先级依次尝试各队首任务，直到没有任务能分配到资源。
+        
+        Args:
+            queue_keys: 需要检查的等待队列（资源类型）
+        """
+        queue_keys = tuple(dict.fromkeys(queue_keys))
+        while True:
+            heads = sorted(
+                (self._wait_queues[key][0], key) for key in queue_keys if self._wait_queues.get(key)
+            )
+            for (_, sequence, task_id), key in heads:
+                task = self.tasks.get(task_id)
+                if task is None or task["sequence"] != sequence:
+                    # 已取消的任务的条目在到达队首时丢弃
+                    heapq.heappop(self._wait_queues[key])
+                    self._stale_entries -= 1
+                    break
+                if task["future"].cancelled():
+                    # 已取消但回调还没有删除记录的任务
+                    heapq.heappop(self._wait_queues[key])
+                    task["status"] = "cancelled"
+                    del self.tasks[task_id]
+                    self._remember_finished_locked(
+                        task_id, None, concurrent.futures.CancelledError(f"任务已取消: {task_id}")
+                    )
+                    break
+                resource_id = self._allocate_resource(task)
+                if resource_id is not None:
+                    heapq.heappop(self._wait_queues[key])
+                    resource = self.resources[resource_id]
+                    resource["available"] -= 1
+                    self.allocation_policy.update(resource)
+                    resource["tasks"][task_id] = task
+                    task["assigned_resource"] = resource_id
+                    task["status"] = "assigned"
+                    task["ready_time"] = time.time()
+                    if task["kind"] == "cpu" and self.running:
+                        # cpu 任务不占用工作线程，直接提交给执行后端
+                        if self._start_task_locked(task, resource_id):
+                            self._submit_cpu_task_locked(task, resource_id)
+                    else:
+                        self._ready.append((task, resource_id, task["epoch"]))
+                        self._ready_cond.notify()
+                    break
+            else:
+                return
     
     def _allocate_resource(self, task: Dict[str, Any]) -> Optional[str]:
         """
-        智能分配资源
+        智能分配资源（调用方持有 self._lock）
         
         Args:
             task: 任务信息
@@ -219,73 +1034,286 @@ class AdvancedMCP:
         Returns:
             分配的资源ID，如果无可用资源返回None
         """
-        # 简单的资源分配策略，实际应用中可能需要更复杂的算法
-        for resource_id, resource in self.resources.items():
-            if resource["available"] > 0:
-                # 检查资源是否在线
-                if time.time() - resource["last_heartbeat"] < 30:  # 30秒内有心跳
-                    return resource_id
-        return None
+        # 失效的资源已由 HeartbeatMonitor 的回调从分配索引中移除
+        return self.allocation_policy.select(task)
     
-    def _update_performance_metrics(self, task: Dict[str, Any], success: bool):
+    def _log(self, message: str):
         """
-        更新性能指标
+        打印事件（verbose 为False时不打印）
+        
+        Args:
+            message: 事件信息
+        """
+        if self.verbose:
+            print(message)
+    
+    def _record_metrics(self, task: Dict[str, Any], resource_id: str, success: bool):
+        """
+        记录结束任务的性能指标
         
         Args:
             task: 任务信息
+            resource_id: 分配的资源ID
             success: 是否成功
         """
-        if success:
-            self.performance_metrics["tasks_completed"] += 1
-        else:
-            self.performance_metrics["tasks_failed"] += 1
-        
-        # 更新平均执行时间
-        if "start_time" in task and "end_time" in task:
-            execution_time = task["end_time"] - task["start_time"]
-            total_tasks = self.performance_metrics["tasks_completed"] + self.performance_metrics["tasks_failed"]
-            self.performance_metrics["average_execution_time"] = (
-                (self.performance_metrics["average_execution_time"] * (total_tasks - 1) + execution_time) / total_tasks
-            )
-        
-        # 更新资源利用率
-        for resource_id, resource in self.resources.items():
-            utilization = (resource["capacity"] - resource["available"]) / resource["capacity"]
-            self.performance_metrics["resource_utilization"][resource_id] = utilization
+        self.metrics.record(
+            task["priority"], resource_id,
+            queue_wait=task["start_time"] - task["created_time"],
+            execution_time=task["end_time"] - task["start_time"],
+            success=success
+        )
     
-    def _recover_from_failure(self, task: Dict[str, Any], error: Exception):
+    def _recover_from_failure(self, task: Dict[str, Any], error: BaseException) -> bool:
         """
         故障恢复
         
+        按任务（或默认）的重试策略，可重试的失败在退避时间后由时间轮重新放入等待队列，
+        不占用工作线程；不可重试或重试用尽的任务进入死信队列。
+        
         Args:
             task: 任务信息
             error: 错误信息
+            
+        Returns:
+            是否已安排重试
+        """
+        policy = task["retry_policy"] or self.retry_policy
+        attempts = task["attempts"]
+        if policy is not None and policy.should_retry(attempts, error):
+            delay = policy.next_delay(attempts)
+            task["status"] = "retrying"
+            self._log(f"任务执行失败，{delay:.2f}秒后第{attempts + 1}次尝试: {task['id']}, 错误: {str(error)}")
+            task["retry_timer"] = self._timer_wheel.schedule(delay, lambda: self._retry_task(task))
+            return True
+        
+        self.dead_letters.add({
+            "task_id": task["id"],
+            "function": task["function"],
+            "args": dict(task["args"]),
+            "priority": task["priority"],
+            "resource_type": task["resource_type"],
+            "affinity": task["affinity"],
+            "kind": task["kind"],
+            "retry_policy": task["retry_policy"],
+            "attempts": attempts,
+            "error": str(error),
+            "error_type": type(error).__name__,
+            "failed_time": time.time()
+        })
+        self._log(f"执行故障恢复: {task['id']} 进入死信队列（已尝试{attempts}次）, 错误: {str(error)}")
+        return False
+    
+    def _retry_task(self, task: Dict[str, Any]):
+        """
+        时间轮回调：退避时间到达后把任务重新放入等待队列
+        
+        Args:
+            task: 任务信息
+        """
+        with self._lock:
+            if self.tasks.get(task["id"]) is not task or task["status"] != "retrying":
+                return
+            task["status"] = "pending"
+            task["retry_timer"] = None
+            self._park_locked(task)
+            self._dispatch_locked((task["resource_type"],))
+    
+    def _cancel_retrying_task(self, future: TaskFuture) -> bool:
+        """
+        取消等待重试的任务：删除重试定时器，把任务句柄结束为已取消
+        
+        Args:
+            future: 任务句柄
+            
+        Returns:
+            是否取消成功（任务正在执行或已经结束时返回False）
+        """
+        with self._lock:
+            task = self.tasks.get(future.task_id)
+            if task is None or task["future"] is not future or task["status"] != "retrying":
+                return False
+            self._timer_wheel.cancel(task["retry_timer"])
+            task["status"] = "cancelled"
+            task["retry_timer"] = None
+            task["end_time"] = time.time()
+        # 完成回调（_on_task_cancelled）删除任务记录并把取消传递给下游任务
+        return future._cancel_running()
+    
+    def _on_resource_failure(self, resource_id: str):
+        """
+        心跳监控回调：资源失效时从分配索引中移除，并重新调度分配在它上面的任务
+        
+        Args:
+            resource_id: 资源ID
         """
-        # 简单的故障恢复策略，实际应用中可能需要更复杂的逻辑
-        print(f"执行故障恢复: {task['id']}, 错误: {str(error)}")
+        with self._lock:
+            resource = self.resources.get(resource_id)
+            if resource is None or not resource["alive"]:
+                return
+            resource["alive"] = False
+            self.allocation_policy.remove(resource_id)
+            # 在开始执行前已取消的任务由 _start_task_locked 丢弃，不需要重新调度
+            rescheduled = [task for task in resource["tasks"].values() if not task["future"].cancelled()]
+            resource["tasks"] = {}
+            for task in rescheduled:
+                task["epoch"] += 1
+                task["assigned_resource"] = None
+                task["status"] = "pending"
+                self._park_locked(task)
+            self._dispatch_locked([task["resource_type"] for task in rescheduled])
+        self._log(f"资源失效: {resource_id}, 重新调度任务数: {len(rescheduled)}")
+    
+    def _on_resource_recovery(self, resource_id: str):
+        """
+        心跳监控回调：失效的资源重新发送心跳时恢复分配
+        
+        Args:
+            resource_id: 资源ID
+        """
+        with self._lock:
+            resource = self.resources.get(resource_id)
+            if resource is None or resource["alive"]:
+                return
+            resource["alive"] = True
+            # 失效时分配在它上面的任务都已重新调度，容量全部可用
+            resource["available"] = resource["capacity"]
+            self.allocation_policy.add(resource)
+            self._dispatch_locked((resource["type"], None))
+        self._log(f"资源恢复: {resource_id}")
+    
+    def recover_tasks(self) -> Dict[str, TaskFuture]:
+        """
+        从持久化存储中恢复未结束的任务（start() 时自动调用；需要任务句柄时可以在 start() 之前调用）
         
-        # 可以根据错误类型执行不同的恢复策略
-        # 例如：重试、转移到其他资源、降级处理等
+        已在内存中的任务跳过。依赖的上游任务没有被恢复时视为已在重启前结束：depends_on 中的依赖直接满足，
+        inputs 中的依赖因为结果已经丢失，任务进入死信队列。函数名称没有注册的任务保留在存储中。
+        
+        Returns:
+            任务ID -> 任务句柄
+        """
+        if self.durable_store is None:
+            return {}
+        with self._lock:
+            records = [record for record in self.durable_store.recover() if record["id"] not in self.tasks]
+            known = {record["id"] for record in records} | self.tasks.keys()
+        futures = {}
+        for record in records:
+            task_id = record["id"]
+            func = self._functions.get(record["function"])
+            if func is None:
+                print(f"恢复持久化任务失败: {task_id}, 函数名称没有注册: {record['function']}")
+                continue
+            missing = [name for name, upstream in record["inputs"].items() if upstream not in known]
+            if missing:
+                error = DependencyError(
+                    task_id, record["inputs"][missing[0]], RuntimeError("上游任务的结果在重启后不可用")
+                )
+                self.dead_letters.add({
+                    "task_id": task_id,
+                    "function": func,
+                    "args": dict(record["args"]),
+                    "priority": record["priority"],
+                    "resource_type": record["resource_type"],
+                    "affinity": record["affinity"],
+                    "kind": record["kind"],
+                    "retry_policy": None,
+                    "attempts": 0,
+                    "error": str(error),
+                    "error_type": type(error).__name__,
+                    "failed_time": time.time()
+                })
+                self.durable_store.ack(task_id)
+                self._log(f"恢复持久化任务失败: {task_id} 进入死信队列, 错误: {str(error)}")
+                continue
+            futures[task_id] = self.add_task(
+                task_id, func, priority=record["priority"], resource_type=record["resource_type"],
+                affinity=record["affinity"], kind=record["kind"],
+                depends_on=[upstream for upstream in record["depends_on"] if upstream in known],
+                inputs=record["inputs"], on_dependency_failure=record["on_dependency_failure"], **record["args"]
+            )
+        return futures
+    
+    def requeue_dead_letters(self, task_ids: Optional[Iterable[str]] = None) -> Dict[str, TaskFuture]:
+        """
+        把死信队列中的任务重新提交（尝试次数从0开始）
+        
+        Args:
+            task_ids: 任务ID，为None时重新提交所有任务
+            
+        Returns:
+            任务ID -> 新的任务句柄；同ID的任务尚未结束时保留在死信队列中
+        """
+        futures = {}
+        for entry in self.dead_letters.remove(task_ids):
+            try:
+                futures[entry["task_id"]] = self.add_task(
+                    entry["task_id"], entry["function"], priority=entry["priority"],
+                    resource_type=entry["resource_type"], affinity=entry["affinity"], kind=entry["kind"],
+                    retry_policy=entry["retry_policy"], **entry["args"]
+                )
+            except ValueError:
+                self.dead_letters.add(entry)
+        return futures
 
 
 class HeartbeatMonitor:
     """
     心跳监控器
     用于检测资源故障
+    
+    每个被监控的资源在一个定时器堆中有一个截止时间，心跳到达时推迟截止时间（旧条目惰性丢弃）；
+    监控线程只在最早的截止时间到达时醒来，没有轮询。截止时间的计算方式：
+    
+        - timeout: 最后一次心跳 + timeout
+        - phi:     按最近的心跳间隔拟合正态分布，phi(t) = -log10(1 - F(t - 最后一次心跳))，
+                   截止时间为 phi 达到 phi_threshold 的时刻；间隔样本不足时使用 timeout
+                   
+    资源失效时调用 on_failure(resource_id)，失效的资源再次发送心跳时调用 on_recovery(resource_id)，
+    回调在监控线程（或发送心跳的线程）中执行。
     """
     
-    def __init__(self):
+    def __init__(self, timeout: float = HEARTBEAT_TIMEOUT, detector: str = "timeout", phi_threshold: float = 8.0,
+                 window: int = 100, min_std: float = 0.1,
+                 on_failure: Optional[Callable[[str], None]] = None,
+                 on_recovery: Optional[Callable[[str], None]] = None):
         """
         初始化心跳监控器
+        
+        Args:
+            timeout: 心跳超时时间（秒）
+            detector: 检测方式：timeout 或 phi
+            phi_threshold: phi 检测的失效阈值，8 约等于误判概率 1e-8
+            window: phi 检测保留的心跳间隔样本数
+            min_std: phi 检测使用的最小标准差（秒），避免心跳非常规律时过于敏感
+            on_failure: 资源失效回调
+            on_recovery: 资源恢复回调
         """
+        if detector not in FAILURE_DETECTORS:
+            raise ValueError(f"未知的故障检测方式: {detector}，可选: {', '.join(FAILURE_DETECTORS)}")
+        self.timeout = timeout
+        self.detector = detector
+        self.phi_threshold = phi_threshold
+        self.window = window
+        self.min_std = min_std
+        self.on_failure = on_failure
+        self.on_recovery = on_recovery
         self.running = False
         self.monitor_thread = None
+        # 资源ID -> {"last": 最后一次心跳, "intervals": 心跳间隔, "version": 截止时间版本, "alive": 是否存活}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        # (截止时间, 版本, 资源ID) 最小堆
+        self._deadlines: List[Tuple[float, int, str]] = []
+        self._versions = itertools.count()
+        self._cond = threading.Condition()
+        # phi 达到阈值时 F(t) 对应的标准正态分位数
+        self._phi_z = statistics.NormalDist().inv_cdf(1 - 10 ** -phi_threshold)
     
     def start(self):
         """
         启动心跳监控
         """
-        self.running = True
+        with self._cond:
+            self.running = True
         self.monitor_thread = threading.Thread(target=self._monitor_loop)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
@@ -294,16 +1322,126 @@ class HeartbeatMonitor:
         """
         停止心跳监控
         """
-        self.running = False
+        with self._cond:
+            self.running = False
+            self._cond.notify()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2.0)
     
+    def heartbeat(self, resource_id: str):
+        """
+        记录资源心跳（资源尚未被监控时开始监控）
+        
+        Args:
+            resource_id: 资源ID
+        """
+        now = time.monotonic()
+        recovered = False
+        with self._cond:
+            record = self._records.get(resource_id)
+            if record is None:
+                record = self._records[resource_id] = {
+                    "last": now, "intervals": collections.deque(maxlen=self.window), "alive": True
+                }
+            else:
+                record["intervals"].append(now - record["last"])
+                record["last"] = now
+                if not record["alive"]:
+                    record["alive"] = recovered = True
+            deadline = self._deadline(record)
+            record["version"] = next(self._versions)
+            earliest = self._deadlines[0][0] if self._deadlines else None
+            heapq.heappush(self._deadlines, (deadline, record["version"], resource_id))
+            if len(self._deadlines) > 2 * len(self._records) + 64:
+                self._rebuild_locked()
+            if earliest is None or deadline < earliest:
+                self._cond.notify()
+        if recovered and self.on_recovery is not None:
+            self.on_recovery(resource_id)
+    
+    def unwatch(self, resource_id: str):
+        """
+        停止监控资源
+        
+        Args:
+            resource_id: 资源ID
+        """
+        with self._cond:
+            self._records.pop(resource_id, None)
+    
+    def is_alive(self, resource_id: str) -> bool:
+        """
+        资源是否存活（没有被监控的资源视为存活）
+        
+        Args:
+            resource_id: 资源ID
+        """
+        with self._cond:
+            record = self._records.get(resource_id)
+            return record is None or record["alive"]
+    
+    def phi(self, resource_id: str) -> Optional[float]:
+        """
+        计算资源当前的 phi 值
+        
+        Args:
+            resource_id: 资源ID
+            
+        Returns:
+            phi 值，资源没有被监控或心跳间隔样本不足时返回None
+        """
+        with self._cond:
+            record = self._records.get(resource_id)
+            if record is None or len(record["intervals"]) < 2:
+                return None
+            mean, std = self._interval_stats(record)
+            survival = 1 - statistics.NormalDist(mean, std).cdf(time.monotonic() - record["last"])
+            return -math.log10(max(survival, 1e-300))
+    
+    def _deadline(self, record: Dict[str, Any]) -> float:
+        if self.detector == "phi" and len(record["intervals"]) >= 2:
+            mean, std = self._interval_stats(record)
+            return record["last"] + mean + std * self._phi_z
+        return record["last"] + self.timeout
+    
+    def _interval_stats(self, record: Dict[str, Any]) -> Tuple[float, float]:
+        intervals = record["intervals"]
+        return statistics.fmean(intervals), max(statistics.pstdev(intervals), self.min_std)
+    
+    def _rebuild_locked(self):
+        self._deadlines = [
+            (self._deadline(record), record["version"], resource_id)
+            for resource_id, record in self._records.items() if record["alive"]
+        ]
+        heapq.heapify(self._deadlines)
+    
     def _monitor_loop(self):
         """
-        监控循环
+        监控循环：等待最早的截止时间，到期且期间没有新心跳的资源判定为失效
         """
-        while self.running:
-            time.sleep(10)  # 每10秒检查一次
-            # 这里应该检查所有资源的心跳
-            # 实际应用中，资源应该定期发送心跳信号
-            print("执行心跳检查...")
+        while True:
+            with self._cond:
+                failed = None
+                while self.running and failed is None:
+                    if not self._deadlines:
+                        self._cond.wait()
+                        continue
+                    deadline, version, resource_id = self._deadlines[0]
+                    record = self._records.get(resource_id)
+                    if record is None or record["version"] != version or not record["alive"]:
+                        heapq.heappop(self._deadlines)
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    heapq.heappop(self._deadlines)
+                    record["alive"] = False
+                    failed = resource_id
+                if not self.running:
+                    return
+            if self.on_failure is not None:
+                try:
+                    self.on_failure(failed)
+                except Exception as e:
+                    print(f"资源失效处理错误: {failed}, {str(e)}")
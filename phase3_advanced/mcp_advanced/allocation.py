@@ -0,0 +1,291 @@
+"""
+资源分配策略
+
+AdvancedMCP 通过分配策略为任务选择资源。策略按资源类型维护索引（另有一个包含所有资源的索引，
+供不限资源类型的任务使用），只索引还有空闲容量的资源，选择和更新都是 O(log R)：
+
+    - LeastLoadedPolicy:     选择负载率（已用/容量）最低的资源，避免热点
+    - BestFitPolicy:         选择剩余容量最少但仍可用的资源，尽量把任务集中，给大容量资源留出空间
+    - AffinityPolicy:        优先使用任务 affinity 中指定的资源，都不可用时按最低负载分配
+    - ConsistentHashPolicy:  按任务的 affinity 键在一致性哈希环上选择资源，相同键的任务落在同一资源上，
+                             提高缓存命中；资源增减时只有少量键会改变位置
+
+策略对象不是线程安全的，由调用方（AdvancedMCP 的调度锁）保证互斥。
+资源的 available 变化后调用方需要调用 update()，使索引与资源状态一致。
+"""
+
+import bisect
+import hashlib
+import heapq
+from typing import Dict, List, Optional, Any, Tuple, Callable
+
+
+class _ResourceHeap:
+    """
+    带惰性删除的资源堆
+
+    每个资源有一个版本号，更新时压入新条目并使旧条目失效；失效条目在到达堆顶时丢弃，
+    失效条目过多时整体重建，保证堆的大小与有效条目数同阶。
+    """
+
+    def __init__(self, key: Callable[[Dict[str, Any]], Tuple]):
+        self.key = key
+        self._heap: List[Tuple[Tuple, int, str]] = []
+        self._versions: Dict[str, int] = {}
+        self._live: Dict[str, Dict[str, Any]] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def update(self, resource: Dict[str, Any]):
+        """
+        按资源的当前状态更新索引，没有空闲容量的资源从索引中移除
+        """
+        resource_id = resource["id"]
+        self._counter += 1
+        self._versions[resource_id] = self._counter
+        if resource["available"] > 0:
+            self._live[resource_id] = resource
+            heapq.heappush(self._heap, (self.key(resource), self._counter, resource_id))
+        else:
+            self._live.pop(resource_id, None)
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._rebuild()
+
+    def remove(self, resource_id: str):
+        """
+        从索引中移除资源
+        """
+        self._versions.pop(resource_id, None)
+        self._live.pop(resource_id, None)
+
+    def peek(self) -> Optional[str]:
+        """
+        返回堆顶的资源ID，索引为空时返回None
+        """
+        heap = self._heap
+        while heap:
+            _, version, resource_id = heap[0]
+            if self._versions.get(resource_id) == version and resource_id in self._live:
+                return resource_id
+            heapq.heappop(heap)
+        return None
+
+    def __contains__(self, resource_id: str) -> bool:
+        return resource_id in self._live
+
+    def _rebuild(self):
+        self._heap = [
+            (self.key(resource), self._versions[resource_id], resource_id)
+            for resource_id, resource in self._live.items()
+        ]
+        heapq.heapify(self._heap)
+
+
+class AllocationPolicy:
+    """
+    资源分配策略基类
+
+    子类实现 _key()（堆排序键，越小越优先），或覆盖 select() 实现其他选择方式。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        """
+        初始化分配策略
+        """
+        self.resources: Dict[str, Dict[str, Any]] = {}
+        # 资源类型 -> 堆；键None的堆包含所有资源
+        self._heaps: Dict[Optional[str], _ResourceHeap] = {}
+
+    def add(self, resource: Dict[str, Any]):
+        """
+        添加资源（同ID的资源会被替换）
+
+        Args:
+            resource: 资源信息，包含 id、capacity、available、type
+        """
+        if resource["id"] in self.resources:
+            self.remove(resource["id"])
+        self.resources[resource["id"]] = resource
+        self.update(resource)
+
+    def remove(self, resource_id: str):
+        """
+        移除资源
+
+        Args:
+            resource_id: 资源ID
+        """
+        resource = self.resources.pop(resource_id, None)
+        if resource is None:
+            return
+        for key in (resource["type"], None):
+            heap = self._heaps.get(key)
+            if heap is not None:
+                heap.remove(resource_id)
+
+    def update(self, resource: Dict[str, Any]):
+        """
+        资源的 available 变化后更新索引
+
+        Args:
+            resource: 资源信息
+        """
+        if resource["id"] not in self.resources:
+            return
+        for key in (resource["type"], None):
+            heap = self._heaps.get(key)
+            if heap is None:
+                heap = self._heaps[key] = _ResourceHeap(self._key)
+            heap.update(resource)
+
+    def select(self, task: Dict[str, Any]) -> Optional[str]:
+        """
+        为任务选择一个有空闲容量的资源（不修改资源状态）
+
+        Args:
+            task: 任务信息，resource_type 为None时可以使用任意类型的资源
+
+        Returns:
+            资源ID，没有可用资源时返回None
+        """
+        heap = self._heaps.get(task.get("resource_type"))
+        return heap.peek() if heap is not None else None
+
+    def _key(self, resource: Dict[str, Any]) -> Tuple:
+        raise NotImplementedError
+
+
+class LeastLoadedPolicy(AllocationPolicy):
+    """
+    最低负载优先
+    """
+
+    name = "least_loaded"
+
+    def _key(self, resource: Dict[str, Any]) -> Tuple:
+        capacity = resource["capacity"] or 1
+        return ((capacity - resource["available"]) / capacity, -resource["available"], resource["id"])
+
+
+class BestFitPolicy(AllocationPolicy):
+    """
+    最佳适配：剩余容量最少的可用资源优先（剩余容量相同时容量小的优先）
+    """
+
+    name = "best_fit"
+
+    def _key(self, resource: Dict[str, Any]) -> Tuple:
+        return (resource["available"], resource["capacity"], resource["id"])
+
+
+class AffinityPolicy(LeastLoadedPolicy):
+    """
+    亲和性优先：任务的 affinity 为资源ID（或资源ID列表）时优先使用这些资源，
+    都不可用（或类型不匹配）时按最低负载分配
+    """
+
+    name = "affinity"
+
+    def select(self, task: Dict[str, Any]) -> Optional[str]:
+        affinity = task.get("affinity")
+        if affinity:
+            resource_type = task.get("resource_type")
+            for resource_id in ([affinity] if isinstance(affinity, str) else affinity):
+                resource = self.resources.get(resource_id)
+                if (resource is not None and resource["available"] > 0
+                        and resource_type in (None, resource["type"])):
+                    return resource_id
+        return super().select(task)
+
+
+class ConsistentHashPolicy(LeastLoadedPolicy):
+    """
+    一致性哈希：按任务的 affinity 键（没有时使用任务ID）在哈希环上选择资源
+
+    每个资源在环上有 replicas 个虚拟节点；目标资源没有空闲容量时沿环继续查找，
+    最多检查 max_probes 个不同的资源，仍然没有时按最低负载分配，保证选择的开销有上界。
+    """
+
+    name = "consistent_hash"
+
+    def __init__(self, replicas: int = 64, max_probes: int = 8):
+        """
+        初始化一致性哈希策略
+
+        Args:
+            replicas: 每个资源的虚拟节点数
+            max_probes: 沿环最多检查的资源数
+        """
+        super().__init__()
+        self.replicas = replicas
+        self.max_probes = max_probes
+        # 资源类型 -> 排序的 (哈希值, 资源ID) 环；键None的环包含所有资源
+        self._rings: Dict[Optional[str], List[Tuple[int, str]]] = {}
+
+    def add(self, resource: Dict[str, Any]):
+        super().add(resource)
+        for key in (resource["type"], None):
+            ring = self._rings.setdefault(key, [])
+            for replica in range(self.replicas):
+                bisect.insort(ring, (self._hash(f"{resource['id']}#{replica}"), resource["id"]))
+
+    def remove(self, resource_id: str):
+        resource = self.resources.get(resource_id)
+        super().remove(resource_id)
+        if resource is None:
+            return
+        for key in (resource["type"], None):
+            ring = self._rings.get(key)
+            if ring:
+                self._rings[key] = [node for node in ring if node[1] != resource_id]
+
+    def select(self, task: Dict[str, Any]) -> Optional[str]:
+        resource_type = task.get("resource_type")
+        ring = self._rings.get(resource_type)
+        if not ring:
+            return None
+        affinity = task.get("affinity")
+        key = affinity if isinstance(affinity, str) else str(affinity or task.get("id"))
+        position = bisect.bisect(ring, (self._hash(key), ""))
+        probed = set()
+        for offset in range(len(ring)):
+            resource_id = ring[(position + offset) % len(ring)][1]
+            if resource_id in probed:
+                continue
+            if self.resources[resource_id]["available"] > 0:
+                return resource_id
+            probed.add(resource_id)
+            if len(probed) >= self.max_probes:
+                break
+        return super().select(task)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# 按名称创建策略
+POLICIES = {
+    policy.name: policy
+    for policy in (LeastLoadedPolicy, BestFitPolicy, AffinityPolicy, ConsistentHashPolicy)
+}
+
+
+def create_policy(name: str, **kwargs) -> AllocationPolicy:
+    """
+    按名称创建分配策略
+
+    Args:
+        name: 策略名称：least_loaded、best_fit、affinity、consistent_hash
+        **kwargs: 策略参数
+
+    Returns:
+        分配策略实例
+    """
+    if name not in POLICIES:
+        raise ValueError(f"未知的分配策略: {name}，可选: {', '.join(POLICIES)}")
+    return POLICIES[name](**kwargs)
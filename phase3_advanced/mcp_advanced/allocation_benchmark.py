@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+资源分配策略基准测试
+
+在稳定负载（默认90%的总容量被占用）下交替释放和分配资源，比较：
+    - linear:           原来的线性扫描（第一个有空闲容量的资源）
+    - least_loaded / best_fit / affinity / consistent_hash: allocation.py 中基于堆索引的策略
+
+输出每次分配的平均耗时（选择资源和维护索引，包括对应的释放）、负载不均衡程度（满载资源的比例和资源负载率的标准差）
+以及局部性（相同 affinity 键的任务落在上一次同一资源上的比例）。
+
+运行方式:
+    python phase3_advanced/mcp_advanced/allocation_benchmark.py --resources 100 1000 5000 --operations 50000 --load 0.9
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase3_advanced.mcp_advanced.allocation import POLICIES, create_policy
+
+RESOURCE_TYPES = ["general", "gpu", "io"]
+
+
+class LinearScan:
+    """
+    原来的分配方式：线性扫描，返回第一个有空闲容量的资源
+    """
+
+    def __init__(self):
+        self.resources: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, resource: Dict[str, Any]):
+        self.resources[resource["id"]] = resource
+
+    def update(self, resource: Dict[str, Any]):
+        pass
+
+    def select(self, task: Dict[str, Any]) -> Optional[str]:
+        resource_type = task.get("resource_type")
+        for resource_id, resource in self.resources.items():
+            if resource["available"] > 0 and resource_type in (None, resource["type"]):
+                return resource_id
+        return None
+
+
+def run(policy_name: str, resource_count: int, operations: int, load: float, seed: int) -> Dict[str, float]:
+    """
+    运行一次基准测试
+
+    Args:
+        policy_name: 策略名称
+        resource_count: 资源数量
+        operations: 分配次数
+        load: 目标占用比例
+        seed: 随机种子
+
+    Returns:
+        测试结果
+    """
+    rng = random.Random(seed)
+    policy = LinearScan() if policy_name == "linear" else create_policy(policy_name)
+    resources = []
+    for i in range(resource_count):
+        capacity = rng.randint(1, 8)
+        resource = {"id": f"r{i}", "capacity": capacity, "available": capacity,
+                    "type": RESOURCE_TYPES[i % len(RESOURCE_TYPES)]}
+        resources.append(resource)
+        policy.add(resource)
+    target = int(sum(r["capacity"] for r in resources) * load)
+
+    keys = [f"key{i}" for i in range(resource_count * 4)]
+    last_placement: Dict[str, str] = {}
+    repeated = 0
+    same_place = 0
+    in_flight = []
+    elapsed = 0.0
+    selects = 0
+    load_samples = []
+
+    for step in range(operations):
+        key = rng.choice(keys)
+        task = {
+            "id": f"t{step}",
+            "resource_type": rng.choice(RESOURCE_TYPES + [None]),
+            "affinity": key
+        }
+        released = None
+        if len(in_flight) >= target:
+            # 超过目标占用时先释放一个随机的任务
+            position = rng.randrange(len(in_flight))
+            in_flight[position], in_flight[-1] = in_flight[-1], in_flight[position]
+            released = in_flight.pop()
+
+        start = time.perf_counter()
+        if released is not None:
+            released["available"] += 1
+            policy.update(released)
+        resource_id = policy.select(task)
+        if resource_id is not None:
+            resource = policy.resources[resource_id]
+            resource["available"] -= 1
+            policy.update(resource)
+        elapsed += time.perf_counter() - start
+        selects += 1
+        if resource_id is None:
+            continue
+        in_flight.append(resource)
+
+        if key in last_placement:
+            repeated += 1
+            same_place += last_placement[key] == resource_id
+        last_placement[key] = resource_id
+
+        if step % 1000 == 999:
+            load_samples.append([(r["capacity"] - r["available"]) / r["capacity"] for r in resources])
+
+    saturated = [sum(1 for value in sample if value >= 1.0) / len(sample) for sample in load_samples]
+    stdevs = [statistics.pstdev(sample) for sample in load_samples]
+    return {
+        "select_us": elapsed / selects * 1e6,
+        "saturated": statistics.mean(saturated) if saturated else 0.0,
+        "load_stdev": statistics.mean(stdevs) if stdevs else 0.0,
+        "locality": same_place / repeated if repeated else 0.0
+    }
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="资源分配策略基准测试")
+    parser.add_argument("--resources", type=int, nargs="+", default=[100, 1000], help="资源数量")
+    parser.add_argument("--operations", type=int, default=50000, help="每个场景的分配次数")
+    parser.add_argument("--load", type=float, default=0.9, help="目标占用比例")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    for resource_count in args.resources:
+        print(f"\n资源数: {resource_count}，分配次数: {args.operations}，占用比例: {args.load:.0%}")
+        print(f"{'策略':16s} {'分配耗时(us)':>12s} {'满载比例':>10s} {'负载标准差':>10s} {'局部性':>8s}")
+        for name in ["linear", *POLICIES]:
+            result = run(name, resource_count, args.operations, args.load, args.seed)
+            print(f"{name:16s} {result['select_us']:12.2f} {result['saturated']:10.1%} "
+                  f"{result['load_stdev']:10.3f} {result['locality']:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
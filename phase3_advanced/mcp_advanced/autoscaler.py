@@ -0,0 +1,107 @@
+"""
+工作线程自动伸缩
+
+AdvancedMCP 定期（默认每0.5秒）采样工作线程池的状态，由 AutoscalePolicy 决定目标线程数：
+
+    - 扩容：就绪队列（已分配资源、等待线程执行的任务）不为空，且任务的平均等待时间超过阈值，
+            连续 scale_up_samples 次采样满足条件时扩容，每次最多翻倍
+    - 扩容无效时暂停扩容：上一次扩容后的 scale_up_samples 次采样中，平均吞吐量没有明显提高
+            （例如CPU密集的任务受GIL限制），在就绪队列清空之前暂停扩容；暂停期从 scale_down_samples
+            次采样开始，连续无效时加倍
+    - 缩容：没有排队任务且有空闲线程，连续 scale_down_samples 次采样满足条件时每次减少一个线程
+
+扩容和缩容使用不同的连续采样次数，任何一次调整后计数清零，避免线程数在阈值附近来回抖动。
+策略对象只做决策，不是线程安全的，由 AdvancedMCP 的伸缩线程单独使用。
+"""
+
+from typing import List, Optional
+
+
+class AutoscalePolicy:
+    """
+    线程池伸缩策略
+    """
+
+    def __init__(self, min_workers: int, max_workers: int, scale_up_wait: float = 0.05,
+                 scale_up_samples: int = 2, scale_down_samples: int = 10, min_gain: float = 0.05):
+        """
+        初始化伸缩策略
+
+        Args:
+            min_workers: 最少线程数
+            max_workers: 最多线程数
+            scale_up_wait: 触发扩容的平均等待时间（秒）
+            scale_up_samples: 触发扩容需要连续满足条件的采样次数
+            scale_down_samples: 触发缩容需要连续满足条件的采样次数
+            min_gain: 扩容后吞吐量至少提高的比例，低于该比例认为扩容无效
+        """
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError(f"线程数范围无效: min_workers={min_workers}, max_workers={max_workers}")
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.scale_up_wait = scale_up_wait
+        self.scale_up_samples = scale_up_samples
+        self.scale_down_samples = scale_down_samples
+        self.min_gain = min_gain
+        self._up_streak = 0
+        self._down_streak = 0
+        # 上一次扩容前的吞吐量和扩容后各次采样的吞吐量，用于判断扩容是否有效
+        self._throughput_before_scale_up: Optional[float] = None
+        self._throughput_after_scale_up: List[float] = []
+        # 暂停扩容的剩余采样次数，以及连续无效扩容的次数
+        self._growth_blocked = 0
+        self._futile_scale_ups = 0
+
+    def decide(self, workers: int, busy: int, queue_depth: int, mean_wait: float, throughput: float) -> int:
+        """
+        根据一次采样决定目标线程数
+
+        Args:
+            workers: 当前线程数
+            busy: 正在执行任务的线程数
+            queue_depth: 就绪队列长度
+            mean_wait: 采样周期内任务从就绪到开始执行的平均等待时间（秒）
+            throughput: 采样周期内每秒完成的任务数
+
+        Returns:
+            目标线程数
+        """
+        if self._throughput_before_scale_up is not None:
+            self._throughput_after_scale_up.append(throughput)
+            if len(self._throughput_after_scale_up) >= self.scale_up_samples:
+                # 评估上一次扩容的效果（扩容前还没有任务完成时无法判断，视为有效）
+                before = self._throughput_before_scale_up
+                after = sum(self._throughput_after_scale_up) / len(self._throughput_after_scale_up)
+                if before > 0 and after <= before * (1 + self.min_gain) and queue_depth > 0:
+                    self._growth_blocked = self.scale_down_samples << self._futile_scale_ups
+                    self._futile_scale_ups += 1
+                else:
+                    self._futile_scale_ups = 0
+                self._throughput_before_scale_up = None
+                self._throughput_after_scale_up = []
+        elif queue_depth == 0:
+            self._growth_blocked = 0
+            self._futile_scale_ups = 0
+        elif self._growth_blocked:
+            self._growth_blocked -= 1
+
+        if queue_depth > 0 and mean_wait >= self.scale_up_wait and not self._growth_blocked:
+            self._up_streak += 1
+        else:
+            self._up_streak = 0
+        if queue_depth == 0 and busy < workers:
+            self._down_streak += 1
+        else:
+            self._down_streak = 0
+
+        target = workers
+        if self._up_streak >= self.scale_up_samples and workers < self.max_workers:
+            target = min(self.max_workers, workers + max(1, min(queue_depth, workers)))
+            self._throughput_before_scale_up = throughput
+        elif self._down_streak >= self.scale_down_samples and workers > self.min_workers:
+            target = workers - 1
+        target = max(self.min_workers, min(self.max_workers, target))
+        if target != workers:
+            self._up_streak = 0
+            self._down_streak = 0
+        return target
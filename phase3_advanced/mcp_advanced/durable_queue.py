@@ -0,0 +1,237 @@
+"""
+任务持久化
+
+AdvancedMCP 的等待队列和任务记录都在内存中，进程崩溃或重启后未结束的任务会丢失。
+DurableTaskStore 把未结束的任务保存在 SQLite 数据库（WAL 模式）中：
+
+    - 任务函数按注册名称保存（AdvancedMCP.register_function），参数用 pickle 序列化
+    - 提交和结束只写入内存缓冲区，由写线程成批提交：每 flush_interval 秒或缓冲区达到 batch_size 条时
+      在一个事务中写入。同一任务在提交前既添加又结束时只写一次删除，短任务几乎不增加写入
+    - 每行记录所属的实例（owner）和租约到期时间，写线程定期续约。recover() 认领自己的任务和租约已过期
+      （所属实例已停止）的任务，多个实例可以共用一个数据库；stop() 时释放租约，重启后可以立即恢复
+
+成批提交意味着最近 flush_interval 秒内提交的任务在进程崩溃时可能丢失，需要确认写入时调用 flush()。
+synchronous=NORMAL 下已提交的事务在进程崩溃时不会丢失，操作系统崩溃或断电时可能丢失最后几个事务。
+"""
+
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Any, Tuple
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    priority INTEGER NOT NULL,
+    created_time REAL NOT NULL,
+    owner TEXT,
+    lease_expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_owner ON tasks (owner);
+CREATE INDEX IF NOT EXISTS tasks_lease ON tasks (lease_expires);
+"""
+
+# 保存在 payload 中的任务字段
+_PAYLOAD_FIELDS = ("args", "resource_type", "affinity", "kind", "depends_on", "inputs", "on_dependency_failure")
+
+
+class DurableTaskStore:
+    """
+    基于 SQLite WAL 的任务存储，线程安全
+    """
+
+    def __init__(self, path: str, owner: Optional[str] = None, lease_time: float = 30.0, batch_size: int = 256,
+                 flush_interval: float = 0.05):
+        """
+        初始化任务存储
+
+        Args:
+            path: 数据库文件路径
+            owner: 实例名称，为None时按主机名、进程号生成唯一名称；使用固定名称时重启后立即认领崩溃前的任务
+            lease_time: 租约时间（秒），所属实例停止续约超过该时间后其他实例可以认领它的任务
+            batch_size: 缓冲区达到该条数时立即提交
+            flush_interval: 最长提交间隔（秒）
+        """
+        self.path = path
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_time = lease_time
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        # 尚未提交的写入：任务ID -> 行（添加）或None（删除），同一任务只保留最后一次写入
+        self._pending: Dict[str, Optional[Tuple[Any, ...]]] = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._db_lock:
+            return self._connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def enqueue(self, task: Dict[str, Any]):
+        """
+        保存任务（同ID的记录被替换）
+
+        Args:
+            task: 任务信息，包含 id、function（注册名称）、priority、created_time 和 _PAYLOAD_FIELDS 中的字段
+
+        Raises:
+            ValueError: 如果任务参数无法序列化
+        """
+        try:
+            payload = pickle.dumps({field: task[field] for field in _PAYLOAD_FIELDS}, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            raise ValueError(f"任务参数无法持久化: {task['id']}, {str(e)}") from e
+        row = (task["id"], task["function"], payload, task["priority"], task["created_time"],
+               self.owner, time.time() + self.lease_time)
+        self._write(task["id"], row)
+
+    def ack(self, task_id: str):
+        """
+        删除已结束的任务
+
+        Args:
+            task_id: 任务ID
+        """
+        self._write(task_id, None)
+
+    def flush(self):
+        """
+        立即提交缓冲区中的写入，返回时之前的所有写入都已提交
+        """
+        # 在数据库锁内取出缓冲区，保证各批次按取出的顺序提交
+        with self._db_lock:
+            with self._cond:
+                pending, self._pending = self._pending, {}
+            self._commit(pending)
+
+    def recover(self) -> List[Dict[str, Any]]:
+        """
+        认领自己的任务和租约已过期的任务
+
+        Returns:
+            任务信息列表，按优先级和创建时间排序；无法反序列化的记录保留在数据库中并跳过
+        """
+        self.flush()
+        now = time.time()
+        with self._db_lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.execute(
+                    "UPDATE tasks SET owner = ?, lease_expires = ? "
+                    "WHERE owner = ? OR owner IS NULL OR lease_expires < ?",
+                    (self.owner, now + self.lease_time, self.owner, now)
+                )
+            rows = self._connection.execute(
+                "SELECT id, function, payload, priority, created_time FROM tasks WHERE owner = ? "
+                "ORDER BY priority, created_time", (self.owner,)
+            ).fetchall()
+        tasks = []
+        for task_id, function, payload, priority, created_time in rows:
+            try:
+                fields = pickle.loads(payload)
+            except Exception as e:
+                print(f"持久化任务无法恢复: {task_id}, {str(e)}")
+                continue
+            tasks.append({"id": task_id, "function": function, "priority": priority,
+                          "created_time": created_time, **fields})
+        return tasks
+
+    def start(self):
+        """
+        启动写线程（提交缓冲区并续约）
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止写线程，提交缓冲区并释放租约，其他实例（或重启后的实例）可以立即认领剩余的任务
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.execute("UPDATE tasks SET owner = NULL, lease_expires = 0 WHERE owner = ?",
+                                         (self.owner,))
+
+    def close(self):
+        """
+        停止写线程并关闭数据库连接
+        """
+        self.stop()
+        with self._db_lock:
+            self._connection.close()
+
+    def _write(self, task_id: str, row: Optional[Tuple[Any, ...]]):
+        with self._cond:
+            self._pending[task_id] = row
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _commit(self, pending: Dict[str, Optional[Tuple[Any, ...]]]):
+        """
+        在一个事务中写入一批记录（调用方持有 self._db_lock）
+        """
+        if not pending:
+            return
+        try:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [row for row in pending.values() if row is not None]
+                )
+                self._connection.executemany(
+                    "DELETE FROM tasks WHERE id = ?",
+                    [(task_id,) for task_id, row in pending.items() if row is None]
+                )
+        except sqlite3.Error:
+            # 放回缓冲区（之后的写入优先），下一次提交时重试
+            with self._cond:
+                self._pending = {**pending, **self._pending}
+            raise
+
+    def _run(self):
+        next_renewal = time.monotonic() + self.lease_time / 3
+        while True:
+            with self._cond:
+                if self._running and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if not self._running:
+                    return
+            try:
+                self.flush()
+                if time.monotonic() >= next_renewal:
+                    next_renewal = time.monotonic() + self.lease_time / 3
+                    with self._db_lock:
+                        with self._connection:
+                            self._connection.execute("BEGIN")
+                            self._connection.execute("UPDATE tasks SET lease_expires = ? WHERE owner = ?",
+                                                     (time.time() + self.lease_time, self.owner))
+            except sqlite3.Error as e:
+                print(f"任务持久化错误: {str(e)}")
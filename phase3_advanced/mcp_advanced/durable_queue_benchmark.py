@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务持久化基准测试
+
+比较以下方式的入队（enqueue）和出队（任务结束时的 ack）速率：
+    - memory:       只在内存中（queue.PriorityQueue），作为不持久化的基线
+    - per_commit:   DurableTaskStore，每次写入后立即提交（flush）
+    - batched:      DurableTaskStore，由写线程成批提交（默认配置）
+
+并测量从数据库恢复全部任务（recover）的耗时，以及 AdvancedMCP 在有无持久化存储时执行空任务的吞吐量。
+
+运行方式:
+    python phase3_advanced/mcp_advanced/durable_queue_benchmark.py --tasks 10000 50000 --batch-size 256
+"""
+
+import argparse
+import os
+import queue
+import sys
+import tempfile
+import time
+from typing import Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase3_advanced.mcp_advanced.advanced_mcp import AdvancedMCP
+from phase3_advanced.mcp_advanced.durable_queue import DurableTaskStore
+
+MODES = ["memory", "per_commit", "batched"]
+
+
+def noop(value: int) -> int:
+    """
+    基准测试使用的空任务
+    """
+    return value
+
+
+def make_task(index: int) -> Dict:
+    return {
+        "id": f"t{index}",
+        "function": "noop",
+        "priority": index % 4,
+        "created_time": time.time(),
+        "args": {"value": index},
+        "resource_type": None,
+        "affinity": None,
+        "kind": "io",
+        "depends_on": [],
+        "inputs": {},
+        "on_dependency_failure": "fail"
+    }
+
+
+def run_queue(mode: str, task_count: int, batch_size: int, directory: str) -> Dict[str, float]:
+    """
+    测量入队、出队和恢复的速率
+
+    Args:
+        mode: 测试方式
+        task_count: 任务数
+        batch_size: 成批提交的条数
+        directory: 数据库所在目录
+
+    Returns:
+        测试结果
+    """
+    tasks = [make_task(i) for i in range(task_count)]
+    if mode == "memory":
+        pending = queue.PriorityQueue()
+        start = time.perf_counter()
+        for task in tasks:
+            pending.put((task["priority"], task["id"], task))
+        enqueue = time.perf_counter() - start
+        start = time.perf_counter()
+        while not pending.empty():
+            pending.get()
+        return {"enqueue": task_count / enqueue, "dequeue": task_count / (time.perf_counter() - start),
+                "recover": 0.0}
+
+    path = os.path.join(directory, f"{mode}-{task_count}.db")
+    store = DurableTaskStore(path, batch_size=batch_size)
+    store.start()
+    start = time.perf_counter()
+    for task in tasks:
+        store.enqueue(task)
+        if mode == "per_commit":
+            store.flush()
+    store.flush()
+    enqueue = time.perf_counter() - start
+
+    # 释放租约后由另一个实例恢复
+    store.stop()
+    recovering = DurableTaskStore(path, batch_size=batch_size)
+    start = time.perf_counter()
+    recovered = recovering.recover()
+    recover = time.perf_counter() - start
+    assert len(recovered) == task_count
+
+    recovering.start()
+    start = time.perf_counter()
+    for task in tasks:
+        recovering.ack(task["id"])
+        if mode == "per_commit":
+            recovering.flush()
+    recovering.flush()
+    dequeue = time.perf_counter() - start
+    recovering.close()
+    store.close()
+    return {"enqueue": task_count / enqueue, "dequeue": task_count / dequeue, "recover": recover}
+
+
+def run_mcp(durable: bool, task_count: int, batch_size: int, directory: str) -> float:
+    """
+    测量 AdvancedMCP 执行空任务的吞吐量
+
+    Returns:
+        每秒完成的任务数
+    """
+    store = None
+    if durable:
+        store = DurableTaskStore(os.path.join(directory, f"mcp-{task_count}.db"), batch_size=batch_size)
+    mcp = AdvancedMCP(max_workers=4, verbose=False, durable_store=store)
+    mcp.register_function("noop", noop)
+    mcp.register_resource("r", 64)
+    mcp.start()
+    start = time.perf_counter()
+    futures = [mcp.add_task(f"t{i}", "noop", value=i) for i in range(task_count)]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    mcp.stop()
+    if store is not None:
+        assert len(store) == 0
+        store.close()
+    return task_count / elapsed
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="任务持久化基准测试")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10000], help="任务数")
+    parser.add_argument("--batch-size", type=int, default=256, help="成批提交的条数")
+    parser.add_argument("--skip-per-commit", action="store_true", help="跳过逐条提交（任务数较多时很慢）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for task_count in args.tasks:
+            print(f"\n任务数: {task_count}，成批提交条数: {args.batch_size}")
+            print(f"{'方式':12s} {'入队(个/秒)':>12s} {'出队(个/秒)':>12s} {'恢复(秒)':>10s}")
+            for mode in MODES:
+                if mode == "per_commit" and args.skip_per_commit:
+                    continue
+                result = run_queue(mode, task_count, args.batch_size, directory)
+                print(f"{mode:12s} {result['enqueue']:12.0f} {result['dequeue']:12.0f} {result['recover']:10.3f}")
+            memory = run_mcp(False, task_count, args.batch_size, directory)
+            durable = run_mcp(True, task_count, args.batch_size, directory)
+            print(f"AdvancedMCP 吞吐量(个/秒): 内存 {memory:.0f}，持久化 {durable:.0f} ({durable / memory:.0%})")
+
+
+if __name__ == "__main__":
+    main()
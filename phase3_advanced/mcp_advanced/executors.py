@@ -0,0 +1,438 @@
+"""
+cpu 任务的执行后端
+
+AdvancedMCP 把 kind="cpu" 的任务交给执行后端，在其他进程中运行以利用所有CPU核：
+
+    - ProcessPoolBackend:    基于 ProcessPoolExecutor，每个任务单独提交，适合耗时较长的任务
+    - WorkStealingBackend:   每个工作进程对应一个任务双端队列，任务按轮转放入各队列，工作进程成批
+                             取走自己队列头部的任务；自己的队列为空时从最长的队列尾部窃取一半。
+                             成批发送任务分摊了进程间通信的开销，适合大量细粒度的任务
+                             （对比见 executors_benchmark.py）
+
+两个后端都通过 pickle 把任务函数和参数传给工作进程，任务函数需要定义在模块顶层。
+任务返回大于 shared_memory_threshold 字节的 NumPy 数组时，数据通过共享内存传回（一次内存拷贝），
+不经过管道序列化。没有安装 NumPy 时不影响其他类型的结果。
+"""
+
+import collections
+import concurrent.futures
+import itertools
+import multiprocessing
+import pickle
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 通过共享内存传回结果的最小数组大小（字节）
+SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+# 发送线程等待工作进程结果时检查后端是否已关闭的间隔（秒）
+POLL_INTERVAL = 0.1
+
+# 结果回调：callback(result, error)，error 为None表示成功
+ResultCallback = Callable[[Any, Optional[BaseException]], None]
+
+
+class SharedArray:
+    """
+    放在共享内存中的 NumPy 数组的描述，由工作进程创建，主进程读取后释放共享内存
+    """
+
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+
+def _export_result(result: Any, threshold: int) -> Any:
+    """
+    在工作进程中把大数组写入共享内存，返回其描述；其他结果原样返回
+    """
+    if np is None or not isinstance(result, np.ndarray) or result.nbytes < threshold or result.dtype.hasobject:
+        return result
+    block = shared_memory.SharedMemory(create=True, size=max(result.nbytes, 1))
+    try:
+        np.ndarray(result.shape, dtype=result.dtype, buffer=block.buf)[...] = result
+        return SharedArray(block.name, result.shape, result.dtype.str)
+    finally:
+        block.close()
+
+
+def _import_result(result: Any) -> Any:
+    """
+    在主进程中读取共享内存中的数组并释放共享内存；其他结果原样返回
+    """
+    if not isinstance(result, SharedArray):
+        return result
+    block = shared_memory.SharedMemory(name=result.name)
+    try:
+        return np.ndarray(result.shape, dtype=result.dtype, buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _run_task(func: Callable, kwargs: Dict[str, Any], threshold: int) -> Any:
+    """
+    在工作进程中执行任务
+    """
+    return _export_result(func(**kwargs), threshold)
+
+
+class ExecutorBackend:
+    """
+    执行后端基类
+    """
+
+    name = "base"
+
+    def submit(self, func: Callable, kwargs: Dict[str, Any], callback: ResultCallback):
+        """
+        提交任务，结束时调用 callback(result, error)
+
+        回调可能在提交线程中立即执行（例如任务无法提交时），也可能在后端的内部线程中执行。
+
+        Args:
+            func: 任务函数
+            kwargs: 任务参数
+            callback: 结果回调
+        """
+        raise NotImplementedError
+
+    def shutdown(self):
+        """
+        关闭后端：已开始的任务继续执行完，尚未开始的任务以 CancelledError 结束
+        """
+        raise NotImplementedError
+
+
+class ProcessPoolBackend(ExecutorBackend):
+    """
+    进程池后端
+
+    工作进程异常退出时 ProcessPoolExecutor 不再可用，正在执行的任务以 BrokenProcessPool 结束，
+    之后提交的任务使用重新创建的进程池。
+    """
+
+    name = "process"
+
+    def __init__(self, max_workers: Optional[int] = None, shared_memory_threshold: int = SHARED_MEMORY_THRESHOLD):
+        """
+        初始化进程池后端
+
+        Args:
+            max_workers: 进程数，为None时使用CPU核数
+            shared_memory_threshold: 通过共享内存传回的最小数组大小（字节）
+        """
+        # 在创建工作进程前启动资源跟踪进程，使主进程和工作进程共用同一个跟踪进程
+        resource_tracker.ensure_running()
+        self.max_workers = max_workers
+        self.shared_memory_threshold = shared_memory_threshold
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, kwargs: Dict[str, Any], callback: ResultCallback):
+        try:
+            with self._lock:
+                try:
+                    future = self._pool.submit(_run_task, func, kwargs, self.shared_memory_threshold)
+                except BrokenProcessPool:
+                    self._pool.shutdown(wait=False)
+                    self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+                    future = self._pool.submit(_run_task, func, kwargs, self.shared_memory_threshold)
+        except Exception as e:
+            # 进程池已关闭
+            callback(None, e)
+            return
+        future.add_done_callback(lambda done: self._on_done(done, callback))
+
+    def shutdown(self):
+        with self._lock:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _on_done(future: concurrent.futures.Future, callback: ResultCallback):
+        if future.cancelled():
+            callback(None, concurrent.futures.CancelledError("执行后端已关闭"))
+        elif future.exception() is not None:
+            callback(None, future.exception())
+        else:
+            try:
+                result = _import_result(future.result())
+            except Exception as e:
+                callback(None, e)
+                return
+            callback(result, None)
+
+
+def _work_stealing_worker(connection, threshold: int):
+    """
+    工作窃取后端的工作进程：成批接收任务并按顺序执行，每个任务结束后立即返回 (是否成功, 结果或异常)，
+    进程异常退出时主进程据此区分已完成和尚未完成的任务
+    """
+    while True:
+        try:
+            batch = connection.recv()
+        except EOFError:
+            return
+        if batch is None:
+            return
+        for payload in batch:
+            if connection.poll():
+                # 一批任务执行期间主进程只会发送停止信号（后端已关闭），其余任务不再执行
+                return
+            try:
+                func, kwargs = pickle.loads(payload)
+                result = (True, _export_result(func(**kwargs), threshold))
+            except Exception as e:
+                result = (False, e)
+            try:
+                connection.send(result)
+            except Exception:
+                # 结果或异常无法 pickle 时替换为错误描述
+                connection.send(_picklable_result(result))
+
+
+def _picklable_result(item: Tuple[bool, Any]) -> Tuple[bool, Any]:
+    try:
+        pickle.dumps(item)
+        return item
+    except Exception as e:
+        return False, RuntimeError(f"任务结果无法传回主进程: {e}")
+
+
+class WorkStealingBackend(ExecutorBackend):
+    """
+    工作窃取后端
+
+    每个工作进程由主进程中的一个发送线程驱动：发送线程从自己的双端队列头部取一批任务发给工作进程，
+    等待这一批的结果后再取下一批；自己的队列为空时从最长的队列尾部窃取一半任务。
+
+    工作进程异常退出时只有正在执行的任务以 BrokenProcessPool 结束，这一批中尚未开始的任务放回队列，
+    由重新启动的工作进程执行。
+    """
+
+    name = "work_stealing"
+
+    def __init__(self, max_workers: Optional[int] = None, batch_size: int = 32,
+                 shared_memory_threshold: int = SHARED_MEMORY_THRESHOLD, shutdown_timeout: float = 5.0):
+        """
+        初始化工作窃取后端
+
+        Args:
+            max_workers: 工作进程数，为None时使用CPU核数
+            batch_size: 每批发给工作进程的最大任务数
+            shared_memory_threshold: 通过共享内存传回的最小数组大小（字节）
+            shutdown_timeout: 关闭时等待正在执行的任务结束的最长时间（秒），超时后终止工作进程，
+                              任务以 CancelledError 结束
+        """
+        resource_tracker.ensure_running()
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        self.shared_memory_threshold = shared_memory_threshold
+        self.shutdown_timeout = shutdown_timeout
+        self._context = multiprocessing.get_context()
+        # 每个工作进程的任务队列，元素为 (pickle 后的任务, 回调)
+        self._deques: List[collections.deque] = [collections.deque() for _ in range(self.max_workers)]
+        self._cond = threading.Condition()
+        self._next_deque = itertools.count()
+        self._running = True
+        self._feeders = []
+        for index in range(self.max_workers):
+            feeder = threading.Thread(target=self._feed_loop, args=(index,))
+            feeder.daemon = True
+            feeder.start()
+            self._feeders.append(feeder)
+
+    def submit(self, func: Callable, kwargs: Dict[str, Any], callback: ResultCallback):
+        try:
+            payload = pickle.dumps((func, kwargs))
+        except Exception as e:
+            callback(None, e)
+            return
+        with self._cond:
+            if not self._running:
+                cancelled = True
+            else:
+                cancelled = False
+                self._deques[next(self._next_deque) % self.max_workers].append((payload, callback))
+                # 任何空闲的发送线程都可以取走（或窃取）这个任务
+                self._cond.notify()
+        if cancelled:
+            callback(None, concurrent.futures.CancelledError("执行后端已关闭"))
+
+    def shutdown(self):
+        with self._cond:
+            self._running = False
+            pending = [item for queue in self._deques for item in queue]
+            for queue in self._deques:
+                queue.clear()
+            self._cond.notify_all()
+        for _, callback in pending:
+            callback(None, concurrent.futures.CancelledError("执行后端已关闭"))
+        # 等待发送线程停止工作进程（在结果回调中关闭时不等待自己）
+        for feeder in self._feeders:
+            if feeder is not threading.current_thread():
+                feeder.join()
+
+    def get_queue_lengths(self) -> List[int]:
+        """
+        获取各工作进程队列中等待的任务数
+        """
+        with self._cond:
+            return [len(queue) for queue in self._deques]
+
+    def _take_batch_locked(self, index: int) -> List[Tuple[bytes, ResultCallback]]:
+        """
+        从自己的队列头部取一批任务，队列为空时从最长的队列尾部窃取一半（调用方持有 self._cond）
+        """
+        own = self._deques[index]
+        if own:
+            return [own.popleft() for _ in range(min(self.batch_size, len(own)))]
+        victim = max(self._deques, key=len)
+        count = min(self.batch_size, (len(victim) + 1) // 2)
+        # 从尾部窃取，与队列所属的发送线程在不同的一端取任务
+        batch = [victim.pop() for _ in range(count)]
+        batch.reverse()
+        return batch
+
+    def _requeue(self, index: int, batch: List[Tuple[bytes, ResultCallback]]):
+        """
+        把尚未开始的任务按原顺序放回自己的队列头部；后端已关闭时取消
+        """
+        with self._cond:
+            if self._running:
+                self._deques[index].extendleft(reversed(batch))
+                self._cond.notify_all()
+                return
+        for _, callback in batch:
+            callback(None, concurrent.futures.CancelledError("执行后端已关闭"))
+
+    def _wait_result(self, connection, state: Dict[str, Any]) -> bool:
+        """
+        等待工作进程返回下一个结果，期间检查后端是否已关闭
+
+        关闭后通知工作进程不再开始新的任务，并最多再等待 shutdown_timeout 秒。
+
+        Returns:
+            结果是否已到达；为False表示关闭后等待超时
+        """
+        while not connection.poll(POLL_INTERVAL):
+            if state.get("deadline") is None:
+                with self._cond:
+                    running = self._running
+                if not running:
+                    state["deadline"] = time.monotonic() + self.shutdown_timeout
+                    connection.send(None)
+            elif time.monotonic() >= state["deadline"]:
+                return False
+        return True
+
+    @staticmethod
+    def _deliver(callback: ResultCallback, success: bool, value: Any):
+        if not success:
+            callback(None, value)
+            return
+        try:
+            value = _import_result(value)
+        except Exception as e:
+            callback(None, e)
+            return
+        callback(value, None)
+
+    def _feed_loop(self, index: int):
+        """
+        发送线程循环
+        """
+        process, connection = self._start_worker()
+        try:
+            while True:
+                with self._cond:
+                    while self._running and not any(self._deques):
+                        self._cond.wait()
+                    if not self._running:
+                        return
+                    batch = self._take_batch_locked(index)
+                try:
+                    connection.send([payload for payload, _ in batch])
+                except OSError:
+                    # 工作进程在空闲时退出，这一批任务都没有开始
+                    self._requeue(index, batch)
+                    process.join(timeout=1.0)
+                    process, connection = self._start_worker()
+                    continue
+
+                finished = 0
+                state: Dict[str, Any] = {}
+                try:
+                    while finished < len(batch):
+                        if not self._wait_result(connection, state):
+                            break
+                        success, value = connection.recv()
+                        self._deliver(batch[finished][1], success, value)
+                        finished += 1
+                except (EOFError, OSError) as e:
+                    if state.get("deadline") is None:
+                        # 工作进程异常退出：正在执行的任务失败，尚未开始的任务放回队列，并重新启动工作进程
+                        batch[finished][1](None, BrokenProcessPool(f"工作进程异常退出: {e}"))
+                        self._requeue(index, batch[finished + 1:])
+                        process.join(timeout=1.0)
+                        process, connection = self._start_worker()
+                        continue
+                if finished < len(batch):
+                    # 后端已关闭：工作进程没有执行或在超时前没有执行完的任务被取消
+                    process.terminate()
+                    for _, callback in batch[finished:]:
+                        callback(None, concurrent.futures.CancelledError("执行后端已关闭"))
+                    return
+        finally:
+            try:
+                connection.send(None)
+            except (EOFError, OSError):
+                pass
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            connection.close()
+
+    def _start_worker(self):
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_work_stealing_worker, args=(child_connection, self.shared_memory_threshold)
+        )
+        process.daemon = True
+        process.start()
+        child_connection.close()
+        return process, parent_connection
+
+
+# 按名称创建执行后端
+EXECUTORS = {
+    backend.name: backend
+    for backend in (ProcessPoolBackend, WorkStealingBackend)
+}
+
+
+def create_executor(name: str, **kwargs) -> ExecutorBackend:
+    """
+    按名称创建执行后端
+
+    Args:
+        name: 后端名称：process、work_stealing
+        **kwargs: 后端参数
+
+    Returns:
+        执行后端实例
+    """
+    if name not in EXECUTORS:
+        raise ValueError(f"未知的执行后端: {name}，可选: {', '.join(EXECUTORS)}")
+    return EXECUTORS[name](**kwargs)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+cpu 任务执行后端基准测试
+
+比较 executors.py 中的执行后端完成大量任务的耗时：
+    - process:          ProcessPoolBackend，每个任务单独提交
+    - work_stealing:    WorkStealingBackend，任务成批发给工作进程
+
+任务有两种：
+    - fine:     几乎不耗时的细粒度任务，耗时主要是进程间通信的开销
+    - skewed:   大多数任务很短、少数任务很长，测试负载不均时的调度
+
+运行方式:
+    python phase3_advanced/mcp_advanced/executors_benchmark.py --tasks 3000 30000 --workers 4 --batch-size 32
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase3_advanced.mcp_advanced.executors import EXECUTORS, create_executor
+
+WORKLOADS = ["fine", "skewed"]
+
+
+def fine_task(value: int) -> int:
+    """
+    细粒度任务
+    """
+    return value * value
+
+
+def skewed_task(value: int) -> int:
+    """
+    每 50 个任务中有一个耗时约 20 毫秒，其余约 0.2 毫秒
+    """
+    time.sleep(0.02 if value % 50 == 0 else 0.0002)
+    return value
+
+
+def run(backend_name: str, workload: str, task_count: int, workers: int, batch_size: int) -> float:
+    """
+    运行一次基准测试
+
+    Args:
+        backend_name: 执行后端名称
+        workload: 任务类型
+        task_count: 任务数
+        workers: 工作进程数
+        batch_size: 工作窃取后端每批的最大任务数
+
+    Returns:
+        完成全部任务的耗时（秒），不包括启动工作进程的时间
+    """
+    kwargs: Dict = {"max_workers": workers}
+    if backend_name == "work_stealing":
+        kwargs["batch_size"] = batch_size
+    backend = create_executor(backend_name, **kwargs)
+    func = fine_task if workload == "fine" else skewed_task
+
+    # 预热：启动工作进程
+    warmed = threading.Event()
+    backend.submit(fine_task, {"value": 0}, lambda result, error: warmed.set())
+    warmed.wait()
+
+    done = threading.Event()
+    remaining = [task_count]
+    errors = []
+    lock = threading.Lock()
+
+    def callback(result, error):
+        with lock:
+            if error is not None:
+                errors.append(error)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+
+    start = time.perf_counter()
+    for i in range(task_count):
+        backend.submit(func, {"value": i}, callback)
+    done.wait()
+    elapsed = time.perf_counter() - start
+    backend.shutdown()
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="cpu 任务执行后端基准测试")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[3000], help="任务数")
+    parser.add_argument("--workers", type=int, default=4, help="工作进程数")
+    parser.add_argument("--batch-size", type=int, default=32, help="工作窃取后端每批的最大任务数")
+    args = parser.parse_args()
+
+    for task_count in args.tasks:
+        print(f"\n任务数: {task_count}，工作进程数: {args.workers}")
+        print(f"{'后端':14s} {'任务':8s} {'耗时(秒)':>10s} {'吞吐量(个/秒)':>14s}")
+        for workload in WORKLOADS:
+            for backend_name in EXECUTORS:
+                elapsed = run(backend_name, workload, task_count, args.workers, args.batch_size)
+                print(f"{backend_name:14s} {workload:8s} {elapsed:10.3f} {task_count / elapsed:14.0f}")
+
+
+if __name__ == "__main__":
+    main()
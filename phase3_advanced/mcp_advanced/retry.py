@@ -0,0 +1,266 @@
+"""
+任务重试与死信队列
+
+    - RetryPolicy:      重试策略：最大尝试次数、指数退避（带完全随机抖动）和可重试的异常类型
+    - TimerWheel:       哈希时间轮，O(1) 添加和取消定时器，由一个线程按固定刻度推进；
+                        重试在退避时间到达后重新进入等待队列，不占用工作线程
+    - DeadLetterQueue:  重试用尽或不可重试的失败任务，保留任务函数、参数和最后的错误，
+                        可以查看，并通过 AdvancedMCP.requeue_dead_letters() 批量重新提交
+"""
+
+import collections
+import itertools
+import math
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple, Type
+
+
+class RetryPolicy:
+    """
+    重试策略
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 30.0,
+                 multiplier: float = 2.0, jitter: bool = True,
+                 retryable: Tuple[Type[BaseException], ...] = (Exception,)):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts: 最大尝试次数（包括第一次执行）
+            base_delay: 第一次重试前的退避时间（秒）
+            max_delay: 退避时间上限（秒）
+            multiplier: 每次重试退避时间的倍数
+            jitter: 是否使用完全随机抖动（在0到退避时间之间均匀取值），避免大量任务同时重试
+            retryable: 可重试的异常类型，其他异常直接进入死信队列
+        """
+        if max_attempts < 1:
+            raise ValueError(f"最大尝试次数必须大于0: {max_attempts}")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retryable = tuple(retryable)
+        self._random = random.Random()
+
+    def should_retry(self, attempts: int, error: BaseException) -> bool:
+        """
+        判断失败的任务是否应该重试
+
+        Args:
+            attempts: 已尝试的次数
+            error: 最后一次尝试的异常
+
+        Returns:
+            是否重试
+        """
+        return attempts < self.max_attempts and isinstance(error, self.retryable)
+
+    def next_delay(self, attempts: int) -> float:
+        """
+        计算下一次重试前的退避时间
+
+        Args:
+            attempts: 已尝试的次数
+
+        Returns:
+            退避时间（秒）
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempts - 1))
+        return self._random.uniform(0, delay) if self.jitter else delay
+
+
+class TimerWheel:
+    """
+    哈希时间轮
+
+    定时器按到期刻度放入对应的槽，超过一圈的定时器记录剩余圈数；推进到某个槽时只检查该槽中的定时器。
+    定时精度为一个刻度，回调在时间轮线程中执行，应当尽快返回。
+    """
+
+    def __init__(self, tick: float = 0.01, slots: int = 512):
+        """
+        初始化时间轮
+
+        Args:
+            tick: 刻度（秒）
+            slots: 槽数
+        """
+        self.tick = tick
+        self._slots: List[Dict[int, List[Any]]] = [{} for _ in range(slots)]
+        # 定时器ID -> 所在的槽
+        self._locations: Dict[int, int] = {}
+        self._cursor = 0
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._locations)
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> int:
+        """
+        添加定时器
+
+        Args:
+            delay: 延迟（秒）
+            callback: 到期时调用的函数
+
+        Returns:
+            定时器ID
+        """
+        ticks = max(1, math.ceil(delay / self.tick))
+        with self._cond:
+            timer_id = next(self._ids)
+            slot = (self._cursor + ticks) % len(self._slots)
+            self._slots[slot][timer_id] = [(ticks - 1) // len(self._slots), callback]
+            self._locations[timer_id] = slot
+            self._cond.notify()
+        return timer_id
+
+    def cancel(self, timer_id: int) -> bool:
+        """
+        取消定时器
+
+        Args:
+            timer_id: 定时器ID
+
+        Returns:
+            是否取消成功（定时器已到期或不存在时返回False）
+        """
+        with self._cond:
+            slot = self._locations.pop(timer_id, None)
+            if slot is None:
+                return False
+            del self._slots[slot][timer_id]
+            return True
+
+    def start(self):
+        """
+        启动时间轮线程
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止时间轮线程，尚未到期的定时器保留到下次启动
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            with self._cond:
+                while self._running and not self._locations:
+                    # 没有定时器时阻塞等待，唤醒后重新对齐刻度
+                    self._cond.wait()
+                    next_tick = time.monotonic() + self.tick
+                if not self._running:
+                    return
+                remaining = next_tick - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                due = []
+                # 落后多个刻度时逐个补上
+                while next_tick <= time.monotonic():
+                    self._cursor = (self._cursor + 1) % len(self._slots)
+                    slot = self._slots[self._cursor]
+                    for timer_id, entry in list(slot.items()):
+                        if entry[0] == 0:
+                            del slot[timer_id]
+                            del self._locations[timer_id]
+                            due.append(entry[1])
+                        else:
+                            entry[0] -= 1
+                    next_tick += self.tick
+            for callback in due:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"定时器回调错误: {str(e)}")
+
+
+class DeadLetterQueue:
+    """
+    死信队列，线程安全
+
+    按任务ID保存最后一次失败的任务，超过 max_size 时丢弃最早的记录。
+    """
+
+    def __init__(self, max_size: int = 1000):
+        """
+        初始化死信队列
+
+        Args:
+            max_size: 最多保留的任务数
+        """
+        self.max_size = max_size
+        self._entries: "collections.OrderedDict[str, Dict[str, Any]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def add(self, entry: Dict[str, Any]):
+        """
+        添加失败的任务（同ID的旧记录被替换）
+
+        Args:
+            entry: 任务信息，至少包含 task_id
+        """
+        with self._lock:
+            self._entries.pop(entry["task_id"], None)
+            self._entries[entry["task_id"]] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def inspect(self, task_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        查看死信队列中的任务
+
+        Args:
+            task_id: 任务ID，为None时返回所有任务
+
+        Returns:
+            任务信息列表（按进入队列的顺序），不包含任务函数和参数以外的内部状态
+        """
+        with self._lock:
+            if task_id is not None:
+                entry = self._entries.get(task_id)
+                return [dict(entry)] if entry is not None else []
+            return [dict(entry) for entry in self._entries.values()]
+
+    def remove(self, task_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        取出死信队列中的任务
+
+        Args:
+            task_ids: 任务ID，为None时取出所有任务
+
+        Returns:
+            取出的任务信息
+        """
+        with self._lock:
+            if task_ids is None:
+                entries = list(self._entries.values())
+                self._entries.clear()
+                return entries
+            return [self._entries.pop(task_id) for task_id in task_ids if task_id in self._entries]
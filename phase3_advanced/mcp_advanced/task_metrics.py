@@ -0,0 +1,224 @@
+"""
+任务性能指标
+
+AdvancedMCP 在每个任务结束时记录一次：排队时间（提交到开始执行）、执行时间、是否成功，
+以及任务的优先级和分配的资源。
+
+    - LatencySketch:  可合并的分位数草图。按对数划分的桶计数，分位数的相对误差不超过 relative_accuracy，
+                      内存只与取值范围有关（与样本数无关），两个草图可以直接按桶相加合并
+    - TaskMetrics:    分片计数器。每个线程固定写入一个分片，分片各有一把锁，记录时几乎没有锁竞争；
+                      每个分片按 (优先级, 资源ID) 保存计数和草图，总计以及按优先级、按资源的细分
+                      都在 snapshot() 时合并得到，记录本身是 O(1)
+"""
+
+import itertools
+import math
+import threading
+from typing import Dict, List, Optional, Any, Tuple, Hashable
+
+
+class LatencySketch:
+    """
+    对数分桶的分位数草图
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6):
+        """
+        初始化草图
+
+        Args:
+            relative_accuracy: 分位数的相对误差上限
+            min_value: 小于该值的样本计入零桶
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        """
+        添加一个样本
+
+        Args:
+            value: 样本值（秒）
+        """
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value < self.min_value:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._bins[index] = self._bins.get(index, 0) + 1
+
+    def merge(self, other: "LatencySketch"):
+        """
+        合并另一个草图（两者的 relative_accuracy 必须相同）
+
+        Args:
+            other: 另一个草图
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("只能合并相对误差相同的草图")
+        for index, count in other._bins.items():
+            self._bins[index] = self._bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """
+        估算分位数
+
+        Args:
+            fraction: 分位（0到1）
+
+        Returns:
+            分位数估计值，没有样本时返回None
+        """
+        if self.count == 0:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self._bins):
+            seen += self._bins[index]
+            if rank < seen:
+                # 桶 (gamma^(i-1), gamma^i] 的代表值，相对误差不超过 relative_accuracy
+                return min(2 * self._gamma ** index / (self._gamma + 1), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        汇总统计
+
+        Returns:
+            样本数、均值、p50/p95/p99 和最大值
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None
+        }
+
+
+class _Series:
+    """
+    一组任务的计数和草图（内部使用，由所在分片的锁保护）
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.queue_wait = LatencySketch()
+        self.execution_time = LatencySketch()
+
+    def merge(self, other: "_Series"):
+        self.completed += other.completed
+        self.failed += other.failed
+        self.queue_wait.merge(other.queue_wait)
+        self.execution_time.merge(other.execution_time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tasks_completed": self.completed,
+            "tasks_failed": self.failed,
+            "queue_wait": self.queue_wait.summary(),
+            "execution_time": self.execution_time.summary()
+        }
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series: Dict[Tuple[Hashable, Optional[str]], _Series] = {}
+
+
+class TaskMetrics:
+    """
+    分片的任务指标，线程安全
+    """
+
+    def __init__(self, shards: int = 16):
+        """
+        初始化任务指标
+
+        Args:
+            shards: 分片数
+        """
+        self._shards: List[_Shard] = [_Shard() for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def record(self, priority: Hashable, resource_id: Optional[str], queue_wait: float, execution_time: float,
+               success: bool):
+        """
+        记录一个结束的任务
+
+        Args:
+            priority: 任务优先级
+            resource_id: 分配的资源ID
+            queue_wait: 排队时间（秒）
+            execution_time: 执行时间（秒）
+            success: 是否成功
+        """
+        shard = self._shard()
+        key = (priority, resource_id)
+        with shard.lock:
+            series = shard.series.get(key)
+            if series is None:
+                series = shard.series[key] = _Series()
+            if success:
+                series.completed += 1
+            else:
+                series.failed += 1
+            series.queue_wait.add(queue_wait)
+            series.execution_time.add(execution_time)
+
+    def snapshot(self) -> Tuple[Dict[str, Any], Dict[Hashable, Dict[str, Any]], Dict[Optional[str], Dict[str, Any]]]:
+        """
+        合并所有分片
+
+        Returns:
+            (总计, 按优先级的细分, 按资源的细分)
+        """
+        total = _Series()
+        by_priority: Dict[Hashable, _Series] = {}
+        by_resource: Dict[Optional[str], _Series] = {}
+        for shard in self._shards:
+            with shard.lock:
+                for (priority, resource_id), series in shard.series.items():
+                    total.merge(series)
+                    by_priority.setdefault(priority, _Series()).merge(series)
+                    by_resource.setdefault(resource_id, _Series()).merge(series)
+        return (
+            total.to_dict(),
+            {priority: series.to_dict() for priority, series in sorted(by_priority.items())},
+            {resource_id: series.to_dict() for resource_id, series in by_resource.items()}
+        )
+
+    def reset(self):
+        """
+        清空所有指标
+        """
+        for shard in self._shards:
+            with shard.lock:
+                shard.series.clear()
+
+    def _shard(self) -> _Shard:
+        # 每个线程第一次记录时按轮转固定一个分片
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._next_shard) % len(self._shards)]
+        return shard
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+AdvancedMCP 调度器测试
+
+运行方式:
+    python phase3_advanced/mcp_advanced/test_advanced_mcp.py
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase3_advanced.mcp_advanced.advanced_mcp import AdvancedMCP, DependencyError
+from phase3_advanced.mcp_advanced.retry import RetryPolicy
+
+# 等待任务结果的最长时间（秒）
+TIMEOUT = 10.0
+
+
+class TestAdvancedMCP(unittest.TestCase):
+    """
+    测试 AdvancedMCP 的调度、依赖、重试和资源失效处理
+    """
+
+    def setUp(self):
+        """
+        测试前的设置：单个工作线程，不自动伸缩
+        """
+        self.mcp = AdvancedMCP(max_workers=1, min_workers=1, verbose=False)
+
+    def tearDown(self):
+        """
+        测试后停止MCP
+        """
+        if self.mcp.running:
+            self.mcp.stop()
+
+    def test_equal_priority_runs_in_submission_order(self):
+        """
+        测试相同优先级的任务按提交顺序执行，更高优先级的任务先于已在等待的任务执行
+        """
+        order = []
+        record = lambda value: order.append(value)
+        self.mcp.register_resource("r", 1)
+        futures = [self.mcp.add_task(f"t{i}", record, value=f"t{i}") for i in range(5)]
+        futures.append(self.mcp.add_task("urgent", record, priority=-1, value="urgent"))
+        # 第一个任务在提交时已分配到资源，其余任务在等待队列中
+        self.assertEqual(self.mcp.get_waiting_count(), 5)
+
+        self.mcp.start()
+        for future in futures:
+            future.result(timeout=TIMEOUT)
+        self.assertEqual(order, ["t0", "urgent", "t1", "t2", "t3", "t4"])
+
+    def test_cancelled_pending_task_is_skipped(self):
+        """
+        测试等待队列中已取消的任务在分配资源时被跳过
+        """
+        calls = []
+        record = lambda value: calls.append(value)
+        first = self.mcp.add_task("a", record, value="a")
+        cancelled = self.mcp.add_task("b", record, value="b")
+        last = self.mcp.add_task("c", record, value="c")
+        self.assertTrue(cancelled.cancel())
+        self.assertIsNone(self.mcp.get_task_status("b"))
+        # 条目惰性删除，等待数不包括已取消的任务
+        self.assertEqual(self.mcp.get_waiting_count(), 2)
+
+        self.mcp.register_resource("r", 1)
+        self.mcp.start()
+        first.result(timeout=TIMEOUT)
+        last.result(timeout=TIMEOUT)
+        self.assertEqual(calls, ["a", "c"])
+        self.assertTrue(cancelled.cancelled())
+        self.assertEqual(self.mcp._stale_entries, 0)
+        self.assertEqual(self.mcp.get_waiting_count(), 0)
+
+    def test_dependents_released_on_completion(self):
+        """
+        测试上游任务完成后依赖它的任务开始执行，并收到上游任务的结果
+        """
+        self.mcp.register_resource("r", 2)
+        downstream = self.mcp.add_task("down", lambda x: x + 1, inputs={"x": "up"})
+        self.assertEqual(self.mcp.get_task_status("down"), "blocked")
+
+        self.mcp.start()
+        upstream = self.mcp.add_task("up", lambda: 41)
+        self.assertEqual(upstream.result(timeout=TIMEOUT), 41)
+        self.assertEqual(downstream.result(timeout=TIMEOUT), 42)
+
+    def test_dependents_released_on_failure(self):
+        """
+        测试上游任务失败后依赖失败沿下游传递，on_dependency_failure="run" 的任务照常执行
+        """
+        def fail():
+            raise ValueError("bad")
+
+        self.mcp.register_resource("r", 2)
+        self.mcp.start()
+        child = self.mcp.add_task("child", lambda: "never", depends_on=["bad"])
+        grandchild = self.mcp.add_task("grandchild", lambda: "never", depends_on=["child"])
+        tolerant = self.mcp.add_task("tolerant", lambda error: type(error).__name__, inputs={"error": "bad"},
+                                     on_dependency_failure="run")
+        upstream = self.mcp.add_task("bad", fail)
+
+        self.assertIsInstance(upstream.exception(timeout=TIMEOUT), ValueError)
+        error = child.exception(timeout=TIMEOUT)
+        self.assertIsInstance(error, DependencyError)
+        self.assertEqual(error.dependency, "bad")
+        error = grandchild.exception(timeout=TIMEOUT)
+        self.assertIsInstance(error, DependencyError)
+        self.assertEqual(error.dependency, "child")
+        self.assertEqual(tolerant.result(timeout=TIMEOUT), "ValueError")
+
+    def test_cycle_rejected(self):
+        """
+        测试形成环的依赖关系在提交时被拒绝
+        """
+        with self.assertRaises(ValueError):
+            self.mcp.add_task("self", lambda: None, depends_on=["self"])
+        self.mcp.add_task("a", lambda: None, depends_on=["b"])
+        self.mcp.add_task("b", lambda: None, depends_on=["c"])
+        with self.assertRaises(ValueError):
+            self.mcp.add_task("c", lambda: None, depends_on=["a"])
+        self.assertIsNone(self.mcp.get_task_status("c"))
+
+    def test_retry_then_dead_letter(self):
+        """
+        测试可重试的失败按策略重试，重试用尽后进入死信队列；不可重试的异常直接进入死信队列
+        """
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            raise ConnectionError("down")
+
+        def broken():
+            raise KeyError("missing")
+
+        policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02, jitter=False,
+                             retryable=(ConnectionError,))
+        self.mcp.register_resource("r", 1)
+        self.mcp.start()
+        retried = self.mcp.add_task("flaky", flaky, retry_policy=policy)
+        self.assertIsInstance(retried.exception(timeout=TIMEOUT), ConnectionError)
+        self.assertEqual(len(attempts), 3)
+        entry = self.mcp.dead_letters.inspect("flaky")[0]
+        self.assertEqual(entry["attempts"], 3)
+        self.assertEqual(entry["error_type"], "ConnectionError")
+
+        failed = self.mcp.add_task("broken", broken, retry_policy=policy)
+        self.assertIsInstance(failed.exception(timeout=TIMEOUT), KeyError)
+        self.assertEqual(self.mcp.dead_letters.inspect("broken")[0]["attempts"], 1)
+
+    def test_resource_failure_reschedules_before_start(self):
+        """
+        测试资源失效时已分配但尚未执行的任务重新调度，就绪队列中的旧轮次条目被丢弃
+        """
+        calls = []
+        self.mcp.register_resource("r1", 1)
+        future = self.mcp.add_task("t", lambda: calls.append(1) or "done")
+        self.assertEqual(self.mcp.tasks["t"]["assigned_resource"], "r1")
+
+        self.mcp._on_resource_failure("r1")
+        task = self.mcp.tasks["t"]
+        self.assertEqual(task["epoch"], 1)
+        self.assertEqual(task["status"], "pending")
+
+        self.mcp.register_resource("r2", 1)
+        self.assertEqual(task["assigned_resource"], "r2")
+        self.mcp.start()
+        self.assertEqual(future.result(timeout=TIMEOUT), "done")
+        self.assertEqual(len(calls), 1)
+
+    def test_resource_failure_discards_stale_result(self):
+        """
+        测试执行期间资源失效时任务在其他资源上重新执行，失效资源上的执行结果被丢弃
+        """
+        self.mcp = AdvancedMCP(max_workers=2, min_workers=2, verbose=False)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                release.wait(TIMEOUT)
+                return "stale"
+            return "fresh"
+
+        self.mcp.register_resource("r1", 1)
+        self.mcp.start()
+        future = self.mcp.add_task("t", work)
+        self.assertTrue(started.wait(TIMEOUT))
+
+        self.mcp._on_resource_failure("r1")
+        self.mcp.register_resource("r2", 1)
+        self.assertEqual(future.result(timeout=TIMEOUT), "fresh")
+        release.set()
+        self.assertEqual(len(calls), 2)
+
+        # 失效资源上的执行结束后不释放它的容量
+        self.mcp.stop()
+        self.assertEqual(self.mcp.resources["r1"]["available"], 0)
+        self.assertEqual(self.mcp.resources["r2"]["available"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
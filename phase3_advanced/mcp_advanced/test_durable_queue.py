@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务持久化测试
+
+运行方式:
+    python phase3_advanced/mcp_advanced/test_durable_queue.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase3_advanced.mcp_advanced.advanced_mcp import AdvancedMCP
+from phase3_advanced.mcp_advanced.durable_queue import DurableTaskStore
+
+# 等待任务结果的最长时间（秒）
+TIMEOUT = 10.0
+
+
+def add(x: int, y: int) -> int:
+    """
+    测试使用的任务函数
+    """
+    return x + y
+
+
+def make_task(task_id: str, priority: int = 0, **fields) -> dict:
+    task = {
+        "id": task_id,
+        "function": "add",
+        "priority": priority,
+        "created_time": time.time(),
+        "args": {"x": 1, "y": 2},
+        "resource_type": None,
+        "affinity": None,
+        "kind": "io",
+        "depends_on": [],
+        "inputs": {},
+        "on_dependency_failure": "fail"
+    }
+    task.update(fields)
+    return task
+
+
+class TestDurableTaskStore(unittest.TestCase):
+    """
+    测试 DurableTaskStore 的恢复、批量写入和租约
+    """
+
+    def setUp(self):
+        """
+        测试前的设置：临时数据库目录
+        """
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tasks.db")
+        self.stores = []
+
+    def tearDown(self):
+        """
+        测试后关闭所有存储并删除临时目录
+        """
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def open_store(self, **kwargs) -> DurableTaskStore:
+        store = DurableTaskStore(self.path, **kwargs)
+        self.stores.append(store)
+        return store
+
+    def test_recover_after_restart(self):
+        """
+        测试 stop() 后新的实例从同一个数据库恢复全部任务，按优先级和创建时间排序，字段保持不变
+        """
+        store = self.open_store()
+        store.start()
+        store.enqueue(make_task("low", priority=5))
+        store.enqueue(make_task("high", priority=1, inputs={"x": "low"}, depends_on=["low"],
+                                on_dependency_failure="run"))
+        store.stop()
+
+        recovered = self.open_store().recover()
+        self.assertEqual([task["id"] for task in recovered], ["high", "low"])
+        high = recovered[0]
+        self.assertEqual(high["function"], "add")
+        self.assertEqual(high["args"], {"x": 1, "y": 2})
+        self.assertEqual(high["inputs"], {"x": "low"})
+        self.assertEqual(high["depends_on"], ["low"])
+        self.assertEqual(high["on_dependency_failure"], "run")
+
+    def test_ack_before_flush_only_deletes(self):
+        """
+        测试同一任务在提交前既添加又结束时缓冲区只保留删除，数据库中不留下记录
+        """
+        store = self.open_store()
+        store.enqueue(make_task("short"))
+        store.ack("short")
+        self.assertEqual(store._pending, {"short": None})
+        store.flush()
+        self.assertEqual(len(store), 0)
+
+        # 已提交的任务结束后记录被删除
+        store.enqueue(make_task("long"))
+        store.flush()
+        self.assertEqual(len(store), 1)
+        store.ack("long")
+        self.assertEqual(len(store), 0)
+
+    def test_lease_takeover(self):
+        """
+        测试其他实例只能在所属实例的租约过期后认领任务，认领后原实例不再恢复这些任务
+        """
+        owner = self.open_store(owner="a", lease_time=0.2)
+        owner.enqueue(make_task("t"))
+        owner.flush()
+
+        other = self.open_store(owner="b", lease_time=30.0)
+        self.assertEqual(other.recover(), [])
+        # 所属实例没有启动写线程，不会续约
+        time.sleep(0.3)
+        self.assertEqual([task["id"] for task in other.recover()], ["t"])
+        self.assertEqual(owner.recover(), [])
+
+    def test_advanced_mcp_recovers_tasks(self):
+        """
+        测试 AdvancedMCP 重启后执行上次未结束的任务，inputs 中的依赖在恢复的任务之间解析
+        """
+        store = self.open_store()
+        mcp = AdvancedMCP(verbose=False, durable_store=store)
+        mcp.register_function("add", add)
+        mcp.add_task("up", "add", x=1, y=2)
+        mcp.add_task("down", "add", inputs={"x": "up"}, y=10)
+        # 没有资源，任务都没有执行；模拟进程退出
+        store.stop()
+
+        restarted = AdvancedMCP(verbose=False, durable_store=self.open_store())
+        restarted.register_function("add", add)
+        futures = restarted.recover_tasks()
+        self.assertEqual(sorted(futures), ["down", "up"])
+        restarted.register_resource("r", 2)
+        restarted.start()
+        try:
+            self.assertEqual(futures["up"].result(timeout=TIMEOUT), 3)
+            self.assertEqual(futures["down"].result(timeout=TIMEOUT), 13)
+        finally:
+            restarted.stop()
+        self.assertEqual(len(restarted.durable_store), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
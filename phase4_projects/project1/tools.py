@@ -1,7 +1,13 @@
 import requests
 import os
+import sys
 from datetime import datetime
 
+# 添加仓库根目录到Python路径，以复用公共的文件内容缓存
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from phase2_core.mcp.file_cache import get_file_cache
+
 class Tools:
     """工具类，提供各种功能"""
     
@@ -45,8 +51,14 @@ class Tools:
         """
         try:
             if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                # 优先从文件内容缓存读取，文件过大时直接读取
+                data = get_file_cache().load(file_path)
+                if data is not None:
+                    # 与文本模式读取一致，把 \r\n 和 \r 转换为 \n
+                    content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+                else:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
                 return f"文件内容：\n{content}"
             else:
                 return f"文件不存在：{file_path}"
@@ -69,8 +81,11 @@ class Tools:
             # 确保目录存在
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            try:
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+            finally:
+                get_file_cache().invalidate(file_path)
             
             return f"文件写入成功：{file_path}"
         except Exception as e: